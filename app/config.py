@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import hashlib
 import os
 from dotenv import load_dotenv
 
@@ -10,6 +11,54 @@ class Config:
     database_url: str
     video_url: str
     owner_username: str
+    # cross-chat anti-raid: bitta akkaunt N ta guruhga oyna ichida kirsa (0 = o‘chiq)
+    coord_join_chats: int = 3
+    coord_join_window_sec: int = 900
+    # update pool: chat_id bo‘yicha navbatlar (0 = aiogram default, har update alohida task)
+    update_workers: int = 0           # moderation lane (oddiy guruh xabarlari)
+    update_member_workers: int = 2    # chat_member / servis xabarlar
+    update_command_workers: int = 2   # komandalar, callback, private
+    update_max_in_flight: int = 1000  # har bir lane uchun
+    update_max_backlog: int = 10000   # to‘lgan lane'lar navbatidan tashqari kutayotganlar; shundan keyin polling to‘xtaydi
+    update_shed_depth: int = 200      # commands lane (private + callback): bundan chuqur navbatda eskisi tashlanadi
+    # ishga tushirish rejimi: polling | webhook
+    run_mode: str = "polling"
+    webhook_url: str = ""             # tashqi manzil, masalan https://bot.example.com
+    webhook_path: str = "/tg/webhook"
+    webhook_secret: str = ""
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    # 1 dan katta bo‘lsa: bitta ingress + N ta worker jarayon (chat_id % N)
+    shards: int = 1
+    # restartdan keyingi eski xabarlar (soniya, 0 = o‘chiq):
+    # soft dan eski -> faqat jim o‘chirish, hard dan eski -> umuman tekshirilmaydi
+    stale_soft_sec: int = 120
+    stale_hard_sec: int = 3600
+    # Bot API: bo‘sh = api.telegram.org, aks holda o‘zimizning server (masalan http://127.0.0.1:8081)
+    bot_api_url: str = ""
+    bot_api_local: int = 0            # 1 = local mode (fayllar diskdan)
+    http_limit: int = 100             # bir vaqtdagi ulanishlar
+    http_keepalive_sec: int = 15      # 0 = keep-alive o‘chiq
+    http_dns_ttl_sec: int = 3600      # 0 = DNS kesh o‘chiq
+    http_timeout_sec: int = 60
+    json_codec: str = "json"          # json | orjson | ujson
+    # Prometheus /metrics (0 = o‘chiq); shards>1 bo‘lsa har worker: port + shard raqami
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+    # event loop kechikishi / sekin handlerlar (ms, 0 = o‘chiq); owner: /sekin
+    loop_lag_ms: int = 250
+    slow_handler_ms: int = 1000
+    # xotira hisoboti logga har N soniyada (0 = o‘chiq); owner: /xotira
+    memory_log_sec: int = 900
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer, got {raw!r}")
 
 def load_config() -> Config:
     token = os.getenv("BOT_TOKEN", "").strip()
@@ -23,9 +72,50 @@ def load_config() -> Config:
     if not owner_username:
         raise RuntimeError("OWNER_USERNAME is empty")
 
+    run_mode = os.getenv("RUN_MODE", "polling").strip().lower() or "polling"
+    if run_mode not in ("polling", "webhook"):
+        raise RuntimeError(f"RUN_MODE must be polling or webhook, got {run_mode!r}")
+
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip()
+    if run_mode == "webhook" and not webhook_url:
+        raise RuntimeError("WEBHOOK_URL is empty (RUN_MODE=webhook)")
+
+    webhook_path = "/" + (os.getenv("WEBHOOK_PATH", "").strip().lstrip("/") or "tg/webhook")
+    # secret bo‘lmasa tokendan chiqaramiz: Telegram faqat [A-Za-z0-9_-] qabul qiladi
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip() or hashlib.sha256(token.encode()).hexdigest()
+
     return Config(
         bot_token=token,
         database_url=db_url,
         video_url=video_url,
         owner_username=owner_username,
+        coord_join_chats=_env_int("COORD_JOIN_CHATS", 3),
+        coord_join_window_sec=_env_int("COORD_JOIN_WINDOW_SEC", 900),
+        update_workers=_env_int("UPDATE_WORKERS", 0),
+        update_member_workers=_env_int("UPDATE_MEMBER_WORKERS", 2),
+        update_command_workers=_env_int("UPDATE_COMMAND_WORKERS", 2),
+        update_max_in_flight=_env_int("UPDATE_MAX_IN_FLIGHT", 1000),
+        update_max_backlog=_env_int("UPDATE_MAX_BACKLOG", 10000),
+        update_shed_depth=_env_int("UPDATE_SHED_DEPTH", 200),
+        run_mode=run_mode,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_host=os.getenv("WEBHOOK_HOST", "").strip() or "0.0.0.0",
+        webhook_port=_env_int("WEBHOOK_PORT", 8080),
+        shards=_env_int("SHARDS", 1),
+        stale_soft_sec=_env_int("STALE_SOFT_SEC", 120),
+        stale_hard_sec=_env_int("STALE_HARD_SEC", 3600),
+        bot_api_url=os.getenv("BOT_API_URL", "").strip().rstrip("/"),
+        bot_api_local=_env_int("BOT_API_LOCAL", 0),
+        http_limit=_env_int("HTTP_LIMIT", 100),
+        http_keepalive_sec=_env_int("HTTP_KEEPALIVE_SEC", 15),
+        http_dns_ttl_sec=_env_int("HTTP_DNS_TTL_SEC", 3600),
+        http_timeout_sec=_env_int("HTTP_TIMEOUT_SEC", 60),
+        json_codec=os.getenv("JSON_CODEC", "").strip().lower() or "json",
+        metrics_port=_env_int("METRICS_PORT", 0),
+        metrics_host=os.getenv("METRICS_HOST", "").strip() or "127.0.0.1",
+        loop_lag_ms=_env_int("LOOP_LAG_MS", 250),
+        slow_handler_ms=_env_int("SLOW_HANDLER_MS", 1000),
+        memory_log_sec=_env_int("MEMORY_LOG_SEC", 900),
     )
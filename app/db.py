@@ -3,7 +3,7 @@ from datetime import date, datetime, timedelta
 
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy import select, delete, case, NullPool, event, text
+from sqlalchemy import select, delete, update, case, func, NullPool, event, text
 from .models import (
     Base,
     ChatSettings,
@@ -11,6 +11,11 @@ from .models import (
     UserMessageLog,
     BotAdmin,
     BadWord,
+    GlobalBadWord,
+    GlobalBadDict,
+    BadWordAllow,
+    AdsKeyword,
+    DomainRule,
     ForceAddProgress,
     ForceAddPriv,
     UserStrike,
@@ -19,6 +24,8 @@ from .models import (
     SavedAd,
     BotUser,
     IgnoreUsername,
+    RaidSnapshot,
+    RaidBatch,
 )
 class DB:
     def __init__(self, database_url: str):
@@ -67,6 +74,56 @@ class DB:
             except Exception:
                 pass
 
+            # ---- auto-migrate: add missing column raid_action ----
+            try:
+                await conn.execute(
+                    text("ALTER TABLE chat_settings ADD COLUMN raid_action VARCHAR(16) NOT NULL DEFAULT 'off';")
+                )
+            except Exception:
+                pass
+
+            # ---- auto-migrate: add missing columns blocked_scripts / script_min_pct ----
+            for ddl in (
+                "ALTER TABLE chat_settings ADD COLUMN blocked_scripts INTEGER NOT NULL DEFAULT 0;",
+                "ALTER TABLE chat_settings ADD COLUMN script_min_pct INTEGER NOT NULL DEFAULT 0;",
+            ):
+                try:
+                    await conn.execute(text(ddl))
+                except Exception:
+                    pass
+
+            # ---- auto-migrate: add missing column ads_threshold ----
+            try:
+                await conn.execute(
+                    text("ALTER TABLE chat_settings ADD COLUMN ads_threshold FLOAT NOT NULL DEFAULT 1.0;")
+                )
+            except Exception:
+                pass
+
+            # ---- auto-migrate: add missing column swear_fuzzy ----
+            try:
+                await conn.execute(
+                    text("ALTER TABLE chat_settings ADD COLUMN swear_fuzzy INTEGER NOT NULL DEFAULT 0;")
+                )
+            except Exception:
+                pass
+
+            # ---- auto-migrate: add missing column bad_dicts ----
+            try:
+                await conn.execute(
+                    text("ALTER TABLE chat_settings ADD COLUMN bad_dicts VARCHAR(128) NOT NULL DEFAULT '';")
+                )
+            except Exception:
+                pass
+
+            # ---- auto-migrate: add missing column raid_batches.raid_id ----
+            try:
+                await conn.execute(
+                    text("ALTER TABLE raid_batches ADD COLUMN raid_id BIGINT NOT NULL DEFAULT 0;")
+                )
+            except Exception:
+                pass
+
     async def touch_chat(self, chat_id: int, title: str = "") -> None:
         async with self.Session() as session:
             res = await session.execute(select(BotChat).where(BotChat.chat_id == chat_id))
@@ -259,18 +316,14 @@ class DB:
 
     async def update_msglog(self, chat_id: int, user_id: int, last_hash: str, last_at: datetime) -> None:
         async with self.Session() as session:
-            q = select(UserMessageLog).where(
-                UserMessageLog.chat_id == chat_id,
-                UserMessageLog.user_id == user_id,
+            # на каждое сообщение с anti-same: один UPDATE, INSERT только для нового юзера
+            res = await session.execute(
+                update(UserMessageLog)
+                .where(UserMessageLog.chat_id == chat_id, UserMessageLog.user_id == user_id)
+                .values(last_hash=last_hash, last_at=last_at)
             )
-            res = await session.execute(q)
-            obj = res.scalar_one_or_none()
-            if not obj:
-                obj = UserMessageLog(chat_id=chat_id, user_id=user_id, last_hash=last_hash, last_at=last_at)
-                session.add(obj)
-            else:
-                obj.last_hash = last_hash
-                obj.last_at = last_at
+            if not res.rowcount:
+                session.add(UserMessageLog(chat_id=chat_id, user_id=user_id, last_hash=last_hash, last_at=last_at))
             await session.commit()
 
     async def is_bot_admin(self, user_id: int) -> bool:
@@ -363,6 +416,128 @@ class DB:
             )
             return [r[0] for r in res.all()]
 
+    # -------- global bad-word dictionaries --------
+    async def add_global_bad_words(self, dict_name: str, words: list[str]) -> int:
+        rows = [{"dict_name": dict_name, "word": w} for w in dict.fromkeys(words) if w]
+        added = 0
+        async with self.Session() as s:
+            # пачками: у sqlite лимит на число параметров в одном запросе
+            for i in range(0, len(rows), 400):
+                res = await s.execute(insert(GlobalBadWord).values(rows[i:i + 400]).on_conflict_do_nothing())
+                added += res.rowcount or 0
+            if added:
+                await self._bump_global_bad_dict(s, dict_name)
+            await s.commit()
+        return added
+
+    async def remove_global_bad_word(self, dict_name: str, word: str) -> bool:
+        async with self.Session() as s:
+            res = await s.execute(
+                delete(GlobalBadWord).where(GlobalBadWord.dict_name == dict_name, GlobalBadWord.word == word)
+            )
+            removed = (res.rowcount or 0) > 0
+            if removed:
+                await self._bump_global_bad_dict(s, dict_name)
+            await s.commit()
+            return removed
+
+    @staticmethod
+    async def _bump_global_bad_dict(s: AsyncSession, dict_name: str) -> None:
+        # в той же транзакции, что и изменение слов
+        now = datetime.utcnow()
+        await s.execute(
+            insert(GlobalBadDict)
+            .values(dict_name=dict_name, version=1, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=["dict_name"],
+                set_={"version": GlobalBadDict.version + 1, "updated_at": now},
+            )
+        )
+
+    async def global_bad_dict_versions(self) -> dict[str, int]:
+        async with self.Session() as s:
+            res = await s.execute(select(GlobalBadDict.dict_name, GlobalBadDict.version))
+            return {r[0]: int(r[1]) for r in res.all()}
+
+    async def list_global_bad_words(self, dict_name: str) -> list[str]:
+        async with self.Session() as s:
+            res = await s.execute(select(GlobalBadWord.word).where(GlobalBadWord.dict_name == dict_name))
+            return [r[0] for r in res.all()]
+
+    async def list_global_bad_dicts(self) -> list[tuple[str, int]]:
+        async with self.Session() as s:
+            res = await s.execute(
+                select(GlobalBadWord.dict_name, func.count())
+                .group_by(GlobalBadWord.dict_name)
+                .order_by(GlobalBadWord.dict_name)
+            )
+            return [(r[0], int(r[1])) for r in res.all()]
+
+    async def set_bad_word_allow(self, chat_id: int, word: str, allow: bool) -> None:
+        async with self.Session() as s:
+            if allow:
+                await s.execute(insert(BadWordAllow).values(chat_id=chat_id, word=word).on_conflict_do_nothing())
+            else:
+                await s.execute(delete(BadWordAllow).where(BadWordAllow.chat_id == chat_id, BadWordAllow.word == word))
+            await s.commit()
+
+    async def list_bad_word_allows(self, chat_id: int, limit: int = 500) -> list[str]:
+        async with self.Session() as s:
+            res = await s.execute(select(BadWordAllow.word).where(BadWordAllow.chat_id == chat_id).limit(limit))
+            return [r[0] for r in res.all()]
+
+    # -------- ads keywords --------
+    async def set_ads_keyword(self, chat_id: int, word: str, weight: float) -> None:
+        async with self.Session() as s:
+            stmt = (
+                insert(AdsKeyword)
+                .values(chat_id=chat_id, word=word, weight=weight)
+                .on_conflict_do_update(index_elements=["chat_id", "word"], set_={"weight": weight})
+            )
+            await s.execute(stmt)
+            await s.commit()
+
+    async def remove_ads_keyword(self, chat_id: int, word: str) -> bool:
+        async with self.Session() as s:
+            res = await s.execute(
+                delete(AdsKeyword).where(AdsKeyword.chat_id == chat_id, AdsKeyword.word == word)
+            )
+            await s.commit()
+            return (res.rowcount or 0) > 0
+
+    async def list_ads_keywords(self, chat_id: int, limit: int = 200) -> list[tuple[str, float]]:
+        async with self.Session() as s:
+            res = await s.execute(
+                select(AdsKeyword.word, AdsKeyword.weight).where(AdsKeyword.chat_id == chat_id).limit(limit)
+            )
+            return [(r[0], float(r[1])) for r in res.all()]
+
+    # -------- domain allow/deny --------
+    async def set_domain_rule(self, chat_id: int, pattern: str, allow: bool) -> None:
+        async with self.Session() as s:
+            stmt = (
+                insert(DomainRule)
+                .values(chat_id=chat_id, pattern=pattern, allow=allow)
+                .on_conflict_do_update(index_elements=["chat_id", "pattern"], set_={"allow": allow})
+            )
+            await s.execute(stmt)
+            await s.commit()
+
+    async def remove_domain_rule(self, chat_id: int, pattern: str) -> bool:
+        async with self.Session() as s:
+            res = await s.execute(
+                delete(DomainRule).where(DomainRule.chat_id == chat_id, DomainRule.pattern == pattern)
+            )
+            await s.commit()
+            return (res.rowcount or 0) > 0
+
+    async def list_domain_rules(self, chat_id: int, limit: int = 500) -> list[tuple[str, bool]]:
+        async with self.Session() as s:
+            res = await s.execute(
+                select(DomainRule.pattern, DomainRule.allow).where(DomainRule.chat_id == chat_id).limit(limit)
+            )
+            return [(r[0], bool(r[1])) for r in res.all()]
+
     # сколько добавил
     async def get_force_progress(self, chat_id: int, user_id: int) -> int:
         async with self.Session() as s:
@@ -561,3 +736,103 @@ class DB:
                 ).limit(1)
             )
             return res.scalar_one_or_none() is not None
+
+    # -------- antiraid snapshots --------
+    async def save_raid_snapshots(self, snaps: dict[int, dict]) -> None:
+        """
+        Upsert snapshots for many chats in one transaction:
+        snaps = {chat_id: {"buckets", "bucket_width", "head", "locked_until", "prev_perms"}}
+        """
+        if not snaps:
+            return
+        now = datetime.utcnow()
+        async with self.Session() as s:
+            for chat_id, snap in snaps.items():
+                values = {
+                    "buckets_json": json.dumps(snap["buckets"]),
+                    "bucket_width": float(snap["bucket_width"]),
+                    "head": int(snap["head"]),
+                    "locked_until": float(snap["locked_until"]),
+                    "prev_perms_json": snap.get("prev_perms") or "",
+                    "updated_at": now,
+                }
+                stmt = (
+                    insert(RaidSnapshot)
+                    .values(chat_id=chat_id, **values)
+                    .on_conflict_do_update(index_elements=["chat_id"], set_=values)
+                )
+                await s.execute(stmt)
+            await s.commit()
+
+    async def list_raid_snapshots(self) -> list[RaidSnapshot]:
+        async with self.Session() as s:
+            res = await s.execute(select(RaidSnapshot))
+            return list(res.scalars().all())
+
+    async def delete_raid_snapshot(self, chat_id: int) -> None:
+        async with self.Session() as s:
+            await s.execute(delete(RaidSnapshot).where(RaidSnapshot.chat_id == chat_id))
+            await s.commit()
+
+    # -------- antiraid batches --------
+    async def create_raid_batch(self, chat_id: int, action: str, raid_id: int = 0) -> int:
+        """
+        raid_id=0 starts a new raid: the first batch's id becomes its raid_id.
+        """
+        async with self.Session() as s:
+            obj = RaidBatch(chat_id=chat_id, raid_id=raid_id, action=action, user_ids_json="[]")
+            s.add(obj)
+            await s.flush()
+            if not raid_id:
+                obj.raid_id = obj.id
+            await s.commit()
+            return obj.id
+
+    async def append_raid_batch(self, batch_id: int, user_ids: list[int]) -> None:
+        if not user_ids:
+            return
+        async with self.Session() as s:
+            res = await s.execute(select(RaidBatch).where(RaidBatch.id == batch_id))
+            obj = res.scalar_one_or_none()
+            if not obj:
+                return
+            ids = json.loads(obj.user_ids_json or "[]")
+            ids.extend(user_ids)
+            obj.user_ids_json = json.dumps(ids)
+            await s.commit()
+
+    async def get_last_raid_batches(self, chat_id: int) -> list[RaidBatch]:
+        """
+        All not-undone batches of the chat's last raid (ban and mute can differ
+        within one raid, each action has its own batch).
+        """
+        async with self.Session() as s:
+            res = await s.execute(
+                select(RaidBatch)
+                .where(RaidBatch.chat_id == chat_id, RaidBatch.undone == False)  # noqa: E712
+                .order_by(RaidBatch.id.desc())
+                .limit(1)
+            )
+            last = res.scalar_one_or_none()
+            if not last:
+                return []
+            if not last.raid_id:
+                return [last]
+            res = await s.execute(
+                select(RaidBatch)
+                .where(
+                    RaidBatch.chat_id == chat_id,
+                    RaidBatch.raid_id == last.raid_id,
+                    RaidBatch.undone == False,  # noqa: E712
+                )
+                .order_by(RaidBatch.id)
+            )
+            return list(res.scalars().all())
+
+    async def mark_raid_batch_undone(self, batch_id: int) -> None:
+        async with self.Session() as s:
+            res = await s.execute(select(RaidBatch).where(RaidBatch.id == batch_id))
+            obj = res.scalar_one_or_none()
+            if obj:
+                obj.undone = True
+                await s.commit()
@@ -8,6 +8,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from ..db import DB
 from ..config import Config
 from ..utils.access import can_manage_chat
+from ..utils.scripts import script_labels
 
 router = Router()
 
@@ -33,14 +34,16 @@ def settings_text(s) -> str:
     anti_raid_line = (
         "• Anti-raid: OFF\n"
         if int(s.raid_limit) <= 0
-        else f"• Anti-raid: limit {s.raid_limit} / oyna {s.raid_window_min}soat / yopish {s.raid_close_min}soat\n"
+        else f"• Anti-raid: limit {s.raid_limit} / oyna {s.raid_window_min}soat / yopish {s.raid_close_min}soat"
+             f" / jazo {getattr(s, 'raid_action', 'off')}\n"
     )
     return (
         "🛡 Guruh Himoya Boti — sozlamalar:\n"
         f"• Ssilka blok: {_on(s.block_links)}\n"
         f"• Reklama blok: {_on(s.block_ads)} (limit {s.ads_daily_limit}/kun)\n"
         f"• Arab blok: {_on(s.block_arab)}\n"
-        f"• So'kinish blok: {_on(s.block_swear)}\n"
+        f"• Yozuv blok: {script_labels(s.blocked_scripts or 0) or 'OFF'}\n"
+        f"• So'kinish blok: {_on(s.block_swear)} (xato {s.swear_fuzzy or 0} harf, lug‘at {s.bad_dicts or 'OFF'})\n"
         f"• Kanal post blok: {_on(s.block_channel_posts)}\n"
         f"• Xizmat xabar yashirish: {_on(s.hide_service_msgs)}\n"
         f"• Anti-flood: {_on(s.antiflood_enabled)} (max {s.flood_max_msgs}/{s.flood_window_sec}s)\n"
@@ -142,18 +145,28 @@ HELP_ALL = (
     "🔗 <b>Havola</b>\n\n"
     
     "/ssilka yoq — Havolani bloklaydi\n"
-    "/ssilka o‘chir — Ruxsat beradi\n\n"
+    "/ssilka o‘chir — Ruxsat beradi\n"
+    "/ruxsat sayt.uz — Shu domen (yoki t.me/kanal) havolasiga ruxsat\n"
+    "/taqiq sayt.uz — Shu domenni har doim bloklaydi\n"
+    "/domendel sayt.uz — Qoidani o‘chiradi\n"
+    "/domenlar — Domen qoidalari ro‘yxati\n\n"
     
     "📢 <b>Reklama</b>\n\n"
 
     "/reklama yoq — Reklama va spamni o‘chiradi\n"
     "/reklama o‘chir — Ruxsat beradi\n"
-    "/rek_limit son — Reklama limitini belgilaydi\n\n"
+    "/rek_limit son — Reklama limitini belgilaydi\n"
+    "/rek_chegara son — Reklama sezgirligi (standart 1)\n"
+    "/rekqosh so‘z [og‘irlik] — Guruh uchun reklama so‘zi\n"
+    "/rekdel so‘z — So‘zni o‘chiradi\n"
+    "/reklist — Qo‘shimcha reklama so‘zlari\n\n"
     
     "🈲 <b>Arab harfi</b>\n\n"
 
     "/arab yoq — Arab harfli xabarni o‘chiradi\n"
-    "/arab o‘chir — Ruxsat beradi\n\n"
+    "/arab o‘chir — Ruxsat beradi\n"
+    "/skript xitoy hind — Boshqa yozuvlarni bloklaydi (/skript — ro‘yxat)\n"
+    "/skript_foiz son — Matnning necha foizi bo‘lsa bloklash (0 = bitta harf)\n\n"
     
     "🤬 <b> So‘kinish</b>\n\n"
 
@@ -164,7 +177,9 @@ HELP_ALL = (
     
     "/yomonqosh &lt;so‘z&gt; — Yomon so‘z qo‘shadi\n"
     "/yomondel &lt;so‘z&gt; — So‘zni o‘chiradi.\n"
-    "/yomonlist — Barcha yomon so‘zlar ro‘yxatini ko‘rsatadi\n\n"
+    "/yomonlist — Barcha yomon so‘zlar ro‘yxatini ko‘rsatadi\n"
+    "/yomon_xato 0..2 — Necha harf xato bo‘lsa ham ushlash (s0kish, sukaa)\n"
+    "/lugat uz ru — Umumiy yomon so‘z lug‘atlarini ulaydi (/yomondel — guruhda ruxsat)\n\n"
     
     "📛 <b>Kanal postlari</b>\n\n"
 
@@ -201,7 +216,9 @@ HELP_ALL = (
     "/oyna soat —  Vaqt oralig‘i (soat)\n"
     "/yopish soat — Yopish muddati (soat)\n"
     "/limit 0 — O‘chiradi\n"
-    "/antiraidpanel — Tugmali panel\n\n"
+    "/antiraidpanel — Tugmali panel\n"
+    "/raidjazo ban|mute|off — Raid paytida kirganlarni ban/mute qiladi\n"
+    "/raidqaytar — Oxirgi raid jazosini bekor qiladi\n\n"
     
     "➡️ Limit oshsa — guruh vaqtincha yopiladi 🚫\n\n"
     
@@ -7,36 +7,26 @@ from aiogram import Router, F
 from aiogram.utils.markdown import hbold
 from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from aiogram.types import Message, ChatPermissions, InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated
 from aiogram.utils.text_decorations import html_decoration as hd
 from ..db import DB
 from ..config import Config
 from ..utils.access import can_manage_chat
 from ..utils.access import can_manage_bot
-from ..utils.moderation import has_link, has_arabic, looks_like_ads, is_channel_post, text_hash, mute_user, mute_user_seconds, unmute_user
+from ..utils.moderation import message_has_link, message_links, normalize_text, norm_hash, is_channel_post, mute_user, mute_user_seconds, unmute_user
 from ..utils.antiraid import AntiRaid
-from ..utils.admin import is_admin
+from ..utils.raid_state import RaidKeeper
+from ..utils.raid_response import RaidResponder
+from ..utils.joinindex import JoinIndex
+from ..utils.domains import DomainPolicy, get_domain_policy
+from ..utils.ads_filter import get_ads_classifier
+from ..utils.scripts import SCRIPT_BITS, blocked_scripts_hit, script_labels
+from ..utils.badwords import get_badword_matcher, normalize_for_badwords, parse_dicts
+from ..utils.admin import invalidate_admin, is_admin
+from ..utils.metrics import METRICS
 
 router = Router()
 
-ALLOW_ALL = ChatPermissions(
-    can_send_messages=True,
-    can_send_media_messages=True,
-    can_send_polls=True,
-    can_send_other_messages=True,
-    can_add_web_page_previews=True,
-    can_invite_users=True,
-)
-
-DENY_ALL = ChatPermissions(
-    can_send_messages=True,
-    can_send_media_messages=True,
-    can_send_polls=False,
-    can_send_other_messages=False,
-    can_add_web_page_previews=False,
-    can_invite_users=False,
-)
-
 _last_touch: dict[int, float] = {}
 _last_user_touch: dict[int, float] = {}
 _media_cache: dict[tuple[int, str], dict] = {}
@@ -61,6 +51,7 @@ def _cleanup_album_warned(ttl_sec: int = 15):
         if now - float(_album_warned[key]) > ttl_sec:
             _album_warned.pop(key, None)
 
+@METRICS.timed("is_subscribed")
 async def _is_subscribed(bot, channel_username: str, user_id: int) -> bool | None:
     """
     Returns:
@@ -85,14 +76,15 @@ def _normalize_for_words(text: str) -> str:
     t = re.sub(r"\s+", " ", t).strip()
     return f" {t} "
 
-def _normalize_for_badwords(text: str) -> str:
-    t = (text or "").lower()
-    # унифицируем апострофы
-    t = t.replace("’", "'").replace("ʻ", "'").replace("`", "'")
-    # всё кроме букв/цифр/подчёрк/апострофа -> пробел
-    t = re.sub(r"[^\w']+", " ", t, flags=re.UNICODE)
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+def _links_blocked(message: Message, text: str, block_all: bool, policy: DomainPolicy) -> bool:
+    # без правил — как раньше: любая ссылка (если /ssilka yoq)
+    if not policy:
+        return block_all and message_has_link(message, text)
+    for link in message_links(message):
+        verdict = policy.lookup(link)
+        if verdict is False or (verdict is None and block_all):
+            return True
+    return False
 
 
 def _get_text(message: Message) -> str:
@@ -125,6 +117,24 @@ def _origin_usernames(message: Message) -> list[str]:
     return res
 
 
+def _catchup_mode(event, config: Config) -> str:
+    """
+    Backlog after downtime (by event date):
+      ""      - fresh, full processing
+      "quiet" - older than stale_soft_sec: only delete violations, no warnings/strikes/mutes
+      "skip"  - older than stale_hard_sec: don't process at all
+    """
+    dt = getattr(event, "date", None)
+    if dt is None:
+        return ""
+    age = time.time() - dt.timestamp()
+    if config.stale_hard_sec > 0 and age >= config.stale_hard_sec:
+        return "skip"
+    if config.stale_soft_sec > 0 and age >= config.stale_soft_sec:
+        return "quiet"
+    return ""
+
+
 def _mention(user) -> str:
     if user.username:
         return f"@{user.username}"
@@ -240,6 +250,7 @@ async def _delete_message_or_album(message: Message):
 #     # красивый quote, как вы уже делали
 #     return txt + "\n\n" + hd.quote(extra)
 
+@METRICS.timed("handle_violation")
 async def _handle_violation(
     message: Message,
     db: DB,
@@ -256,6 +267,14 @@ async def _handle_violation(
     if not user:
         return
 
+    # catch-up: старое сообщение — только удаляем, без предупреждений и наказаний
+    if _catchup_mode(message, config):
+        try:
+            await _delete_message_or_album(message)
+        except Exception:
+            pass
+        return
+
     s = await db.get_or_create_settings(chat_id)
 
     # менеджер = владелец бота / global bot-admin / creator / chat bot-admin
@@ -320,10 +339,13 @@ async def _handle_violation(
 async def _process(message: Message, db: DB, antiflood, config: Config):
     chat_id = message.chat.id
     user = message.from_user
+    # bot_stage_seconds{stage}: время от предыдущей отметки (выключено — no-op)
+    t = METRICS.timer()
     try:
         tg_admin = await is_admin(message.bot, chat_id, user.id)
     except Exception:
         tg_admin = False
+    t.mark("is_admin")
     if not user:
         return
 
@@ -337,10 +359,13 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
             await db.touch_user(user.id, user.username or "", user.full_name or "")
         except Exception:
             pass
+        t.mark("touch_user")
 
     s = await db.get_or_create_settings(chat_id)
+    t.mark("settings")
     text = _get_text(message)
     _remember_media(message)
+    quiet = _catchup_mode(message, config) == "quiet"
 
     origin_usernames = _origin_usernames(message)
     is_ignored_sender = False
@@ -348,6 +373,7 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
         if await db.is_ignore_username(chat_id, u):
             is_ignored_sender = True
             break
+    t.mark("ignore_list")
 
     # Команды:
     # - менеджерам/админам пропускаем (чтобы /priv @user не улетал как "ссылка")
@@ -356,6 +382,7 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
         is_manager = await can_manage_chat(
             message.bot, chat_id, user.id, user.username, db, config
         )
+        t.mark("command_manager")
         if is_manager or tg_admin:
             return
         # обычный юзер: проверяем то, что после "/команда"
@@ -382,6 +409,8 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
                     await _delete_message_or_album(message)
                 except Exception:
                     pass
+                if quiet:
+                    return
 
                 need = max(0, required - added)
                 m = _mention(user)
@@ -437,15 +466,17 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
 
                 asyncio.create_task(_delete_later())
                 return
+        t.mark("force_add")
 
-    # 0) Anti-flood
-    if s.antiflood_enabled:
+    # 0) Anti-flood (в catch-up сообщения приходят пачкой — темп не показателен)
+    if s.antiflood_enabled and not quiet:
         exceeded = antiflood.hit(
             chat_id=chat_id,
             user_id=user.id,
             window_sec=s.flood_window_sec,
             max_msgs=s.flood_max_msgs,
         )
+        t.mark("antiflood")
         if exceeded:
             await _handle_violation(
                 message, db, config,
@@ -459,12 +490,15 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
     # 0.5) Force kanal: если канал привязан и юзер не подписан — удаляем сообщение
     if s.linked_channel and not tg_admin and not is_ignored_sender:
         res = await _is_subscribed(message.bot, s.linked_channel, user.id)
+        t.mark("subscription")
         if res is False:
             # удаляем сообщение и даем инструкцию (тихо и без спама)
             try:
                 await message.delete()
             except Exception:
                 pass
+            if quiet:
+                return
             m = _mention(user)
             txt = f"🔒 {m} guruhda yozish uchun @{s.linked_channel} kanaliga obuna bo‘ling."
 
@@ -523,9 +557,13 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
         )
         return
 
+    # нормализация (с FOLD_TABLE) один раз на сообщение — для antisame, рекламы и мата
+    norm = normalize_text(text) if (s.antisame_enabled or s.block_ads or s.block_swear) else ""
+    t.mark("normalize")
+
     # 2) Anti-same
     if s.antisame_enabled and text.strip():
-        h = text_hash(text)
+        h = norm_hash(norm)
         log = await db.get_or_create_msglog(chat_id, user.id)
         minutes = s.antisame_minutes
         delta = datetime.utcnow() - log.last_at
@@ -539,9 +577,13 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
             )
             return
         await db.update_msglog(chat_id, user.id, last_hash=h, last_at=datetime.utcnow())
+        t.mark("antisame")
 
-    # 3) Ссылки
-    if s.block_links and has_link(text):
+    # 3) Ссылки (+ /ruxsat /taqiq по доменам)
+    policy = await get_domain_policy(db, chat_id)
+    links_hit = (s.block_links or policy.has_deny) and _links_blocked(message, text, s.block_links, policy)
+    t.mark("links")
+    if links_hit:
         await _handle_violation(
             message, db, config,
             rule="links",
@@ -551,8 +593,11 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
         )
         return
 
-    # 4) Arab
-    if s.block_arab and has_arabic(text):
+    # 4) Письменности: /arab + /skript (одна проверка на любое число запрещённых)
+    blocked = (s.blocked_scripts or 0) | (SCRIPT_BITS["arabic"] if s.block_arab else 0)
+    hit = blocked_scripts_hit(text, blocked, s.script_min_pct or 0) if blocked else 0
+    t.mark("scripts")
+    if hit == SCRIPT_BITS["arabic"]:
         await _handle_violation(
             message, db, config,
             rule="arab",
@@ -561,13 +606,28 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
             mute_minutes=60,
         )
         return
+    if hit:
+        names = script_labels(hit)
+        await _handle_violation(
+            message, db, config,
+            rule="script",
+            warn_text=f"bu guruhda {names} yozuvidagi matn mumkin emas. Yana takrorlansa blok bo‘ladi.",
+            mute_text=f"{names} yozuvida yozganingiz uchun bloklandingiz.",
+            mute_minutes=60,
+        )
+        return
 
-    # 5) Реклама
-    if s.block_ads and looks_like_ads(text):
+    # 5) Реклама (доп. слова чата + порог /rek_chegara)
+    ads = await get_ads_classifier(db, chat_id) if s.block_ads else None
+    ads_hit = bool(ads) and ads.is_ads(norm, message_has_link(message, text), s.ads_threshold)
+    t.mark("ads")
+    if ads_hit:
         try:
             await _delete_message_or_album(message)
         except Exception:
             pass
+        if quiet:
+            return
 
         # 2) если это альбом — предупреждаем/считаем лимит только один раз на весь альбом
         if message.media_group_id:
@@ -603,35 +663,20 @@ async def _process(message: Message, db: DB, antiflood, config: Config):
             )
         return
 
+    # 6) Мат: свои слова + общие словари (/lugat), с /yomon_xato — и с опечатками
     if s.block_swear and text.strip():
-        norm = _normalize_for_badwords(text)
-        padded = f" {norm} "
-        tokens = set(norm.split())
-        bad_words = await db.list_bad_words(chat_id, limit=200)
-        for w in bad_words:
-            bw = _normalize_for_badwords(w)
-
-            if not bw:
-                continue
-            if bw in tokens:
-                await _handle_violation(
-                    message, db, config,
-                    rule="swear",
-                    warn_text="so‘kinish mumkin emas. Yana takrorlansa blok bo‘ladi.",
-                    mute_text="so‘kinganingiz uchun bloklandingiz.",
-                    mute_minutes=300,  # 5 soat
-                )
-                return
-            if len(bw) >= 4 and bw in padded:
-                await _handle_violation(
-                    message, db, config,
-                    rule="swear",
-                    warn_text="so‘kinish mumkin emas. Yana takrorlansa blok bo‘ladi.",
-                    mute_text="so‘kinganingiz uchun bloklandingiz.",
-                    mute_minutes=300,  # 5 soat
-                )
-                return
-
+        matcher = await get_badword_matcher(db, chat_id, s.swear_fuzzy or 0, parse_dicts(s.bad_dicts))
+        swear_hit = matcher.find(normalize_for_badwords(norm, fold=False))  # norm уже свёрнут
+        t.mark("swear")
+        if swear_hit:
+            await _handle_violation(
+                message, db, config,
+                rule="swear",
+                warn_text="so‘kinish mumkin emas. Yana takrorlansa blok bo‘ladi.",
+                mute_text="so‘kinganingiz uchun bloklandingiz.",
+                mute_minutes=300,  # 5 soat
+            )
+            return
 
 
 @router.message(
@@ -662,14 +707,24 @@ async def _antiraid_trigger(
     chat_id: int,
     s,
     antiraid: AntiRaid,
+    raid_keeper: RaidKeeper,
+    raid_responder: RaidResponder,
     message: Message | None = None,
     join_count: int = 1,
+    user_ids: list[int] | None = None,
 ):
     window_hours = int(s.raid_window_min)
     close_hours = int(s.raid_close_min)
     window_sec = window_hours * 3600
     close_sec = close_hours * 3600
 
+    # raid-ответ: запоминаем вошедших; пока чат закрыт — сразу отправляем их в ban/mute
+    action = (getattr(s, "raid_action", "") or "off").lower()
+    if action != "off" and user_ids:
+        antiraid.note_joiners(chat_id, user_ids)
+        if antiraid.is_locked(chat_id):
+            raid_responder.add(chat_id, action, user_ids)
+
     triggered = antiraid.hit(
         chat_id=chat_id,
         join_count=join_count,
@@ -679,13 +734,15 @@ async def _antiraid_trigger(
     if not triggered:
         return
 
-    try:
-        await bot.set_chat_permissions(chat_id, DENY_ALL)
-        antiraid.set_locked(chat_id, close_sec)
-    except Exception as e:
-        print(f"[antiraid] set_chat_permissions failed chat={chat_id}: {type(e).__name__}: {e}")
+    # закрытие + snapshot + таймер открытия (переживает рестарт)
+    if not await raid_keeper.lock(chat_id, close_sec):
         return
 
+    if action != "off":
+        suspects = antiraid.joiners_since(chat_id, time.time() - window_sec)
+        if suspects:
+            await raid_responder.start(chat_id, action, suspects)
+
     text = (
         f"🚨 Anti-raid: chat yopildi.\n"
         f"Limit: {s.raid_limit} / oyna: {window_hours} soat / yopish: {close_hours} soat"
@@ -702,28 +759,54 @@ async def _antiraid_trigger(
     except Exception as e:
         print(f"[antiraid] notify failed chat={chat_id}: {type(e).__name__}: {e}")
 
-    async def _reopen():
-        await asyncio.sleep(close_sec)
-        try:
-            await bot.set_chat_permissions(chat_id, ALLOW_ALL)
-            try:
-                if message:
-                    sent2 = await safe_answer(message, "✅ Anti-raid: chat qayta ochildi.")
-                    if not sent2:
-                        print(f"[antiraid open] notify failed chat={chat_id}")
-                else:
-                    await bot.send_message(chat_id, "✅ Anti-raid: chat qayta ochildi.")
-            except Exception:
-                pass
-        except Exception as e:
-            print(f"[antiraid] reopen failed chat={chat_id}: {type(e).__name__}: {e}")
 
-    asyncio.create_task(_reopen())
+async def _coordinated_trigger(
+    db: DB,
+    chat_id: int,
+    s,
+    join_index: JoinIndex,
+    raid_responder: RaidResponder,
+    user_ids: list[int],
+):
+    """
+    Cross-chat anti-raid: если один аккаунт за окно зашёл в N наших групп,
+    наказываем его (по raid_action каждой группы) ещё до того, как группа упрётся в свой raid_limit.
+    """
+    for uid in user_ids:
+        targets = join_index.hit(uid, chat_id)
+        for cid in targets:
+            cs = s if cid == chat_id else await db.get_or_create_settings(cid)
+            action = (getattr(cs, "raid_action", "") or "off").lower()
+            if int(cs.raid_limit or 0) <= 0 or action == "off":
+                continue
+            print(f"[antiraid] coordinated join user={uid} chat={cid} action={action}")
+            raid_responder.add(cid, action, [uid])
+
+
+async def _touch_chat(db: DB, message: Message) -> None:
+    # трогаем чат в БД максимум раз в 30 сек
+    chat_id = message.chat.id
+    now = time.monotonic()
+    if now - _last_touch.get(chat_id, 0.0) < 30.0:
+        return
+    _last_touch[chat_id] = now
+    try:
+        await db.touch_chat(chat_id, message.chat.title or "")
+    except Exception:
+        pass
 
 
 @router.message(F.chat.type.in_({"group", "supergroup"}), F.new_chat_members)
-async def guard_join(message: Message, db: DB, antiraid, config: Config):
-    await db.touch_chat(message.chat.id, message.chat.title or "")
+async def guard_join(
+    message: Message,
+    db: DB,
+    antiraid,
+    raid_keeper: RaidKeeper,
+    raid_responder: RaidResponder,
+    join_index: JoinIndex,
+    config: Config,
+):
+    await _touch_chat(db, message)
     s = await db.get_or_create_settings(message.chat.id)
 
     # 1) hide service msg
@@ -733,8 +816,15 @@ async def guard_join(message: Message, db: DB, antiraid, config: Config):
         except Exception:
             pass
 
+    # catch-up: пачка старых входов — не рейд, темп уже не восстановить
+    if _catchup_mode(message, config):
+        return
+
       # Anti-raid: используем единую функцию (не копипастим логику)
     join_count = len(message.new_chat_members or [])
+    joined_ids = [u.id for u in (message.new_chat_members or []) if not u.is_bot]
+
+    await _coordinated_trigger(db, message.chat.id, s, join_index, raid_responder, joined_ids)
 
     if int(s.raid_limit or 0) > 0 and join_count > 0:
         await _antiraid_trigger(
@@ -742,8 +832,11 @@ async def guard_join(message: Message, db: DB, antiraid, config: Config):
             message.chat.id,
             s,
             antiraid,
+            raid_keeper,
+            raid_responder,
             message = message,  # тут можно reply через safe_answer
             join_count = join_count,  # пачка входящих
+            user_ids = joined_ids,
         )
 
 @router.message(F.chat.type.in_({"group", "supergroup"}), F.left_chat_member)
@@ -756,16 +849,35 @@ async def guard_leave(message: Message, db: DB, config: Config):
             pass
 
 @router.chat_member(F.chat.type.in_({"group", "supergroup"}))
-async def guard_chat_member(update: ChatMemberUpdated, db: DB, antiraid: AntiRaid):
+async def guard_chat_member(
+    update: ChatMemberUpdated,
+    db: DB,
+    antiraid: AntiRaid,
+    raid_keeper: RaidKeeper,
+    raid_responder: RaidResponder,
+    join_index: JoinIndex,
+    config: Config,
+):
     chat_id = update.chat.id
+    # статус поменялся (в т.ч. повысили/сняли админа) — кэш is_admin устарел
+    invalidate_admin(chat_id, update.new_chat_member.user.id)
     s = await db.get_or_create_settings(chat_id)
 
     # --- Anti-raid via chat_member (works even if service join messages are missing) ---
     old_status = getattr(update.old_chat_member, "status", None)
     new_status = getattr(update.new_chat_member, "status", None)
-    if old_status in ("left", "kicked") and new_status in ("member", "restricted", "administrator", "creator"):
+    is_join = old_status in ("left", "kicked") and new_status in ("member", "restricted", "administrator", "creator")
+    if is_join and not _catchup_mode(update, config):
+        joined = update.new_chat_member.user
+        if not joined.is_bot:
+            await _coordinated_trigger(db, chat_id, s, join_index, raid_responder, [joined.id])
         if int(s.raid_limit or 0) > 0:
-            await _antiraid_trigger(update.bot, chat_id, s, antiraid, message=None, join_count=1)
+            await _antiraid_trigger(
+                update.bot, chat_id, s, antiraid, raid_keeper, raid_responder,
+                message=None,
+                join_count=1,
+                user_ids=[] if joined.is_bot else [joined.id],
+            )
 
     if not s.force_add_enabled:
         return
@@ -795,17 +907,8 @@ async def guard_chat_member(update: ChatMemberUpdated, db: DB, antiraid: AntiRai
 async def guard_all(message: Message, db: DB, antiflood, config: Config):
     if message.new_chat_members or message.left_chat_member:
         return
+    if _catchup_mode(message, config) == "skip":
+        return
 
-    chat_id = message.chat.id
-    now = time.monotonic()
-
-    # трогаем чат в БД максимум раз в 30 сек
-    last = _last_touch.get(chat_id, 0.0)
-    if now - last >= 30.0:
-        _last_touch[chat_id] = now
-        try:
-            await db.touch_chat(chat_id, message.chat.title or "")
-        except Exception:
-            pass
-
+    await _touch_chat(db, message)
     await _process(message, db, antiflood, config)
@@ -0,0 +1,133 @@
+# owner.py
+from __future__ import annotations
+
+import asyncio
+import time
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from ..config import Config
+from ..utils.access import is_owner
+from ..utils import memstats
+from ..utils.looplag import LoopMonitor, Trace
+from ..utils.profiler import SamplingProfiler, collapsed, text_summary
+
+router = Router()
+
+_SHOWN = 10
+PROFILE_MAX_SEC = 120
+
+_profiler = SamplingProfiler()
+# фоновые задачи /profil (ссылка, чтобы их не собрал GC)
+_profile_tasks: set[asyncio.Task] = set()
+
+
+def _trace_head(t: Trace) -> str:
+    at = time.strftime("%H:%M:%S", time.localtime(t.at))
+    where = t.handler or "—"
+    chat = f" chat {t.chat_id}" if t.chat_id else ""
+    return f"{at} {t.kind} {t.duration * 1000:.0f} ms {where}{chat}"
+
+
+@router.message(Command("sekin"))
+async def cmd_sekin(message: Message, config: Config, loop_monitor: LoopMonitor):
+    if message.chat.type != "private":
+        return
+    if not await is_owner(message, config):
+        return
+
+    lag = loop_monitor.lag_stats()
+    traces = loop_monitor.traces()
+    lines = [
+        f"⏱ Event loop kechikishi: p50 {lag['p50'] * 1000:.0f} ms, p99 {lag['p99'] * 1000:.0f} ms, "
+        f"max {lag['max'] * 1000:.0f} ms ({lag['samples']} o‘lchov)",
+        f"Qotishlar: {loop_monitor.blocks}, sekin handlerlar: {loop_monitor.slow} "
+        f"(chegara {loop_monitor.lag_threshold * 1000:.0f} / {loop_monitor.slow_threshold * 1000:.0f} ms)",
+    ]
+    if not traces:
+        lines.append("📭 Trasslar yo‘q.")
+        await message.answer("\n".join(lines))
+        return
+
+    lines.append("")
+    lines += [_trace_head(t) for t in reversed(traces[-_SHOWN:])]
+    await message.answer("\n".join(lines))
+
+    # to‘liq stacklar — fayl bilan (xabarga sig‘maydi)
+    body = "\n\n".join(
+        _trace_head(t) + "\n" + ("".join(t.stack) or "  (stack yo‘q: loop handler ichida qotgan, block trassni qarang)\n")
+        for t in reversed(traces)
+    )
+    await message.answer_document(BufferedInputFile(body.encode("utf-8"), filename="traces.txt"))
+
+
+async def _profile_and_send(message: Message, seconds: int):
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        prof = _profiler.stop()
+    summary = text_summary(prof)
+    if len(summary) > 3900:
+        summary = summary[:3900] + "\n…"
+    await message.answer("🔥 Profil:\n" + summary)
+    if prof.stacks:
+        name = time.strftime("profile-%Y%m%d-%H%M%S.collapsed.txt")
+        await message.answer_document(
+            BufferedInputFile(collapsed(prof).encode("utf-8"), filename=name),
+            caption="flamegraph.pl / speedscope uchun collapsed stacks",
+        )
+
+
+@router.message(Command("profil"))
+async def cmd_profil(message: Message, command: CommandObject, config: Config):
+    if message.chat.type != "private":
+        return
+    if not await is_owner(message, config):
+        return
+    arg = (command.args or "").strip()
+    if arg and not arg.isdigit():
+        await message.reply(f"Foydalanish: /profil [soniya, 1..{PROFILE_MAX_SEC}]")
+        return
+    seconds = max(1, min(int(arg or 10), PROFILE_MAX_SEC))
+    if _profiler.running:
+        await message.reply("⏳ Profil allaqachon yozilmoqda.")
+        return
+
+    _profiler.start()
+    task = asyncio.create_task(_profile_and_send(message, seconds))
+    _profile_tasks.add(task)
+    task.add_done_callback(_profile_tasks.discard)
+    await message.reply(f"▶️ {seconds} soniya profil yozilmoqda...")
+
+
+@router.message(Command("xotira"))
+async def cmd_xotira(message: Message, command: CommandObject, config: Config, memory_report: memstats.MemoryReport):
+    if message.chat.type != "private":
+        return
+    if not await is_owner(message, config):
+        return
+    arg = (command.args or "").strip().lower()
+
+    if arg == "top":
+        if memstats.start_tracing():
+            await message.reply("🔎 tracemalloc yoqildi. Biroz ishlasin, keyin yana /xotira top yuboring "
+                                "(o‘chirish: /xotira stop).")
+            return
+        lines = await asyncio.to_thread(memstats.top_allocators)
+        await message.answer("🔝 Eng ko‘p xotira (tracemalloc yoqilgandan beri):\n" + "\n".join(lines))
+        return
+    if arg == "stop":
+        memstats.stop_tracing()
+        await message.reply("✅ tracemalloc o‘chirildi.")
+        return
+    if arg:
+        await message.reply("Foydalanish: /xotira [top|stop]")
+        return
+
+    rows = sorted(memory_report.collect(), key=lambda r: -r[2])
+    traced = " (tracemalloc yoqiq)" if memstats.tracing() else ""
+    lines = [f"🧠 RSS {memstats.rss_bytes() / 1e6:.1f} MB{traced}", ""]
+    lines += [f"{size / 1e6:8.2f} MB {n:8d}  {name}" for name, n, size in rows]
+    await message.answer("\n".join(lines))
@@ -3,28 +3,25 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters import Command, CommandObject
-from aiogram.types import ChatPermissions
 
-from .guard import _normalize_for_badwords
 from ..config import Config
 from ..db import DB
 from .base import settings_text
 from ..utils.admin import is_admin
 from ..utils.access import is_owner, can_manage_bot, can_manage_chat
 from ..utils.moderation import unmute_user
-from ..utils.antiraid import AntiRaid
+from ..utils.ads_filter import invalidate_ads_classifier
+from ..utils.badwords import (
+    DICT_NAME_RE, MAX_DISTANCE, in_dicts, invalidate_badword_matcher, invalidate_shared_dict,
+    normalize_for_badwords, parse_dicts,
+)
+from ..utils.scripts import SCRIPT_LABELS, parse_scripts, script_labels
+from ..utils.domains import normalize_rule, invalidate_domain_policy
+from ..utils.raid_state import RaidKeeper
+from ..utils.raid_response import RaidResponder, RAID_ACTIONS
 
 router = Router()
 
-ALLOW_ALL = ChatPermissions(
-    can_send_messages=True,
-    can_send_media_messages=True,
-    can_send_polls=True,
-    can_send_other_messages=True,
-    can_add_web_page_previews=True,
-    can_invite_users=True,
-)
-
 CHANNEL_RE = re.compile(r"^@?[A-Za-z0-9_]{5,}$")
 
 _ignore_ctx: dict[int, int] = {} # admin_user_id -> chat_id
@@ -132,7 +129,7 @@ async def cmd_unlink_channel(message: Message, db: DB, config: Config):
     await message.reply("✅ Force kanal o‘chirildi.")
 
 @router.message(F.text.startswith("/limit"))
-async def cmd_limit(message: Message, db: DB, config: Config, antiraid: AntiRaid):
+async def cmd_limit(message: Message, db: DB, config: Config, raid_keeper: RaidKeeper):
     if not await can_manage_bot(message, db, config):
         return
 
@@ -149,16 +146,9 @@ async def cmd_limit(message: Message, db: DB, config: Config, antiraid: AntiRaid
     await db.update_settings(message.chat.id, raid_limit=v)
 
     if v == 0:
-        try:
-            antiraid.clear(message.chat.id)
-        except Exception:
-            pass
-
-        try:
-            await message.bot.set_chat_permissions(message.chat.id, ALLOW_ALL)
-        except Exception:
-            # botda ruxsat bo'lmasa ham limit 0 saqlanadi
-            pass
+        # chat ochiladi (best-effort), in-memory va DB holati tozalanadi;
+        # botda ruxsat bo'lmasa ham limit 0 saqlanadi
+        await raid_keeper.disable(message.chat.id)
 
         s = await db.get_or_create_settings(message.chat.id)
         await message.reply("✅ Anti-raid: OFF\n\n" + settings_text(s))
@@ -199,6 +189,35 @@ async def cmd_yopish(message: Message, db: DB, config: Config):
     s = await db.get_or_create_settings(message.chat.id)
     await message.reply("✅ Anti-raid yopish vaqti yangilandi.\n\n" + settings_text(s))
 
+@router.message(Command("raidjazo"))
+async def cmd_raidjazo(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    arg = _norm_arg(command.args)
+    if arg in ("o‘chir", "ochir"):
+        arg = "off"
+    if arg not in RAID_ACTIONS:
+        s = await db.get_or_create_settings(message.chat.id)
+        await message.reply(
+            "Foydalanish: /raidjazo ban | mute | off\n"
+            "Raid paytida kirganlar avtomatik ban/mute qilinadi.\n"
+            f"Hozirgi: {s.raid_action}"
+        )
+        return
+    await db.update_settings(message.chat.id, raid_action=arg)
+    s = await db.get_or_create_settings(message.chat.id)
+    await message.reply("✅ Anti-raid jazo yangilandi.\n\n" + settings_text(s))
+
+@router.message(Command("raidqaytar"))
+async def cmd_raidqaytar(message: Message, db: DB, config: Config, raid_responder: RaidResponder):
+    if not await _require_bot_admin(message, db, config):
+        return
+    n = await raid_responder.undo(message.chat.id)
+    if not n:
+        await message.reply("📭 Qaytariladigan raid jazosi yo‘q.")
+        return
+    await message.reply(f"↩️ Oxirgi raid jazosi bekor qilinmoqda: {n} ta akkaunt.")
+
 
 def _panel_kb(s) -> InlineKeyboardBuilder:
     kb = InlineKeyboardBuilder()
@@ -224,7 +243,7 @@ async def cmd_antiraidpanel(message: Message, db: DB, config: Config):
 
 
 @router.callback_query(F.data.startswith("ar:"))
-async def cb_antiraidpanel(query: CallbackQuery, db: DB, config: Config, antiraid: AntiRaid):
+async def cb_antiraidpanel(query: CallbackQuery, db: DB, config: Config, raid_keeper: RaidKeeper):
     if not query.message:
         return
 
@@ -254,17 +273,8 @@ async def cb_antiraidpanel(query: CallbackQuery, db: DB, config: Config, antirai
     if key == "limit" and delta == "set0":
         await db.update_settings(chat_id, raid_limit=0)
 
-        # чистим in-memory lock/joins, чтобы антираид реально "выключился"
-        try:
-            antiraid.clear(chat_id)
-        except Exception:
-            pass
-
-        # если чат был закрыт антираидом — откроем обратно (best-effort)
-        try:
-            await query.bot.set_chat_permissions(chat_id, ALLOW_ALL)
-        except Exception:
-            pass
+        # чистим lock/joins (память + snapshot) и открываем чат обратно (best-effort)
+        await raid_keeper.disable(chat_id)
 
         s = await db.get_or_create_settings(chat_id)
         await query.message.edit_text(
@@ -340,6 +350,42 @@ async def cmd_reklama(message: Message, db: DB, config: Config):
 async def cmd_arab(message: Message, db: DB, config: Config):
     await _toggle(message, db, "block_arab", "Arab blok", config)
 
+@router.message(Command("skript"))
+async def cmd_skript(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    words = (command.args or "").split()
+    if not words:
+        s = await db.get_or_create_settings(message.chat.id)
+        await message.reply(
+            f"Bloklangan yozuvlar: {script_labels(s.blocked_scripts or 0) or 'yo‘q'}"
+            f" (kamida {s.script_min_pct or 0}%)\n"
+            f"Foydalanish: /skript xitoy hind ... yoki /skript o‘chir\n"
+            f"Mavjud: {', '.join(SCRIPT_LABELS.values())}"
+        )
+        return
+    if _norm_arg(words[0]) in ("o‘chir", "ochir", "off"):
+        await db.update_settings(message.chat.id, blocked_scripts=0)
+        await message.reply("✅ Yozuv bloki: OFF")
+        return
+    mask, unknown = parse_scripts(words)
+    if unknown or not mask:
+        await message.reply(f"⚠️ Noma’lum yozuv: {', '.join(unknown) or '-'}\nMavjud: {', '.join(SCRIPT_LABELS.values())}")
+        return
+    await db.update_settings(message.chat.id, blocked_scripts=mask)
+    await message.reply(f"✅ Bloklangan yozuvlar: {script_labels(mask)}")
+
+@router.message(Command("skript_foiz"))
+async def cmd_skript_foiz(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    v = _parse_int(command.args or "", 0, 100)
+    if v is None:
+        await message.reply("Foydalanish: /skript_foiz 0..100\n0 — bitta harf ham yetarli, 50 — matnning yarmi")
+        return
+    await db.update_settings(message.chat.id, script_min_pct=v)
+    await message.reply(f"✅ Yozuv bloki chegarasi: {v}%")
+
 @router.message(F.text.startswith("/sokin"))
 async def cmd_sokin(message: Message, db: DB, config: Config):
     await _toggle(message, db, "block_swear", "So'kinish blok", config)
@@ -379,6 +425,71 @@ async def cmd_rek_limit(message: Message, command: CommandObject, db: DB, config
     s = await db.get_or_create_settings(message.chat.id)
     await message.reply(f"✅ Reklama limiti yangilandi: {s.ads_daily_limit}/kun")
 
+def _parse_weight(arg: str, min_v: float, max_v: float) -> float | None:
+    try:
+        v = float((arg or "").strip().replace(",", "."))
+    except ValueError:
+        return None
+    if v < min_v or v > max_v:
+        return None
+    return v
+
+@router.message(Command("rek_chegara"))
+async def cmd_rek_chegara(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    v = _parse_weight(command.args or "", 0.4, 10.0)
+    if v is None:
+        s = await db.get_or_create_settings(message.chat.id)
+        await message.reply(
+            f"Foydalanish: /rek_chegara <son> (0.4..10). Hozir: {s.ads_threshold:g}\n"
+            "Reklama so‘zi = 1, havola = 0.4, havola bilan kuchsiz so‘z = 0.6.\n"
+            "Masalan: /rek_chegara 2 — kamida ikki belgi bo‘lsa reklama."
+        )
+        return
+    await db.update_settings(message.chat.id, ads_threshold=v)
+    await message.reply(f"✅ Reklama chegarasi: {v:g}")
+
+@router.message(Command("rekqosh"))
+async def cmd_rekqosh(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    parts = (command.args or "").split()
+    word = parts[0].lower() if parts else ""
+    weight = _parse_weight(parts[1], 0.0, 5.0) if len(parts) > 1 else 1.0
+    if not re.fullmatch(r"\w{2,30}", word) or weight is None:
+        await message.reply("Foydalanish: /rekqosh so‘z [og‘irlik 0..5]\nMasalan: /rekqosh kurs 0.6")
+        return
+    await db.set_ads_keyword(message.chat.id, word, weight)
+    invalidate_ads_classifier(message.chat.id)
+    await message.reply(f"✅ Reklama so‘zi: '{word}' (og‘irlik {weight:g})")
+
+@router.message(Command("rekdel"))
+async def cmd_rekdel(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    word = (command.args or "").strip().lower()
+    if not word:
+        await message.reply("Foydalanish: /rekdel so‘z")
+        return
+    ok = await db.remove_ads_keyword(message.chat.id, word)
+    invalidate_ads_classifier(message.chat.id)
+    await message.reply(f"✅ O‘chirildi: '{word}'" if ok else "⚠️ Bunday so‘z yo‘q.")
+
+@router.message(Command("reklist"))
+async def cmd_reklist(message: Message, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    words = await db.list_ads_keywords(message.chat.id, limit=100)
+    s = await db.get_or_create_settings(message.chat.id)
+    if not words:
+        await message.reply(f"📭 Qo‘shimcha reklama so‘zlari yo‘q. Chegara: {s.ads_threshold:g}")
+        return
+    txt = f"📌 Reklama so‘zlari (chegara {s.ads_threshold:g}):\n" + "\n".join(
+        f"• '{w}' — {weight:g}" for w, weight in sorted(words)
+    )
+    await message.reply(txt)
+
 
 @router.message(Command("settime"))
 async def cmd_settime(message: Message, command: CommandObject, db: DB, config: Config):
@@ -445,12 +556,14 @@ async def cmd_yomonqosh(message: Message, db: DB, config: Config):
         await message.reply("Foydalanish: /yomonqosh so‘z")
         return
 
-    word = _normalize_for_badwords(parts[1])
+    word = normalize_for_badwords(parts[1], fold=False)
     if len(word) < 2 or len(word) > 30:
         await message.reply("So‘z uzunligi 2..30 oralig‘ida bo‘lsin.")
         return
 
     ok = await db.add_bad_word(message.chat.id, word)
+    await db.set_bad_word_allow(message.chat.id, word, False)  # если было исключением из lug‘at
+    invalidate_badword_matcher(message.chat.id)
     if ok:
         await message.reply(f"✅ Yomon so‘z qo‘shildi: '{word}'")
     else:
@@ -465,21 +578,164 @@ async def cmd_yomondel(message: Message, db: DB, config: Config):
     if len(parts) < 2:
         await message.reply("Foydalanish: /yomondel so‘z")
         return
-    word = _normalize_for_badwords(parts[1])
+    word = normalize_for_badwords(parts[1], fold=False)
     await db.remove_bad_word(message.chat.id, word)
-    await message.reply(f"✅ O‘chirildi: '{word}'")
+    # слово из подписанного словаря: у словаря не удаляем, а разрешаем в этом чате
+    s = await db.get_or_create_settings(message.chat.id)
+    dicts = parse_dicts(s.bad_dicts)
+    allowed = bool(dicts) and await in_dicts(db, word, dicts)
+    if allowed:
+        await db.set_bad_word_allow(message.chat.id, word, True)
+    invalidate_badword_matcher(message.chat.id)
+    await message.reply(f"✅ O‘chirildi: '{word}'" + (" (lug‘atdan — bu guruhda ruxsat)" if allowed else ""))
 
 @router.message(F.text == "/yomonlist")
 async def cmd_yomonlist(message: Message, db: DB, config: Config):
     if not await can_manage_bot(message, db, config):
         return
     words = await db.list_bad_words(message.chat.id, limit=100)
-    if not words:
+    s = await db.get_or_create_settings(message.chat.id)
+    dicts = parse_dicts(s.bad_dicts)
+    if not words and not dicts:
         await message.reply("📭 Yomon so‘zlar ro‘yxati bo‘sh.")
         return
-    txt = "📌 Yomon so‘zlar:\n" + "\n".join(f"• '{w}'" for w in words)
+    txt = "📌 Yomon so‘zlar:\n" + ("\n".join(f"• '{w}'" for w in words) or "—")
+    if dicts:
+        allows = await db.list_bad_word_allows(message.chat.id, limit=50)
+        txt += f"\n\n📚 Lug‘atlar: {', '.join(dicts)}"
+        if allows:
+            txt += "\n✅ Ruxsat: " + ", ".join(f"'{w}'" for w in allows)
     await message.reply(txt)
 
+@router.message(Command("yomon_xato"))
+async def cmd_yomon_xato(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    v = _parse_int(command.args or "", 0, MAX_DISTANCE)
+    if v is None:
+        await message.reply(
+            f"Foydalanish: /yomon_xato 0..{MAX_DISTANCE}\n"
+            "0 — faqat aniq so‘z, 1 — bitta harf xato (s0kish, sukaa) ham ushlanadi"
+        )
+        return
+    await db.update_settings(message.chat.id, swear_fuzzy=v)
+    await message.reply(f"✅ Yomon so‘zlar: {v} harfgacha xato ham ushlanadi" if v else "✅ Yomon so‘zlar: faqat aniq moslik")
+
+@router.message(Command("lugat"))
+async def cmd_lugat(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    available = dict(await db.list_global_bad_dicts())
+    arg = (command.args or "").strip().lower()
+    if not arg:
+        s = await db.get_or_create_settings(message.chat.id)
+        have = ", ".join(f"{n} ({c})" for n, c in available.items()) or "yo‘q"
+        await message.reply(
+            f"📚 Umumiy yomon so‘z lug‘atlari: {have}\n"
+            f"Bu guruhda: {', '.join(parse_dicts(s.bad_dicts)) or 'OFF'}\n\n"
+            "Foydalanish: /lugat uz ru — ulash, /lugat off — o‘chirish"
+        )
+        return
+    dicts = () if arg in ("off", "o‘chir", "ochir") else parse_dicts(arg)
+    unknown = [n for n in dicts if n not in available]
+    if unknown or (not dicts and arg not in ("off", "o‘chir", "ochir")):
+        await message.reply(f"⚠️ Bunday lug‘at yo‘q: {', '.join(unknown) or arg}. Bor: {', '.join(available) or '—'}")
+        return
+    await db.update_settings(message.chat.id, bad_dicts=",".join(dicts))
+    invalidate_badword_matcher(message.chat.id)
+    await message.reply(f"✅ Lug‘atlar: {', '.join(dicts)}" if dicts else "✅ Lug‘atlar o‘chirildi")
+
+@router.message(Command("glugat_qosh"))
+async def cmd_glugat_qosh(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await is_owner(message, config):
+        return
+    parts = re.split(r"[\s,]+", (command.args or "").strip())
+    name = parts[0].lower() if parts else ""
+    words = [w for w in (normalize_for_badwords(p, fold=False) for p in parts[1:]) if 2 <= len(w) <= 30]
+    if not DICT_NAME_RE.match(name) or not words:
+        await message.reply("Foydalanish: /glugat_qosh uz so‘z1 so‘z2 ...\n(lug‘at nomi: 2..16 lotin harf)")
+        return
+    added = await db.add_global_bad_words(name, words)
+    invalidate_shared_dict(name)
+    await message.reply(f"✅ '{name}' lug‘atiga {added} ta so‘z qo‘shildi")
+
+@router.message(Command("glugat_del"))
+async def cmd_glugat_del(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await is_owner(message, config):
+        return
+    parts = (command.args or "").split(maxsplit=1)
+    if len(parts) < 2:
+        await message.reply("Foydalanish: /glugat_del uz so‘z")
+        return
+    name, word = parts[0].lower(), normalize_for_badwords(parts[1], fold=False)
+    ok = await db.remove_global_bad_word(name, word)
+    invalidate_shared_dict(name)
+    await message.reply(f"✅ O‘chirildi: '{word}'" if ok else "⚠️ Bunday so‘z yo‘q.")
+
+@router.message(Command("glugatlar"))
+async def cmd_glugatlar(message: Message, db: DB, config: Config):
+    if not await is_owner(message, config):
+        return
+    dicts = await db.list_global_bad_dicts()
+    await message.reply(
+        "📚 Lug‘atlar:\n" + "\n".join(f"• {n}: {c} ta so‘z" for n, c in dicts) if dicts else "📭 Lug‘atlar yo‘q."
+    )
+
+
+async def _domain_rule(message: Message, command: CommandObject, db: DB, config: Config, allow: bool):
+    if not await _require_bot_admin(message, db, config):
+        return
+    name = "/ruxsat" if allow else "/taqiq"
+    arg = (command.args or "").strip()
+    if not arg:
+        await message.reply(f"Foydalanish: {name} sayt.uz yoki {name} t.me/kanal")
+        return
+    pattern = normalize_rule(arg)
+    if not pattern:
+        await message.reply("⚠️ Domen noto‘g‘ri. Misol: sayt.uz, t.me/kanal, @kanal")
+        return
+    await db.set_domain_rule(message.chat.id, pattern, allow)
+    invalidate_domain_policy(message.chat.id)
+    if allow:
+        await message.reply(f"✅ Ruxsat berildi: {pattern}\n(boshqa havolalar /ssilka yoq bo‘lsa bloklanadi)",
+                            disable_web_page_preview=True)
+    else:
+        await message.reply(f"⛔ Taqiqlandi: {pattern}", disable_web_page_preview=True)
+
+@router.message(Command("ruxsat"))
+async def cmd_ruxsat(message: Message, command: CommandObject, db: DB, config: Config):
+    await _domain_rule(message, command, db, config, allow=True)
+
+@router.message(Command("taqiq"))
+async def cmd_taqiq(message: Message, command: CommandObject, db: DB, config: Config):
+    await _domain_rule(message, command, db, config, allow=False)
+
+@router.message(Command("domendel"))
+async def cmd_domendel(message: Message, command: CommandObject, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    pattern = normalize_rule(command.args or "")
+    if not pattern:
+        await message.reply("Foydalanish: /domendel sayt.uz")
+        return
+    ok = await db.remove_domain_rule(message.chat.id, pattern)
+    invalidate_domain_policy(message.chat.id)
+    await message.reply(f"✅ O‘chirildi: {pattern}" if ok else "⚠️ Bunday qoida yo‘q.",
+                        disable_web_page_preview=True)
+
+@router.message(Command("domenlar"))
+async def cmd_domenlar(message: Message, db: DB, config: Config):
+    if not await _require_bot_admin(message, db, config):
+        return
+    rules = await db.list_domain_rules(message.chat.id, limit=100)
+    if not rules:
+        await message.reply("📭 Domen qoidalari yo‘q.")
+        return
+    txt = "📌 Domen qoidalari:\n" + "\n".join(
+        f"{'✅' if allow else '⛔'} {pattern}" for pattern, allow in sorted(rules)
+    )
+    await message.reply(txt, disable_web_page_preview=True)
+
 
 @router.message(Command("add"))
 async def cmd_add(message: Message, command: CommandObject, db: DB, config: Config):
@@ -1,40 +1,173 @@
-# app/main.py
 import asyncio
+from typing import Callable, Optional
+
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.utils.text_repeater import TextRepeater
-from .config import load_config
+from .config import Config, load_config
 from .db import DB
-from .handlers import base, settings, guard, ads
+from .handlers import base, settings, guard, ads, owner
+from .webhook import run_webhook
 from .utils.antiflood import AntiFlood
 from .utils.antiraid import AntiRaid
+from .utils.raid_state import RaidKeeper
+from .utils.raid_response import RaidResponder
+from .utils.outbound import Outbound
+from .utils.joinindex import JoinIndex
+from .utils.update_pool import UpdatePool
+from .utils.http import build_bot
+from .utils import admin, ads_filter, badwords, domains, looplag, memstats, metrics, scripts, textfold
+
+
+def include_routers(dp: Dispatcher) -> None:
+    dp.include_router(base.router)
+    dp.include_router(settings.router)
+    dp.include_router(guard.router)
+    dp.include_router(ads.router)
+    dp.include_router(owner.router)
 
-async def main():
-    cfg = load_config()
-    db = DB(cfg.database_url)
-    await db.init_models()
 
-    bot = Bot(cfg.bot_token)
+def track_memory(report: memstats.MemoryReport, dp: Dispatcher) -> None:
+    # порядок важен: общие объекты засчитываются первой структуре (глобальные словари до чатов)
+    report.track("textfold.FOLD_TABLE", lambda: textfold.FOLD_TABLE)
+    report.track("scripts._TABLE", lambda: scripts._TABLE)
+    report.track("badwords._shared", lambda: badwords._shared)
+    report.track("badwords._matchers", lambda: badwords._matchers)
+    report.track("ads_filter._classifiers", lambda: ads_filter._classifiers)
+    report.track("domains._policies", lambda: domains._policies)
+    report.track("admin._admins", lambda: admin._admins)
+    report.track("guard._last_touch", lambda: guard._last_touch)
+    report.track("guard._last_user_touch", lambda: guard._last_user_touch)
+    report.track("guard._media_cache", lambda: guard._media_cache)
+    report.track("guard._album_warned", lambda: guard._album_warned)
+    report.track("settings._ignore_ctx", lambda: settings._ignore_ctx)
+    report.track("base._ig_pending", lambda: base._ig_pending)
+    report.track("antiflood", lambda: dp["antiflood"]._data)
+    report.track("antiraid", lambda: dp["antiraid"]._chats)
+    report.track("join_index", lambda: dp["join_index"]._recent)
+    report.track("text_repeater", lambda: dp["text_repeater"]._tasks)
+    report.track("fsm_storage", lambda: dp.storage.storage)
+
+
+def allowed_updates(dp: Dispatcher) -> list:
+    used = set(dp.resolve_used_update_types())
+    used.add("chat_member")
+    return list(used)
+
+
+async def build_dispatcher(
+    cfg: Config,
+    db: DB,
+    bot: Bot,
+    owns: Optional[Callable[[int], bool]] = None,
+    metrics_port: Optional[int] = None,
+) -> Dispatcher:
+    """
+    Full handling stack: in-memory state, restore from DB, routers, update pool.
+    owns: chat_id shard filter for restore (sharded mode), None = all chats.
+    metrics_port: /metrics port, None = cfg.metrics_port (0 = off).
+    """
     dp = Dispatcher(storage=MemoryStorage())
 
     dp["db"] = db
     dp["antiflood"] = AntiFlood()
-    dp["antiraid"] = AntiRaid()
+    antiraid = AntiRaid()
+    dp["antiraid"] = antiraid
     dp["config"] = cfg
 
+    raid_keeper = RaidKeeper(bot, db, antiraid)
+    dp["raid_keeper"] = raid_keeper
+    await raid_keeper.restore_from_db(owns=owns)
+    raid_keeper.start()
+    dp.shutdown.register(raid_keeper.flush)
+
+    outbound = Outbound(rate=20)
+    dp["outbound"] = outbound
+    dp["raid_responder"] = RaidResponder(bot, db, outbound, antiraid)
+    dp["join_index"] = JoinIndex(
+        window_sec=cfg.coord_join_window_sec,
+        min_chats=cfg.coord_join_chats,
+    )
+
     repeater = TextRepeater(bot, db)
     dp["text_repeater"] = repeater
-    await repeater.restore_from_db()
+    await repeater.restore_from_db(owns=owns)
 
-    dp.include_router(base.router)
-    dp.include_router(settings.router)
-    dp.include_router(guard.router)
-    dp.include_router(ads.router)
+    include_routers(dp)
 
-    used = set(dp.resolve_used_update_types())
-    used.add("chat_member")
-    await dp.start_polling(bot, allowed_updates=list(used))
+    loop_monitor = looplag.LoopMonitor(lag_threshold_ms=cfg.loop_lag_ms, slow_handler_ms=cfg.slow_handler_ms)
+    dp["loop_monitor"] = loop_monitor
+    if cfg.slow_handler_ms > 0:
+        looplag.install(dp, loop_monitor)
+    dp.startup.register(loop_monitor.start)
+    dp.shutdown.register(loop_monitor.close)
+
+    memory = memstats.MemoryReport(interval=cfg.memory_log_sec)
+    track_memory(memory, dp)
+    dp["memory_report"] = memory
+    dp.startup.register(memory.start)
+    dp.shutdown.register(memory.close)
+
+    if cfg.update_workers > 0:
+        pool = UpdatePool(
+            workers=cfg.update_workers,
+            max_in_flight=cfg.update_max_in_flight,
+            shed_depth=cfg.update_shed_depth,
+            member_workers=cfg.update_member_workers,
+            command_workers=cfg.update_command_workers,
+            max_backlog=cfg.update_max_backlog,
+        )
+        dp["update_pool"] = pool
+        dp.update.outer_middleware(pool)
+        pool.start()
+        dp.shutdown.register(pool.close)
+
+    port = cfg.metrics_port if metrics_port is None else metrics_port
+    if port > 0:
+        # после пула: время в очереди не входит в bot_update_seconds (оно в bot_lane_wait_seconds)
+        metrics.install(dp, bot, db)
+        runner = None
+
+        async def _metrics_start():
+            nonlocal runner
+            runner = await metrics.serve(cfg.metrics_host, port)
+
+        async def _metrics_stop():
+            if runner is not None:
+                await runner.cleanup()
+
+        dp.startup.register(_metrics_start)
+        dp.shutdown.register(_metrics_stop)
+
+    return dp
+
+
+async def run_ingress(dp: Dispatcher, bot: Bot, cfg: Config, used: list) -> None:
+    if cfg.run_mode == "webhook":
+        await run_webhook(dp, bot, cfg, allowed_updates=used)
+        return
+
+    # webhook из прошлого запуска мешает getUpdates
+    await bot.delete_webhook(drop_pending_updates=False)
+    # с пулом / шардами polling ждёт, пока пул (max_backlog) или шард примет апдейт — это и есть backpressure
+    handle_as_tasks = dp.get("update_pool") is None and dp.get("shard_router") is None
+    await dp.start_polling(bot, allowed_updates=used, handle_as_tasks=handle_as_tasks)
+
+
+async def main():
+    cfg = load_config()
+    db = DB(cfg.database_url)
+    await db.init_models()
+
+    if cfg.shards > 1:
+        from .sharding import run_supervisor
+        await run_supervisor(cfg)
+        return
+
+    bot = build_bot(cfg)
+    dp = await build_dispatcher(cfg, db, bot)
+    await run_ingress(dp, bot, cfg, allowed_updates(dp))
 
 if __name__ == "__main__":
     asyncio.run(main())
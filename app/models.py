@@ -1,7 +1,7 @@
 from datetime import date, datetime
 
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import BigInteger, Integer, Boolean, String, UniqueConstraint, Date, DateTime, Text
+from sqlalchemy import BigInteger, Integer, Boolean, String, UniqueConstraint, Date, DateTime, Text, Float
 
 
 class Base(DeclarativeBase):
@@ -23,12 +23,17 @@ class ChatSettings(Base):
     block_links: Mapped[bool] = mapped_column(Boolean, default=False)      # /ssilka
     block_ads: Mapped[bool] = mapped_column(Boolean, default=False)        # /reklama
     block_arab: Mapped[bool] = mapped_column(Boolean, default=False)       # /arab
+    blocked_scripts: Mapped[int] = mapped_column(Integer, default=0)       # /skript (биты app/utils/scripts.py)
+    script_min_pct: Mapped[int] = mapped_column(Integer, default=0)        # /skript_foiz, 0 = любая буква
     block_swear: Mapped[bool] = mapped_column(Boolean, default=False)      # /sokin
+    swear_fuzzy: Mapped[int] = mapped_column(Integer, default=0)           # /yomon_xato: 0..2 опечатки
+    bad_dicts: Mapped[str] = mapped_column(String(128), default="")        # /lugat: "ru,uz" (GlobalBadWord.dict_name)
     block_channel_posts: Mapped[bool] = mapped_column(Boolean, default=False)  # /kanalpost
     hide_service_msgs: Mapped[bool] = mapped_column(Boolean, default=False)    # /xizmat
 
     # реклама лимит
     ads_daily_limit: Mapped[int] = mapped_column(Integer, default=20)
+    ads_threshold: Mapped[float] = mapped_column(Float, default=1.0)  # /rek_chegara
 
     # antiflood
     antiflood_enabled: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -39,6 +44,7 @@ class ChatSettings(Base):
     raid_limit: Mapped[int] = mapped_column(Integer, default=200)     # /limit
     raid_window_min: Mapped[int] = mapped_column(Integer, default=1)  # /oyna
     raid_close_min: Mapped[int] = mapped_column(Integer, default=10)  # /yopish
+    raid_action: Mapped[str] = mapped_column(String(16), default="off")  # /raidjazo off|mute|ban
 
     # force add / subscribe
     force_add_enabled: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -102,6 +108,55 @@ class BadWord(Base):
     )
 
 
+class GlobalBadWord(Base):
+    """
+    Shared bad-word dictionaries ("uz", "ru", ...) filled by the owner; chats subscribe with /lugat.
+    """
+    __tablename__ = "global_bad_words"
+    dict_name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    word: Mapped[str] = mapped_column(String(64), primary_key=True)  # normalize_for_badwords(fold=False)
+
+
+class GlobalBadDict(Base):
+    """
+    Version of each shared dictionary, bumped on every change: other shards
+    compare it to rebuild their cached matchers (badwords._check_dict_versions).
+    """
+    __tablename__ = "global_bad_dicts"
+    dict_name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class BadWordAllow(Base):
+    """
+    Per-chat exceptions: words of subscribed dictionaries the chat allows (/yomondel).
+    """
+    __tablename__ = "bad_word_allow"
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    word: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+
+class AdsKeyword(Base):
+    """
+    Per-chat extra ads keywords (word stem + weight) on top of the built-in list.
+    """
+    __tablename__ = "ads_keywords"
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    word: Mapped[str] = mapped_column(String(64), primary_key=True)  # normalize_text
+    weight: Mapped[float] = mapped_column(Float, default=1.0)
+
+
+class DomainRule(Base):
+    """
+    Per-chat link rules: "sayt.uz" or "t.me/kanal", allow=True -> /ruxsat, False -> /taqiq.
+    """
+    __tablename__ = "domain_rules"
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    pattern: Mapped[str] = mapped_column(String(255), primary_key=True)  # нормализованный host[/path]
+    allow: Mapped[bool] = mapped_column(Boolean, default=True)
+
+
 class ForceAddProgress(Base):
     __tablename__ = "force_add_progress"
     chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
@@ -181,3 +236,33 @@ class IgnoreUsername(Base):
     chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     username: Mapped[str] = mapped_column(String(64), primary_key=True)
 
+
+class RaidSnapshot(Base):
+    """
+    Anti-raid holati (restartdan keyin tiklash uchun):
+    join korzinalari, yopilish muddati va yopishdan oldingi ruxsatlar.
+    """
+    __tablename__ = "raid_snapshots"
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    buckets_json: Mapped[str] = mapped_column(Text, default="[]")
+    bucket_width: Mapped[float] = mapped_column(Float, default=1.0)
+    head: Mapped[int] = mapped_column(BigInteger, default=0)
+    locked_until: Mapped[float] = mapped_column(Float, default=0.0)  # unix time, 0 = ochiq
+    prev_perms_json: Mapped[str] = mapped_column(Text, default="")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class RaidBatch(Base):
+    """
+    Anti-raid paytida ban/mute qilingan akkauntlar (/raidqaytar uchun).
+    """
+    __tablename__ = "raid_batches"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    raid_id: Mapped[int] = mapped_column(BigInteger, default=0)      # bitta raidning batchlari (0 = eski yozuv)
+    action: Mapped[str] = mapped_column(String(16), default="mute")  # "mute" | "ban"
+    user_ids_json: Mapped[str] = mapped_column(Text, default="[]")   # faqat muvaffaqiyatli bajarilganlar
+    undone: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
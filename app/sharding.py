@@ -0,0 +1,205 @@
+# app/sharding.py
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+
+from .config import Config, load_config
+from .db import DB
+from .main import allowed_updates, build_dispatcher, include_routers, run_ingress
+from .utils.http import build_bot
+from .utils.update_pool import update_chat_id
+
+_WATCH_SEC = 5
+
+
+def shard_of(chat_id: int, shards: int) -> int:
+    return chat_id % shards
+
+
+class ShardRouter(BaseMiddleware):
+    """
+    Ingress side: update -> JSON -> pipe of the worker owning chat_id % shards.
+    One sender thread per pipe keeps per-chat order; a full pipe makes the
+    middleware wait, so polling (handle_as_tasks=False) stops fetching.
+    """
+
+    def __init__(self, conns: List[Connection]):
+        self.conns = list(conns)
+        self._senders = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard{i}") for i in range(len(conns))
+        ]
+        self.sent = [0] * len(conns)
+        self.dropped = 0
+
+    def replace(self, idx: int, conn: Connection) -> None:
+        self.conns[idx] = conn
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        idx = shard_of(update_chat_id(data), len(self.conns))
+        raw = event.model_dump_json(exclude_unset=True).encode()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._senders[idx], self.conns[idx].send_bytes, raw)
+            self.sent[idx] += 1
+        except (OSError, EOFError, ValueError) as e:
+            # воркер упал — супервизор перезапустит, апдейт теряем
+            self.dropped += 1
+            print(f"[shard] send to shard={idx} failed update={event.update_id}: {type(e).__name__}: {e}")
+        return None
+
+    def close(self) -> None:
+        for ex in self._senders:
+            ex.shutdown(wait=True)
+        for conn in self.conns:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+def _worker_main(idx: int, shards: int, conn: Connection) -> None:
+    # Ctrl+C ловит супервизор; воркер завершается по EOF в pipe
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker(idx, shards, conn))
+
+
+async def _feed(dp: Dispatcher, bot: Bot, update: Update, sem: asyncio.Semaphore | None = None) -> None:
+    try:
+        await dp.feed_update(bot, update)
+    except Exception as e:
+        print(f"[shard] update={update.update_id} failed: {type(e).__name__}: {e}")
+    finally:
+        if sem is not None:
+            sem.release()
+
+
+async def _worker(idx: int, shards: int, conn: Connection) -> None:
+    cfg = load_config()
+    db = DB(cfg.database_url)  # init_models уже сделал супервизор
+    bot = build_bot(cfg)
+    dp = await build_dispatcher(
+        cfg, db, bot,
+        owns=lambda chat_id: shard_of(chat_id, shards) == idx,
+        metrics_port=cfg.metrics_port + idx if cfg.metrics_port > 0 else 0,
+    )
+    dp["shard"] = idx
+
+    loop = asyncio.get_running_loop()
+    inbox: "asyncio.Queue[bytes | None]" = asyncio.Queue(maxsize=max(1, cfg.update_max_in_flight))
+
+    def reader() -> None:
+        try:
+            while True:
+                raw = conn.recv_bytes()
+                # блокируемся, пока очередь полна -> pipe заполняется -> ingress ждёт
+                asyncio.run_coroutine_threadsafe(inbox.put(raw), loop).result()
+        except (EOFError, OSError):
+            pass
+        finally:
+            asyncio.run_coroutine_threadsafe(inbox.put(None), loop)
+
+    threading.Thread(target=reader, name=f"shard{idx}-reader", daemon=True).start()
+    print(f"[shard] worker {idx}/{shards} ready")
+
+    workflow = {**dp.workflow_data, "bot": bot, "dispatcher": dp}
+    await dp.emit_startup(**workflow)
+    pooled = dp.get("update_pool") is not None
+    sem = asyncio.Semaphore(max(1, cfg.update_max_in_flight))
+    tasks: set = set()
+    try:
+        while True:
+            raw = await inbox.get()
+            if raw is None:
+                break
+            try:
+                update = Update.model_validate_json(raw, context={"bot": bot})
+            except ValueError as e:
+                print(f"[shard] worker {idx} bad update: {e}")
+                continue
+            if pooled:
+                # пул сам держит порядок и backpressure
+                await _feed(dp, bot, update)
+                continue
+            await sem.acquire()
+            task = asyncio.create_task(_feed(dp, bot, update, sem))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks, timeout=10)
+    finally:
+        await dp.emit_shutdown(**workflow)
+        await bot.session.close()
+        print(f"[shard] worker {idx} stopped")
+
+
+async def run_supervisor(cfg: Config) -> None:
+    """
+    One ingress (polling or webhook) + cfg.shards worker processes.
+    All per-chat state (antiflood, antiraid, anti-same, caches) is local to the owning worker.
+    """
+    ctx = mp.get_context("spawn")
+    shards = cfg.shards
+    procs: List[Any] = [None] * shards
+    conns: List[Any] = [None] * shards
+
+    def spawn(i: int) -> None:
+        recv_conn, send_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_worker_main, args=(i, shards, recv_conn), name=f"shard-{i}", daemon=True)
+        proc.start()
+        recv_conn.close()
+        procs[i] = proc
+        conns[i] = send_conn
+
+    for i in range(shards):
+        spawn(i)
+
+    router = ShardRouter(conns)
+
+    async def watch() -> None:
+        try:
+            while True:
+                await asyncio.sleep(_WATCH_SEC)
+                for i, proc in enumerate(procs):
+                    if proc.is_alive():
+                        continue
+                    print(f"[shard] worker {i} exited code={proc.exitcode}, restarting")
+                    try:
+                        conns[i].close()
+                    except OSError:
+                        pass
+                    spawn(i)
+                    router.replace(i, conns[i])
+        except asyncio.CancelledError:
+            return
+
+    watcher = asyncio.create_task(watch())
+
+    async def stop() -> None:
+        watcher.cancel()
+        loop = asyncio.get_running_loop()
+        # закрытие pipe = EOF у воркера: он дорабатывает очередь и сохраняет состояние
+        await loop.run_in_executor(None, router.close)
+        for proc in procs:
+            await loop.run_in_executor(None, proc.join, 15)
+            if proc.is_alive():
+                proc.terminate()
+
+    bot = build_bot(cfg)
+    dp = Dispatcher()
+    # роутеры нужны ingress только для allowed_updates, хендлеры тут не вызываются
+    include_routers(dp)
+    dp["shard_router"] = router
+    dp.update.outer_middleware(router)
+    dp.shutdown.register(stop)
+
+    print(f"[shard] supervisor: {shards} workers, ingress={cfg.run_mode}")
+    await run_ingress(dp, bot, cfg, allowed_updates(dp))
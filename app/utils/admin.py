@@ -1,6 +1,37 @@
+import time
+from typing import Dict, Tuple
+
 from aiogram import Bot
 from aiogram.types import ChatMemberAdministrator, ChatMemberOwner
 
+from .metrics import METRICS
+
+ADMIN_TTL_SEC = 60.0
+_ADMIN_CACHE_MAX = 50_000   # при переполнении кэш сбрасывается целиком
+
+# (chat_id, user_id) -> (истекает, админ?); сбрасывается по chat_member апдейтам
+_admins: Dict[Tuple[int, int], Tuple[float, bool]] = {}
+
+
 async def is_admin(bot: Bot, chat_id: int, user_id: int) -> bool:
+    """
+    getChatMember with a short per-(chat, user) cache: guard_all asks this for
+    every message. Errors are not cached.
+    """
+    key = (chat_id, user_id)
+    now = time.monotonic()
+    hit = _admins.get(key)
+    if hit is not None and hit[0] > now:
+        METRICS.cache("is_admin", True)
+        return hit[1]
+    METRICS.cache("is_admin", False)
     member = await bot.get_chat_member(chat_id, user_id)
-    return isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
+    res = isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
+    if len(_admins) >= _ADMIN_CACHE_MAX:
+        _admins.clear()
+    _admins[key] = (now + ADMIN_TTL_SEC, res)
+    return res
+
+
+def invalidate_admin(chat_id: int, user_id: int) -> None:
+    _admins.pop((chat_id, user_id), None)
@@ -0,0 +1,106 @@
+# app/utils/ads_filter.py
+from __future__ import annotations
+import re
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from .metrics import METRICS
+from .textfold import fold_text
+
+# ключи — основы слов: совпадение только с начала слова ("admin" ловит "adminga",
+# но не "badminton"), окончания не важны (узбекский/русский — много суффиксов)
+ADS_STRONG = {"reklama", "реклам", "obuna", "подпиш", "подписыва", "канал", "kanal", "daromad", "даромад", "pul", "деньг", "доход", "заработ", "работ", "admin", "админ", }
+ADS_WEAK = {"ish", "tg", "telegram"}
+
+STRONG_WEIGHT = 1.0
+WEAK_WEIGHT = 0.6       # считается только при наличии ссылки
+LINK_BONUS = 0.4
+DEFAULT_THRESHOLD = 1.0  # strong-слово или ссылка + weak-слово, как раньше
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Keyword alternation folded into a prefix trie: "(?:admin|р(?:абот|еклам))".
+    At each position re tries one branch per distinct next char.
+    """
+    root: Dict[str, dict] = {}
+    for w in words:
+        node = root
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        if len(alts) == 1 and "" not in node:
+            return alts[0]
+        # "" в узле = слово кончается здесь; длинные ветки всё равно пробуются первыми
+        return "(?:" + "|".join(alts) + ")" + ("?" if "" in node else "")
+
+    return build(root)
+
+
+class AdsClassifier:
+    """
+    Weighted keyword scoring over already normalized text (normalize_text).
+    One finditer pass of a trie-compiled regex; a hit counts only at a word
+    start and each keyword counts once. Weak keywords need a link.
+    Keywords are folded with fold_text, same as the text.
+    """
+    def __init__(self, strong: Iterable[str] = ADS_STRONG, weak: Iterable[str] = ADS_WEAK,
+                 extra: Optional[Mapping[str, float]] = None):
+        # keyword -> (вес, только со ссылкой)
+        self.weights: Dict[str, Tuple[float, bool]] = {}
+        for w in weak:
+            self.weights[fold_text(w)] = (WEAK_WEIGHT, True)
+        for w in strong:
+            self.weights[fold_text(w)] = (STRONG_WEIGHT, False)
+        for w, weight in (extra or {}).items():
+            self.weights[fold_text(w)] = (float(weight), False)
+        words = [w for w in self.weights if w]
+        self._re = re.compile(_trie_pattern(words)) if words else None
+
+    def score(self, norm: str, link: bool, stop_at: float = float("inf")) -> float:
+        total = LINK_BONUS if link else 0.0
+        if self._re is None or total >= stop_at:
+            return total
+        seen = set()
+        for m in self._re.finditer(norm):
+            i = m.start()
+            if i and (norm[i - 1].isalnum() or norm[i - 1] == "_"):
+                continue
+            key = m.group()
+            if key in seen:
+                continue
+            seen.add(key)
+            weight, needs_link = self.weights[key]
+            if needs_link and not link:
+                continue
+            total += weight
+            if total >= stop_at:
+                break
+        return total
+
+    def is_ads(self, norm: str, link: bool, threshold: float = DEFAULT_THRESHOLD) -> bool:
+        return self.score(norm, link, stop_at=threshold) >= threshold
+
+
+DEFAULT_ADS = AdsClassifier()
+
+# chat_id -> классификатор с доп. словами чата; сбрасывается /rekqosh /rekdel
+_classifiers: Dict[int, AdsClassifier] = {}
+
+
+async def get_ads_classifier(db, chat_id: int) -> AdsClassifier:
+    clf = _classifiers.get(chat_id)
+    METRICS.cache("ads_classifier", clf is not None)
+    if clf is None:
+        extra = dict(await db.list_ads_keywords(chat_id))
+        clf = AdsClassifier(extra=extra) if extra else DEFAULT_ADS
+        _classifiers[chat_id] = clf
+    return clf
+
+
+def invalidate_ads_classifier(chat_id: int) -> None:
+    _classifiers.pop(chat_id, None)
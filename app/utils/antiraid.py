@@ -1,49 +1,200 @@
 # app/utils/antiraid.py
 from __future__ import annotations
 from collections import deque
-from dataclasses import dataclass
-from time import monotonic
-from typing import Deque, Dict
+from dataclasses import dataclass, field
+from time import time
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+# сколько корзин в кольце: окно делится на RAID_BUCKETS равных частей,
+# поэтому память на чат фиксирована и не зависит от числа входящих
+RAID_BUCKETS = 60
+# сколько последних вошедших (ts, user_id) помним на чат для raid-ответа
+RAID_JOINERS_MAX = 5000
+
 
 @dataclass
 class RaidState:
-    joins: Deque[float]
+    # кольцо счётчиков: buckets[i % RAID_BUCKETS] = входы за корзину i
+    buckets: List[int] = field(default_factory=lambda: [0] * RAID_BUCKETS)
+    width: float = 1.0   # ширина корзины (сек)
+    head: int = 0        # абсолютный номер последней корзины
+    total: int = 0       # сумма по кольцу
     locked_until: float = 0.0
+    prev_perms: str = ""  # ChatPermissions JSON до закрытия (для reopen)
+    joiners: Deque[Tuple[float, int]] = field(default_factory=lambda: deque(maxlen=RAID_JOINERS_MAX))
+
 
 class AntiRaid:
+    """
+    Time-bucketed join counter:
+      key = chat_id
+      value = ring of RAID_BUCKETS per-bucket counts (bucket = window_sec / RAID_BUCKETS)
+    hit() and trim are O(1) amortized, memory per chat is constant.
+    Uses wall clock (time()) so that snapshots stay valid after a restart.
+    """
     def __init__(self):
         self._chats: Dict[int, RaidState] = {}
+        # чаты, у которых счётчики менялись с последнего snapshot
+        self._dirty: Set[int] = set()
 
-    def hit(self, chat_id: int, join_count: int, window_sec: int, limit: int) -> bool:
-        if limit <= 0:
-            return False
+    @staticmethod
+    def _advance(st: RaidState, idx: int) -> None:
+        """
+        Move ring head to bucket idx, zeroing buckets that fell out of the window.
+        """
+        if idx <= st.head:
+            return
+        if idx - st.head >= RAID_BUCKETS:
+            st.buckets = [0] * RAID_BUCKETS
+            st.total = 0
+        else:
+            for i in range(st.head + 1, idx + 1):
+                slot = i % RAID_BUCKETS
+                st.total -= st.buckets[slot]
+                st.buckets[slot] = 0
+        st.head = idx
 
-        now = monotonic()
+    def _state(self, chat_id: int, window_sec: int) -> RaidState:
+        width = max(1.0, float(window_sec) / RAID_BUCKETS)
         st = self._chats.get(chat_id)
         if st is None:
-            st = RaidState(joins=deque())
+            st = RaidState(width=width)
             self._chats[chat_id] = st
+        elif st.width != width:
+            # окно поменяли (/oyna) -> старые корзины несопоставимы, начинаем заново
+            st.buckets = [0] * RAID_BUCKETS
+            st.total = 0
+            st.width = width
+            st.head = 0
+        return st
+
+    def hit(self, chat_id: int, join_count: int, window_sec: int, limit: int) -> bool:
+        if limit <= 0:
+            return False
+
+        now = time()
+        st = self._state(chat_id, window_sec)
 
         # если уже закрыт, не дергаем повторно
         if st.locked_until and now < st.locked_until:
             return False
 
-        for _ in range(max(1, join_count)):
-            st.joins.append(now)
+        idx = int(now // st.width)
+        self._advance(st, idx)
+
+        n = max(1, join_count)
+        st.buckets[idx % RAID_BUCKETS] += n
+        st.total += n
+        self._dirty.add(chat_id)
 
-        cutoff = now - float(window_sec)
-        while st.joins and st.joins[0] < cutoff:
-            st.joins.popleft()
+        return st.total >= limit
 
-        return len(st.joins) >= limit
+    def count(self, chat_id: int) -> int:
+        st = self._chats.get(chat_id)
+        if st is None:
+            return 0
+        self._advance(st, int(time() // st.width))
+        return st.total
 
-    def set_locked(self, chat_id: int, seconds: int):
-        now = monotonic()
+    def set_locked(self, chat_id: int, seconds: int, prev_perms: str = ""):
+        now = time()
         st = self._chats.get(chat_id)
         if st is None:
-            st = RaidState(joins=deque())
+            st = RaidState()
             self._chats[chat_id] = st
+        # пока замок действует, prev_perms не трогаем: там права ДО закрытия
+        if not (st.locked_until and now < st.locked_until):
+            st.prev_perms = prev_perms
         st.locked_until = now + float(seconds)
+        self._dirty.add(chat_id)
+
+    def set_unlocked(self, chat_id: int) -> str:
+        """
+        Clears the lock, returns saved previous permissions JSON ("" if unknown).
+        """
+        st = self._chats.get(chat_id)
+        if st is None:
+            return ""
+        prev = st.prev_perms
+        st.locked_until = 0.0
+        st.prev_perms = ""
+        self._dirty.add(chat_id)
+        return prev
+
+    def is_locked(self, chat_id: int) -> bool:
+        st = self._chats.get(chat_id)
+        return bool(st and st.locked_until and time() < st.locked_until)
+
+    def note_joiners(self, chat_id: int, user_ids: List[int]) -> None:
+        st = self._chats.get(chat_id)
+        if st is None:
+            st = RaidState()
+            self._chats[chat_id] = st
+        now = time()
+        for uid in user_ids:
+            st.joiners.append((now, uid))
+
+    def joiners_since(self, chat_id: int, since: float) -> List[int]:
+        st = self._chats.get(chat_id)
+        if st is None:
+            return []
+        seen: Set[int] = set()
+        res: List[int] = []
+        for ts, uid in st.joiners:
+            if ts >= since and uid not in seen:
+                seen.add(uid)
+                res.append(uid)
+        return res
+
+    def locked_until(self, chat_id: int) -> float:
+        st = self._chats.get(chat_id)
+        return st.locked_until if st else 0.0
+
+    def prev_perms(self, chat_id: int) -> str:
+        st = self._chats.get(chat_id)
+        return st.prev_perms if st else ""
 
     def clear(self, chat_id: int):
         self._chats.pop(chat_id, None)
+        self._dirty.discard(chat_id)
+
+    # -------- snapshot / restore --------
+    def snapshot(self, chat_id: int) -> Optional[dict]:
+        st = self._chats.get(chat_id)
+        if st is None:
+            return None
+        return {
+            "buckets": list(st.buckets),
+            "bucket_width": st.width,
+            "head": st.head,
+            "locked_until": st.locked_until,
+            "prev_perms": st.prev_perms,
+        }
+
+    def restore(
+        self,
+        chat_id: int,
+        buckets: List[int],
+        bucket_width: float,
+        head: int,
+        locked_until: float = 0.0,
+        prev_perms: str = "",
+    ) -> None:
+        if len(buckets) != RAID_BUCKETS:
+            buckets = [0] * RAID_BUCKETS
+        st = RaidState(
+            buckets=[int(b) for b in buckets],
+            width=max(1.0, float(bucket_width)),
+            head=int(head),
+            total=sum(int(b) for b in buckets),
+            locked_until=float(locked_until or 0.0),
+            prev_perms=prev_perms or "",
+        )
+        # корзины, которые истекли пока процесс лежал
+        self._advance(st, int(time() // st.width))
+        self._chats[chat_id] = st
+
+    def drain_dirty(self) -> List[int]:
+        ids = list(self._dirty)
+        self._dirty.clear()
+        return ids
@@ -0,0 +1,268 @@
+# app/utils/badwords.py
+from __future__ import annotations
+import re
+import time
+from itertools import groupby
+from typing import AbstractSet, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .ads_filter import _trie_pattern
+from .metrics import METRICS
+from .textfold import fold_text
+
+MAX_DISTANCE = 2
+_CACHE_MAX = 4096       # токен -> результат; при переполнении кэш сбрасывается целиком
+DICT_CHECK_SEC = 30.0   # как часто сверять версии общих словарей с БД (правка в другом шарде)
+
+_APOSTROPHES = str.maketrans({"‘": "'", "’": "'", "ʻ": "'", "ʼ": "'", "`": "'"})
+_NON_WORD_RE = re.compile(r"[^\w']+")
+
+
+def normalize_for_badwords(text: str, fold: bool = True) -> str:
+    """
+    Words only, lowercase, one space between them. fold=False gives the form
+    stored in DB and shown in /yomonlist; matching always uses the folded one.
+    """
+    t = fold_text(text) if fold else (text or "").lower().translate(_APOSTROPHES)
+    # всё кроме букв/цифр/подчёрк/апострофа -> пробел
+    return " ".join(_NON_WORD_RE.sub(" ", t).split())
+
+
+def _skeleton(word: str) -> str:
+    # для нечёткого сравнения: "so'kkish" -> "sokish" (повторы и апострофы не считаются опечаткой)
+    return "".join(ch for ch, _ in groupby(word.replace("'", "")))
+
+
+def _min_len(distance: int) -> int:
+    # короткие слова с опечаткой совпадают со всем подряд: "jin" ~ "jon"
+    return 2 + 2 * distance
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """
+    All strings obtained from word by removing up to `distance` chars.
+    """
+    out = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def _within(a: str, b: str, distance: int) -> bool:
+    """
+    Optimal string alignment distance (edits + adjacent swaps) <= distance.
+    Only a band of width 2*distance+1 around the diagonal is computed.
+    """
+    if abs(len(a) - len(b)) > distance:
+        return False
+    inf = distance + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [inf] * (len(b) + 1)
+        cur[0] = i
+        lo, hi = max(1, i - distance), min(len(b), i + distance)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+        if min(cur[lo - 1:hi + 1]) > distance:
+            return False
+        prev2, prev = prev, cur
+    return prev[len(b)] <= distance
+
+
+class BadWordMatcher:
+    """
+    Bad-word check over text from normalize_for_badwords(..):
+      - exact token match (any length);
+      - words of 4+ chars also as substrings (one pass of a trie regex);
+      - distance > 0: tokens within that edit distance of a word, found via a
+        SymSpell deletion index (cost depends on token length, not list size),
+        compared on skeletons, so doubled letters and apostrophes are free.
+    Token results are cached, so a repeated word costs one dict lookup.
+    """
+    def __init__(self, words: Iterable[str], distance: int = 0):
+        self.distance = max(0, min(int(distance or 0), MAX_DISTANCE))
+        self.words: Set[str] = {w for w in (normalize_for_badwords(x) for x in words) if w}
+        long_words = [w for w in self.words if len(w) >= 4]
+        self._sub_re = re.compile(_trie_pattern(long_words)) if long_words else None
+        # удаление из скелета -> (скелет, слово)
+        self._index: Dict[str, Set[Tuple[str, str]]] = {}
+        if self.distance:
+            for w in self.words:
+                sk = _skeleton(w)
+                if len(sk) < _min_len(self.distance) or " " in w:
+                    continue
+                for d in _deletes(sk, self.distance):
+                    self._index.setdefault(d, set()).add((sk, w))
+        self._cache: Dict[str, Optional[str]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.words)
+
+    def _lookup(self, token: str) -> Optional[str]:
+        if token in self.words:
+            return token
+        if not self.distance:
+            return None
+        sk = _skeleton(token)
+        if len(sk) < _min_len(self.distance):
+            return None
+        for d in _deletes(sk, self.distance):
+            for word_sk, w in self._index.get(d, ()):
+                if _within(sk, word_sk, self.distance):
+                    return w
+        return None
+
+    def match_token(self, token: str) -> Optional[str]:
+        try:
+            return self._cache[token]
+        except KeyError:
+            pass
+        if len(self._cache) >= _CACHE_MAX:
+            self._cache.clear()
+        hit = self._cache[token] = self._lookup(token)
+        return hit
+
+    def clear_cache(self) -> None:
+        """
+        Drop the token -> result cache (benchmarks measure cold lookups).
+        """
+        self._cache.clear()
+
+    def find(self, words: str, skip: AbstractSet[str] = frozenset()) -> Optional[str]:
+        """
+        First bad word found in already normalized text, or None.
+        Words in `skip` (chat exceptions) are not reported.
+        """
+        if not self.words or not words:
+            return None
+        for token in set(words.split()):
+            hit = self.match_token(token)
+            if hit is not None and hit not in skip:
+                return hit
+        if self._sub_re is not None:
+            for m in self._sub_re.finditer(words):
+                if m.group() not in skip:
+                    return m.group()
+        return None
+
+
+DICT_NAME_RE = re.compile(r"^[a-z]{2,16}$")
+
+
+def parse_dicts(value: str) -> Tuple[str, ...]:
+    """
+    ChatSettings.bad_dicts "uz,ru" -> ("ru", "uz").
+    """
+    return tuple(sorted({n for n in (value or "").replace(" ", ",").lower().split(",") if DICT_NAME_RE.match(n)}))
+
+
+class ChatBadWords:
+    """
+    What one chat checks: its own words + subscribed global dictionaries
+    minus the chat's exceptions. Global matchers are shared by all chats
+    (one object per dictionary and distance), so a chat only costs its
+    overlay — memory does not grow with the number of subscribers.
+    """
+    def __init__(self, own: BadWordMatcher, shared: Tuple[BadWordMatcher, ...] = (),
+                 allowed: Iterable[str] = (), dicts: Tuple[str, ...] = ()):
+        self.own = own
+        self.shared = shared
+        self.allowed: FrozenSet[str] = frozenset(w for w in (normalize_for_badwords(x) for x in allowed) if w)
+        self.distance = own.distance
+        self.dicts = dicts
+
+    def __bool__(self) -> bool:
+        return bool(self.own) or any(self.shared)
+
+    def find(self, words: str) -> Optional[str]:
+        hit = self.own.find(words)
+        if hit is not None:
+            return hit
+        for m in self.shared:
+            hit = m.find(words, self.allowed)
+            if hit is not None:
+                return hit
+        return None
+
+
+# (словарь, distance) -> общий матчер; сбрасывается /glugat_qosh /glugat_del (другие шарды — по версии в БД)
+_shared: Dict[Tuple[str, int], BadWordMatcher] = {}
+# chat_id -> матчер чата; сбрасывается /yomonqosh /yomondel /yomon_xato /lugat
+_matchers: Dict[int, ChatBadWords] = {}
+# версии словарей (GlobalBadDict) на момент последней сверки
+_dict_versions: Dict[str, int] = {}
+_dict_checked = 0.0
+
+
+async def _check_dict_versions(db) -> None:
+    """
+    /glugat_qosh and /glugat_del only reach the shard that handles the
+    owner's private chat; the others notice the bumped version here, at most
+    DICT_CHECK_SEC late.
+    """
+    global _dict_checked
+    now = time.monotonic()
+    if now - _dict_checked < DICT_CHECK_SEC:
+        return
+    _dict_checked = now
+    versions = await db.global_bad_dict_versions()
+    for name in {k[0] for k in _shared}:
+        if versions.get(name, 0) != _dict_versions.get(name, 0):
+            invalidate_shared_dict(name)
+    _dict_versions.clear()
+    _dict_versions.update(versions)
+
+
+async def _shared_matcher(db, name: str, distance: int) -> BadWordMatcher:
+    m = _shared.get((name, distance))
+    METRICS.cache("badwords_shared", m is not None)
+    if m is None:
+        m = BadWordMatcher(await db.list_global_bad_words(name), distance)
+        _shared[(name, distance)] = m
+    return m
+
+
+async def get_badword_matcher(db, chat_id: int, distance: int = 0, dicts: Tuple[str, ...] = ()) -> ChatBadWords:
+    distance = max(0, min(int(distance or 0), MAX_DISTANCE))
+    if dicts:
+        await _check_dict_versions(db)
+    m = _matchers.get(chat_id)
+    fresh = m is not None and m.distance == distance and m.dicts == dicts
+    METRICS.cache("badwords_chat", fresh)
+    if not fresh:
+        own = BadWordMatcher(await db.list_bad_words(chat_id, limit=200), distance)
+        shared = tuple([await _shared_matcher(db, name, distance) for name in dicts])
+        allowed = await db.list_bad_word_allows(chat_id) if dicts else ()
+        m = ChatBadWords(own, shared, allowed, dicts)
+        _matchers[chat_id] = m
+    return m
+
+
+async def in_dicts(db, word: str, dicts: Tuple[str, ...]) -> bool:
+    """
+    Is the word in one of these global dictionaries (exact, after folding)?
+    """
+    w = normalize_for_badwords(word)
+    if dicts:
+        await _check_dict_versions(db)
+    for name in dicts:
+        if w in (await _shared_matcher(db, name, 0)).words:
+            return True
+    return False
+
+
+def invalidate_badword_matcher(chat_id: int) -> None:
+    _matchers.pop(chat_id, None)
+
+
+def invalidate_shared_dict(name: str) -> None:
+    for key in [k for k in _shared if k[0] == name]:
+        _shared.pop(key, None)
+    # матчеры чатов держат ссылки на старые объекты
+    _matchers.clear()
@@ -0,0 +1,121 @@
+# app/utils/domains.py
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import METRICS
+
+# синонимы хостов: правило для t.me действует и на telegram.me
+_HOST_ALIASES = {"telegram.me": "t.me", "telegram.dog": "t.me"}
+_LABEL_OK = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-")
+
+
+def parse_link(link: str) -> Tuple[str, str]:
+    """
+    "https://www.Sayt.uz/Kurs?x=1" -> ("sayt.uz", "/kurs"); "@kanal" -> ("t.me", "/kanal").
+    Links without a host (tg://user?id=...) give ("", "").
+    """
+    s = (link or "").strip().lower()
+    if s.startswith("@"):
+        return "t.me", "/" + s[1:]
+    if "://" in s:
+        scheme, _, s = s.partition("://")
+        if scheme not in ("http", "https"):
+            return "", ""
+    host, sep, path = s.partition("/")
+    host = host.split("?", 1)[0].split("#", 1)[0].rsplit("@", 1)[-1].split(":", 1)[0].strip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    host = _HOST_ALIASES.get(host, host)
+    path = ("/" + path.split("?", 1)[0].split("#", 1)[0]).rstrip("/") if sep else ""
+    return host, path
+
+
+def normalize_rule(pattern: str) -> Optional[str]:
+    """
+    Rule as stored in DB: "host" or "host/path". None if it is not a domain.
+    """
+    host, path = parse_link(pattern)
+    labels = host.split(".")
+    if len(labels) < 2 or not all(lb and set(lb) <= _LABEL_OK for lb in labels):
+        return None
+    return host + path
+
+
+class _Node:
+    __slots__ = ("children", "verdict", "paths")
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        self.verdict: Optional[bool] = None        # правило на весь домен (и поддомены)
+        self.paths: List[Tuple[str, bool]] = []    # (путь, allow), длинные первыми
+
+
+class DomainPolicy:
+    """
+    Per-chat allow/deny rules in a trie keyed by reversed host labels
+    (uz -> sayt -> www). lookup() walks one node per label; the deepest node
+    with a matching rule wins, a path rule beats the bare domain on its node.
+    """
+    def __init__(self, rules: Optional[List[Tuple[str, bool]]] = None):
+        self._root = _Node()
+        self.size = 0
+        self.has_deny = False
+        for pattern, allow in rules or ():
+            self.add(pattern, allow)
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def add(self, pattern: str, allow: bool) -> None:
+        host, path = parse_link(pattern)
+        if not host:
+            return
+        node = self._root
+        for label in reversed(host.split(".")):
+            node = node.children.setdefault(label, _Node())
+        if path:
+            node.paths = [p for p in node.paths if p[0] != path] + [(path, allow)]
+            node.paths.sort(key=lambda p: len(p[0]), reverse=True)
+        else:
+            node.verdict = allow
+        self.size += 1
+        self.has_deny = self.has_deny or not allow
+
+    def lookup(self, link: str) -> Optional[bool]:
+        """
+        True = allowed, False = denied, None = no rule for this link.
+        """
+        host, path = parse_link(link)
+        if not host:
+            return None
+        best: Optional[bool] = None
+        node = self._root
+        for label in reversed(host.split(".")):
+            node = node.children.get(label)
+            if node is None:
+                break
+            verdict = node.verdict
+            for prefix, allow in node.paths:
+                if path == prefix or path.startswith(prefix + "/"):
+                    verdict = allow
+                    break
+            if verdict is not None:
+                best = verdict
+        return best
+
+
+# chat_id -> скомпилированная политика; сбрасывается командами /ruxsat /taqiq /domendel
+_policies: Dict[int, DomainPolicy] = {}
+
+
+async def get_domain_policy(db, chat_id: int) -> DomainPolicy:
+    policy = _policies.get(chat_id)
+    METRICS.cache("domain_policy", policy is not None)
+    if policy is None:
+        policy = DomainPolicy(await db.list_domain_rules(chat_id))
+        _policies[chat_id] = policy
+    return policy
+
+
+def invalidate_domain_policy(chat_id: int) -> None:
+    _policies.pop(chat_id, None)
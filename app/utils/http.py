@@ -0,0 +1,75 @@
+# app/utils/http.py
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+
+from ..config import Config
+
+JSON_CODECS = ("json", "orjson", "ujson")
+
+
+def json_codec(name: str) -> Tuple[Callable[..., Any], Callable[..., str]]:
+    """
+    (loads, dumps) for the Bot API session. orjson/ujson are optional packages.
+    """
+    name = (name or "json").lower()
+    if name == "json":
+        return json.loads, json.dumps
+    try:
+        if name == "orjson":
+            import orjson
+            return orjson.loads, lambda obj, **kw: orjson.dumps(obj).decode()
+        if name == "ujson":
+            import ujson
+            return ujson.loads, lambda obj, **kw: ujson.dumps(obj, ensure_ascii=False)
+    except ImportError:
+        raise RuntimeError(f"JSON_CODEC={name}: package is not installed (pip install {name})")
+    raise RuntimeError(f"JSON_CODEC must be one of {', '.join(JSON_CODECS)}, got {name!r}")
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """
+    AiohttpSession with connector knobs:
+      keepalive_sec <= 0 -> no keep-alive (force_close), dns_ttl_sec <= 0 -> no DNS cache
+    """
+
+    def __init__(self, limit: int = 100, keepalive_sec: int = 15, dns_ttl_sec: int = 3600, **kwargs: Any):
+        super().__init__(limit=limit, **kwargs)
+        if keepalive_sec > 0:
+            self._connector_init["keepalive_timeout"] = keepalive_sec
+        else:
+            self._connector_init["force_close"] = True
+        if dns_ttl_sec > 0:
+            self._connector_init["ttl_dns_cache"] = dns_ttl_sec
+        else:
+            self._connector_init["use_dns_cache"] = False
+            self._connector_init.pop("ttl_dns_cache", None)
+
+
+def build_session(cfg: Config) -> TunedAiohttpSession:
+    if cfg.bot_api_url:
+        api = TelegramAPIServer.from_base(cfg.bot_api_url, is_local=bool(cfg.bot_api_local))
+    else:
+        api = PRODUCTION
+    loads, dumps = json_codec(cfg.json_codec)
+    return TunedAiohttpSession(
+        api=api,
+        json_loads=loads,
+        json_dumps=dumps,
+        timeout=cfg.http_timeout_sec,
+        limit=cfg.http_limit,
+        keepalive_sec=cfg.http_keepalive_sec,
+        dns_ttl_sec=cfg.http_dns_ttl_sec,
+    )
+
+
+def build_bot(cfg: Config) -> Bot:
+    """
+    The only place a Bot is created: one session per process, shared by all handlers.
+    """
+    return Bot(cfg.bot_token, session=build_session(cfg))
@@ -0,0 +1,136 @@
+# app/utils/joinindex.py
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from time import time
+from typing import Dict, List, Optional
+
+# (a, b) для хешей строк sketch: h_i(x) = (a_i * x + b_i) mod P mod width
+_P = (1 << 61) - 1
+_SEEDS = (
+    (0x9E3779B97F4A7C15 % _P, 0x632BE59BD9B4E019 % _P),
+    (0xC2B2AE3D27D4EB4F % _P, 0x165667B19E3779F9 % _P),
+    (0x27D4EB2F165667C5 % _P, 0x85EBCA77C2B2AE63 % _P),
+    (0xFF51AFD7ED558CCD % _P, 0xC4CEB9FE1A85EC53 % _P),
+)
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency estimator: never underestimates, memory = width * depth ints.
+    """
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.seeds = _SEEDS[:max(1, min(depth, len(_SEEDS)))]
+        self.rows = [[0] * width for _ in self.seeds]
+
+    def add(self, key: int, n: int = 1) -> None:
+        for row, (a, b) in zip(self.rows, self.seeds):
+            row[((a * key + b) % _P) % self.width] += n
+
+    def estimate(self, key: int) -> int:
+        return min(row[((a * key + b) % _P) % self.width] for row, (a, b) in zip(self.rows, self.seeds))
+
+    def clear(self) -> None:
+        for row in self.rows:
+            row[:] = [0] * self.width
+
+
+@dataclass
+class _Recent:
+    chats: Dict[int, float] = field(default_factory=dict)  # chat_id -> ts
+    partial: bool = False  # запись этого пользователя вытеснялась из LRU за окно
+
+
+class JoinIndex:
+    """
+    Global (all chats) index of recent joins to catch one account set raiding many groups:
+      - two rotating count-min sketches: distinct (user, chat) joins per user in the sliding window
+      - LRU of recent joiners: exact chat ids (needed to act), bounded by lru_size
+    hit() returns chat ids to act on once the LRU itself holds min_chats distinct
+    chats of the user. The sketch never triggers an action: count-min
+    collisions inflate estimates, so for a user whose LRU entry was really
+    evicted (tracked in _evicted) a high estimate is only logged.
+    """
+    def __init__(self, window_sec: int = 900, min_chats: int = 3, lru_size: int = 50_000,
+                 width: Optional[int] = None, depth: int = 4):
+        self.window_sec = max(1, int(window_sec))
+        self.min_chats = int(min_chats)
+        self.lru_size = lru_size
+        # ширина ~ числу входов за окно (LRU рассчитан на столько же): тогда
+        # переоценка из-за коллизий в среднем < 1 на строку
+        width = width or max(4096, lru_size)
+        # текущее и предыдущее поколение, каждое покрывает половину окна
+        self._cur = CountMinSketch(width, depth)
+        self._prev = CountMinSketch(width, depth)
+        self._gen_started = time()
+        self._recent: "OrderedDict[int, _Recent]" = OrderedDict()
+        self._evicted: "OrderedDict[int, float]" = OrderedDict()   # user_id -> когда вытеснен
+        self._flagged: "OrderedDict[int, float]" = OrderedDict()
+
+    def _rotate(self, now: float) -> None:
+        half = self.window_sec / 2.0
+        if now - self._gen_started < half:
+            return
+        if now - self._gen_started >= self.window_sec:
+            self._prev.clear()
+        else:
+            self._prev, self._cur = self._cur, self._prev
+        self._cur.clear()
+        self._gen_started = now
+
+    def _estimate(self, user_id: int) -> int:
+        return self._cur.estimate(user_id) + self._prev.estimate(user_id)
+
+    def is_flagged(self, user_id: int) -> bool:
+        ts = self._flagged.get(user_id)
+        if ts is None:
+            return False
+        if time() - ts > self.window_sec:
+            self._flagged.pop(user_id, None)
+            return False
+        return True
+
+    def hit(self, user_id: int, chat_id: int) -> List[int]:
+        if self.min_chats <= 0:
+            return []
+        now = time()
+        self._rotate(now)
+        cutoff = now - self.window_sec
+
+        entry = self._recent.get(user_id)
+        if entry is None:
+            # partial — только если запись этого пользователя действительно вытеснялась
+            evicted = self._evicted.pop(user_id, None)
+            entry = _Recent(partial=evicted is not None and evicted >= cutoff)
+            self._recent[user_id] = entry
+        else:
+            self._recent.move_to_end(user_id)
+            for cid in [c for c, ts in entry.chats.items() if ts < cutoff]:
+                entry.chats.pop(cid, None)
+
+        is_new_chat = chat_id not in entry.chats
+        entry.chats[chat_id] = now
+        if is_new_chat:
+            self._cur.add(user_id)
+
+        while len(self._recent) > self.lru_size:
+            old_id, _ = self._recent.popitem(last=False)
+            self._evicted[old_id] = now
+        while len(self._evicted) > self.lru_size:
+            self._evicted.popitem(last=False)
+
+        if self.is_flagged(user_id):
+            return [chat_id] if is_new_chat else []
+
+        if len(entry.chats) < self.min_chats:
+            if entry.partial and is_new_chat and self._estimate(user_id) >= self.min_chats:
+                # только оценка sketch: не действуем, ждём подтверждения в LRU
+                print(f"[joinindex] suspect user={user_id} chat={chat_id} "
+                      f"seen={len(entry.chats)} estimate={self._estimate(user_id)} (sketch only, no action)")
+            return []
+
+        self._flagged[user_id] = now
+        while len(self._flagged) > self.lru_size:
+            self._flagged.popitem(last=False)
+        return list(entry.chats.keys())
@@ -0,0 +1,201 @@
+# app/utils/looplag.py
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+
+from .metrics import METRICS
+
+# Два вида трасс в одном кольцевом буфере:
+#   block — цикл событий не отвечает дольше порога; поток-сторож снимает стек
+#           главного потока прямо во время зависания (CPU: regex, ORM, json);
+#   slow  — хендлер идёт дольше порога; по call_later снимаем стек его задачи,
+#           т.е. на чём он ждёт (БД, Bot API, sleep).
+
+_STACK_LIMIT = 30
+_LAG_SAMPLES = 240      # при interval 0.5 — последние 2 минуты
+
+
+@dataclass
+class Trace:
+    at: float               # time.time()
+    kind: str               # "block" | "slow"
+    duration: float         # сек; для block — сколько цикл уже стоял в момент снимка
+    handler: str = ""
+    chat_id: int = 0
+    stack: List[str] = field(default_factory=list)
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    h = data.get("handler")
+    cb = getattr(h, "callback", None)
+    if cb is None:
+        return "?"
+    return f"{getattr(cb, '__module__', '')}.{getattr(cb, '__qualname__', repr(cb))}"
+
+
+def _await_chain(coro: Any) -> List[Any]:
+    # Task.get_stack() отдаёт только внешний кадр; идём по цепочке cr_await вглубь
+    frames = []
+    while coro is not None:
+        f = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if f is None:
+            break
+        frames.append(f)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames[-_STACK_LIMIT:]
+
+
+def _snap(task: Optional[asyncio.Task], out: List[List[str]]) -> None:
+    # стек задачи, пока она ждёт (call_later из __call__)
+    if task is None or task.done():
+        return
+    frames = _await_chain(task.get_coro())
+    out.append(traceback.format_list(traceback.StackSummary.extract((f, f.f_lineno) for f in frames)))
+
+
+class LoopMonitor(BaseMiddleware):
+    """
+    Event-loop lag sampler + slow handler tracer.
+      - a task sleeps `interval` and records how late it woke up (lag_stats());
+      - a watchdog thread grabs the loop thread's stack when it is stuck
+        longer than lag_threshold_ms;
+      - as an inner middleware it times handlers and keeps the ones slower
+        than slow_handler_ms with handler name, chat_id and a stack sample.
+    Traces are kept in a bounded ring (traces()).
+    """
+
+    def __init__(self, lag_threshold_ms: int = 250, slow_handler_ms: int = 1000,
+                 interval: float = 0.5, ring: int = 100):
+        self.lag_threshold = max(0, lag_threshold_ms) / 1000.0
+        self.slow_threshold = max(0, slow_handler_ms) / 1000.0
+        self.interval = interval
+        self.lag_max = 0.0
+        self.blocks = 0
+        self.slow = 0
+        self._ring: Deque[Trace] = deque(maxlen=ring)
+        self._lags: Deque[float] = deque(maxlen=_LAG_SAMPLES)
+        # id(task) -> (хендлер, chat_id): что сейчас выполняется (для block-трасс)
+        self._active: Dict[int, Tuple[str, int]] = {}
+        self._beat = time.monotonic()
+        self._loop_thread = 0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- lifecycle ----------
+
+    async def start(self) -> None:
+        if not self.lag_threshold or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sampler())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------- loop lag ----------
+
+    async def _sampler(self) -> None:
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - t0 - self.interval)
+            self._beat = now
+            self._lags.append(lag)
+            if lag > self.lag_max:
+                self.lag_max = lag
+            METRICS.observe("bot_loop_lag_seconds", lag)
+
+    def _watchdog(self) -> None:
+        reported = 0.0  # beat, на котором уже сняли стек (одна трасса на зависание)
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.lag_threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            try:
+                active = list(self._active.values())
+            except RuntimeError:
+                active = []
+            self.blocks += 1
+            self._ring.append(Trace(
+                at=time.time(),
+                kind="block",
+                duration=stalled,
+                handler=", ".join(sorted({h for h, _ in active})),
+                chat_id=active[0][1] if len(active) == 1 else 0,
+                stack=traceback.format_stack(frame, limit=_STACK_LIMIT),
+            ))
+            del frame
+
+    def lag_stats(self) -> Dict[str, float]:
+        data = sorted(self._lags)
+        if not data:
+            return {"samples": 0, "p50": 0.0, "p99": 0.0, "last": 0.0, "max": self.lag_max}
+        return {
+            "samples": len(data),
+            "p50": data[len(data) // 2],
+            "p99": data[min(len(data) - 1, int(0.99 * len(data)))],
+            "last": self._lags[-1],
+            "max": self.lag_max,
+        }
+
+    # ---------- slow handlers ----------
+
+    async def __call__(self, handler, event, data):
+        if not self.slow_threshold:
+            return await handler(event, data)
+        name = handler_name(data)
+        chat = data.get("event_chat")
+        chat_id = chat.id if chat is not None else 0
+        task = asyncio.current_task()
+        snap: List[List[str]] = []
+        timer = asyncio.get_running_loop().call_later(self.slow_threshold, _snap, task, snap)
+        key = id(task)
+        self._active[key] = (name, chat_id)
+        t0 = time.monotonic()
+        try:
+            return await handler(event, data)
+        finally:
+            timer.cancel()
+            self._active.pop(key, None)
+            took = time.monotonic() - t0
+            if took >= self.slow_threshold:
+                # пустой стек = цикл стоял внутри хендлера, см. block-трассу рядом
+                self.slow += 1
+                self._ring.append(Trace(time.time(), "slow", took, name, chat_id, snap[0] if snap else []))
+                METRICS.inc("bot_slow_handlers_total", handler=name)
+
+    def traces(self) -> List[Trace]:
+        return list(self._ring)
+
+
+def install(dp, monitor: LoopMonitor) -> None:
+    """
+    Inner middleware on every event observer (child routers inherit it).
+    """
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(monitor)
@@ -0,0 +1,170 @@
+# app/utils/memstats.py
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import itertools
+import os
+import sys
+import tracemalloc
+from collections import deque
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+# Учёт памяти для in-process состояния: сколько записей и примерно сколько байт
+# в каждом кэше/словаре. Размер — sys.getsizeof по графу объектов; у больших
+# контейнеров меряем выборку элементов и экстраполируем, чтобы отчёт стоил
+# миллисекунды даже на сотнях тысяч записей.
+
+_SAMPLE = 200               # элементов контейнера на оценку
+_LEAF_TYPES = (str, bytes, int, float, bool, type(None), complex)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # нет /proc: пиковое значение (Linux — KiB, macOS — байты)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def _children(obj: Any) -> Optional[List[Any]]:
+    # None = лист (не спускаемся: задачи, функции, модули, regex и т.п.)
+    if isinstance(obj, dict):
+        return [x for kv in obj.items() for x in kv]
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return [getattr(obj, f.name, None) for f in dataclasses.fields(obj)]
+    if type(obj).__module__.startswith("app."):
+        if hasattr(obj, "__dict__"):
+            return list(vars(obj).values())
+        return [getattr(obj, s, None) for s in getattr(type(obj), "__slots__", ())]
+    return None
+
+
+def deep_size(obj: Any, seen: Set[int]) -> int:
+    """
+    Approximate bytes reachable from obj, not counting ids already in `seen`.
+    Containers larger than _SAMPLE are measured on a sample and scaled.
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, _LEAF_TYPES):
+        return size
+    if isinstance(obj, dict) and len(obj) > _SAMPLE:
+        step = len(obj) // _SAMPLE
+        sample = list(itertools.islice(obj.items(), 0, None, step))
+        part = sum(deep_size(k, seen) + deep_size(v, seen) for k, v in sample)
+        return size + part * len(obj) // len(sample)
+    if isinstance(obj, (list, tuple, set, frozenset, deque)) and len(obj) > _SAMPLE:
+        step = len(obj) // _SAMPLE
+        sample = list(itertools.islice(obj, 0, None, step))
+        part = sum(deep_size(x, seen) for x in sample)
+        return size + part * len(obj) // len(sample)
+    kids = _children(obj)
+    if kids:
+        size += sum(deep_size(x, seen) for x in kids)
+    return size
+
+
+def _entries(obj: Any) -> int:
+    try:
+        return len(obj)
+    except TypeError:
+        return 1
+
+
+class MemoryReport:
+    """
+    Named in-process structures -> (entries, approx bytes); one log line every
+    `interval` seconds (0 = off). Structures are measured in registration order
+    and objects shared between them are counted once (at the first one).
+    """
+
+    def __init__(self, interval: int = 900, top: int = 8):
+        self.interval = interval
+        self.top = top
+        self._tracked: List[Tuple[str, Callable[[], Any]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def track(self, name: str, getter: Callable[[], Any]) -> None:
+        self._tracked.append((name, getter))
+
+    def collect(self) -> List[Tuple[str, int, int]]:
+        seen: Set[int] = set()
+        rows: List[Tuple[str, int, int]] = []
+        for name, getter in self._tracked:
+            try:
+                obj = getter()
+                rows.append((name, _entries(obj), deep_size(obj, seen)))
+            except Exception as e:
+                print(f"[mem] {name}: {type(e).__name__}: {e}")
+        return rows
+
+    def log_line(self) -> str:
+        rows = sorted(self.collect(), key=lambda r: -r[2])
+        parts = [f"{name} {n} ({size / 1e6:.1f} MB)" for name, n, size in rows[: self.top]]
+        return f"[mem] rss {rss_bytes() / 1e6:.1f} MB | " + ", ".join(parts)
+
+    # ---------- periodic log ----------
+
+    async def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                print(self.log_line())
+            except Exception as e:
+                print(f"[mem] report failed: {type(e).__name__}: {e}")
+
+
+def top_allocators(limit: int = 15) -> List[str]:
+    """
+    tracemalloc top lines by size. Tracing must already be on (start_tracing()).
+    """
+    snap = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    return [
+        f"{st.size / 1e6:7.2f} MB {st.count:8d} {st.traceback[0].filename}:{st.traceback[0].lineno}"
+        for st in snap.statistics("lineno")[:limit]
+    ]
+
+
+def start_tracing(frames: int = 1) -> bool:
+    """
+    Turn tracemalloc on (costs CPU and memory while on). False if it already was.
+    """
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def stop_tracing() -> None:
+    tracemalloc.stop()
+
+
+def tracing() -> bool:
+    return tracemalloc.is_tracing()
@@ -0,0 +1,322 @@
+# app/utils/metrics.py
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from sqlalchemy import event
+
+# Метрики в текстовом формате Prometheus без prometheus_client.
+# Выключены по умолчанию: пока install() не вызван, middleware/слушатели не
+# подключены, а timer()/inc()/cache() — одна проверка флага.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_HELP = {
+    "bot_stage_seconds": "Time spent in a guard._process stage (since the previous stage).",
+    "bot_handler_seconds": "Time spent in an instrumented handler helper.",
+    "bot_update_seconds": "Update handling time after the update pool.",
+    "bot_update_db_reads": "SELECT statements per update.",
+    "bot_update_db_writes": "Non-SELECT statements per update.",
+    "bot_update_api_calls": "Bot API calls per update.",
+    "bot_api_seconds": "Bot API call latency.",
+    "bot_db_statements_total": "SQL statements executed.",
+    "bot_cache_requests_total": "In-process cache lookups.",
+    "bot_loop_lag_seconds": "How late the event loop woke up a periodic sampler.",
+    "bot_slow_handlers_total": "Handlers that ran longer than SLOW_HANDLER_MS.",
+    "bot_lane_processed_total": "Updates processed by an update pool lane.",
+    "bot_lane_failed_total": "Updates that raised in an update pool lane.",
+    "bot_lane_shed_total": "Updates dropped by an update pool lane.",
+    "bot_lane_depth": "Updates queued in an update pool lane.",
+    "bot_lane_in_flight": "Updates queued or running in an update pool lane.",
+    "bot_lane_deferred": "Updates waiting for room in a full update pool lane.",
+    "bot_lane_wait_seconds": "Queue wait in an update pool lane (sampled).",
+}
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class UpdateCounters:
+    """
+    DB statements and Bot API calls made while one update is handled.
+    """
+    __slots__ = ("db_reads", "db_writes", "api_calls", "api_methods")
+
+    def __init__(self):
+        self.db_reads = 0
+        self.db_writes = 0
+        self.api_calls = 0
+        self.api_methods: List[str] = []
+
+
+_current: contextvars.ContextVar[Optional[UpdateCounters]] = contextvars.ContextVar("update_counters", default=None)
+
+
+class _StageTimer:
+    __slots__ = ("_m", "_last")
+
+    def __init__(self, m: "Metrics"):
+        self._m = m
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._m.observe("bot_stage_seconds", now - self._last, stage=stage)
+        self._last = now
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def mark(self, stage: str) -> None:
+        pass
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def _labels(kw: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in kw.items()))
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._hists: Dict[Tuple[str, Labels], Histogram] = {}
+        # () -> [(name, type, labels, value)] — снимаются в момент /metrics
+        self._sources: List[Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]] = []
+
+    # ---- запись ----
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        h = self._hists.get(key)
+        if h is None:
+            h = self._hists[key] = Histogram(buckets)
+        h.observe(value)
+
+    def cache(self, name: str, hit: bool) -> None:
+        if self.enabled:
+            self.inc("bot_cache_requests_total", cache=name, result="hit" if hit else "miss")
+
+    def timer(self):
+        """
+        t = METRICS.timer(); ...; t.mark("settings") — observes time since the previous mark.
+        """
+        return _StageTimer(self) if self.enabled else _NOOP_TIMER
+
+    def timed(self, name: str):
+        """
+        Decorator for async helpers: bot_handler_seconds{handler=name}.
+        """
+        def wrap(fn: Callable[..., Awaitable[Any]]):
+            @functools.wraps(fn)
+            async def inner(*args, **kwargs):
+                if not self.enabled:
+                    return await fn(*args, **kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.observe("bot_handler_seconds", time.perf_counter() - t0, handler=name)
+            return inner
+        return wrap
+
+    def add_source(self, fn: Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]) -> None:
+        self._sources.append(fn)
+
+    # ---- выдача ----
+    def render(self) -> str:
+        lines: List[str] = []
+        typed: set = set()
+
+        def head(name: str, kind: str) -> None:
+            if name in typed:
+                return
+            typed.add(name)
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def fmt(labels: Labels) -> str:
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+        for (name, labels), v in sorted(self._counters.items()):
+            head(name, "counter")
+            lines.append(f"{name}{fmt(labels)} {v:g}")
+        for (name, labels), h in sorted(self._hists.items(), key=lambda kv: kv[0]):
+            head(name, "histogram")
+            acc = 0
+            for bound, n in zip(h.bounds + (float("inf"),), h.counts):
+                acc += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{fmt(labels + (('le', le),))} {acc}")
+            lines.append(f"{name}_sum{fmt(labels)} {h.sum:.6f}")
+            lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        for src in self._sources:
+            try:
+                rows = list(src())
+            except Exception as e:
+                print(f"[metrics] source failed: {type(e).__name__}: {e}")
+                continue
+            for name, kind, labels, v in rows:
+                head(name, kind)
+                lines.append(f"{name}{fmt(_labels(labels))} {v:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+
+# ---- счётчики на один апдейт ----
+
+@contextlib.contextmanager
+def count_update() -> Iterator[UpdateCounters]:
+    """
+    with count_update() as c: ... — DB statements / API calls inside go to c
+    (install_db_counter / install_api_counter must be installed).
+    """
+    c = UpdateCounters()
+    token = _current.set(c)
+    try:
+        yield c
+    finally:
+        _current.reset(token)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    read = statement.lstrip()[:6].upper() == "SELECT"
+    c = _current.get()
+    if c is not None:
+        if read:
+            c.db_reads += 1
+        else:
+            c.db_writes += 1
+    METRICS.inc("bot_db_statements_total", kind="read" if read else "write")
+
+
+def install_db_counter(engine) -> None:
+    if not event.contains(engine.sync_engine, "before_cursor_execute", _count_statement):
+        event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+
+
+class ApiCounter(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        name = getattr(method, "__api_method__", type(method).__name__)
+        c = _current.get()
+        if c is not None:
+            c.api_calls += 1
+            c.api_methods.append(name)
+        if not METRICS.enabled:
+            return await make_request(bot, method)
+        t0 = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            METRICS.observe("bot_api_seconds", time.perf_counter() - t0, method=name)
+
+
+def install_api_counter(bot) -> None:
+    if not any(isinstance(m, ApiCounter) for m in bot.session.middleware):
+        bot.session.middleware(ApiCounter())
+
+
+class UpdateMetrics(BaseMiddleware):
+    """
+    Inner-most outer middleware: handling time and DB/API counts per update type.
+    """
+    async def __call__(self, handler, event, data):
+        kind = getattr(event, "event_type", None) or "unknown"
+        t0 = time.perf_counter()
+        with count_update() as c:
+            try:
+                return await handler(event, data)
+            finally:
+                METRICS.observe("bot_update_seconds", time.perf_counter() - t0, type=kind)
+                METRICS.observe("bot_update_db_reads", c.db_reads, COUNT_BUCKETS, type=kind)
+                METRICS.observe("bot_update_db_writes", c.db_writes, COUNT_BUCKETS, type=kind)
+                METRICS.observe("bot_update_api_calls", c.api_calls, COUNT_BUCKETS, type=kind)
+
+
+def _pool_source(pool) -> Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]:
+    # те же цифры, что UpdatePool.stats()
+    def rows():
+        for lane, st in pool.stats().items():
+            yield "bot_lane_processed_total", "counter", {"lane": lane}, st["processed"]
+            yield "bot_lane_failed_total", "counter", {"lane": lane}, st["failed"]
+            yield "bot_lane_shed_total", "counter", {"lane": lane}, st["shed"]
+            yield "bot_lane_depth", "gauge", {"lane": lane}, st["depth"]
+            yield "bot_lane_in_flight", "gauge", {"lane": lane}, st["in_flight"]
+            yield "bot_lane_deferred", "gauge", {"lane": lane}, st["deferred"]
+            yield "bot_lane_wait_seconds", "gauge", {"lane": lane, "quantile": "0.5"}, st["wait_p50"]
+            yield "bot_lane_wait_seconds", "gauge", {"lane": lane, "quantile": "0.99"}, st["wait_p99"]
+    return rows
+
+
+def install(dp, bot, db) -> None:
+    """
+    Turn metrics on for this process: DB/API counters, per-update middleware,
+    update pool gauges. Call after the update pool is registered.
+    """
+    METRICS.enabled = True
+    install_db_counter(db.engine)
+    install_api_counter(bot)
+    dp.update.outer_middleware(UpdateMetrics())
+    pool = dp.get("update_pool")
+    if pool is not None:
+        METRICS.add_source(_pool_source(pool))
+
+
+async def serve(host: str, port: int):
+    """
+    GET /metrics on host:port. Returns the aiohttp runner (await runner.cleanup() to stop).
+    """
+    from aiohttp import web
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=METRICS.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[metrics] listening on {host}:{port}/metrics")
+    return runner
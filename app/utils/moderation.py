@@ -2,10 +2,14 @@
 import re
 import hashlib
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import ChatPermissions, Message
 
+from .ads_filter import ADS_STRONG, ADS_WEAK, DEFAULT_ADS  # noqa: F401 (реэкспорт)
+from .textfold import fold_text
+
 URL_RE = re.compile(
     r"(?i)"
     r"("
@@ -49,35 +53,292 @@ UNMUTE_PERMS = ChatPermissions(
     can_invite_users=True,
 )
 
+# 4+ одинаковых подряд; \1\1\1+ вместо \1{3,}: без счётчика повторов вдвое быстрее
+_REPEAT_RE = re.compile(r"(.)\1\1\1+")
+
+
 def normalize_text(text: str) -> str:
-    t = (text or "").strip().lower()
-    t = re.sub(r"\s+", " ", t)
+    # общий шаг для всех фильтров: lower + FOLD_TABLE (похожие буквы, невидимые, leet в словах)
+    # split/join = strip + \s+ -> " " (тот же isspace), в разы дешевле re.sub
+    t = " ".join(fold_text(text).split())
     # убрать повторяющиеся символы типа "круууууто"
-    t = re.sub(r"(.)\1{3,}", r"\1\1", t)
-    return t
+    return _REPEAT_RE.sub(r"\1\1", t)
 
 def text_hash(text: str) -> str:
-    norm = normalize_text(text)
+    return norm_hash(normalize_text(text))
+
+def norm_hash(norm: str) -> str:
+    # для уже нормализованного текста (guard нормализует сообщение один раз)
     return hashlib.sha256(norm.encode("utf-8")).hexdigest()
 
+# URL_RE остаётся эталоном (bench/links.py сверяет с ним find_link и find_links), но в горячем
+# пути не используется: у ветки голых доменов вложенные квантификаторы, и на
+# длинных цепочках "a.a.a.a..." поиск становится квадратичным.
+# префильтр: ветки фиксированной ширины, якорь — "/", "." или "@" (быстрый пропуск),
+# префикс проверяется lookbehind'ом
+_LINK_PREFILTER_RE = re.compile(
+    r"(?i)"
+    r"(?:/(?<=https://)|/(?<=http://)|\.(?<=www\.)"
+    r"|/(?<=t\.me/)|/(?<=telegram\.me/)|/(?<=telegra\.ph/))\S"
+    r"|@\w{4}"
+)
+# кандидаты в голые домены: точка перед двумя буквами -> проверка в _bare_domain_at
+_DOMAIN_DOT_RE = re.compile(r"(?i)\.(?=[a-z]{2})")
+_LABEL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+
+def _fold_case(text: str) -> str:
+    # (?i) в re: [a-z] ловит ещё İ ı ſ K — приводим их к ascii, длина строки не меняется
+    t = text.replace("İ", "i").lower()
+    if not t.isascii():
+        t = t.replace("ı", "i").replace("ſ", "s")
+    return t
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _bare_domain_at(text: str, dot: int) -> bool:
+    """
+    Is there a URL_RE bare-domain match whose last label ends right before
+    text[dot] and whose TLD starts right after it? O(1): looks at most 65
+    chars back and 26 forward.
+    """
+    lo = max(0, dot - 65)
+    t = _fold_case(text[lo:dot + 27])
+    dot -= lo
+    n = len(t)
+    # TLD: [a-z]{2,24}, дальше "/" или не буква/цифра/_/-
+    j = dot + 1
+    end = min(n, j + 25)
+    while j < end and "a" <= t[j] <= "z":
+        j += 1
+    if not 2 <= j - dot - 1 <= 24:
+        return False
+    if j < n and t[j] != "/" and (t[j] == "-" or _is_word(t[j])):
+        return False
+
+    # метка перед точкой: самая короткая допустимая начинается после последнего "-"
+    k = dot - 1
+    if k < 0 or t[k] not in _LABEL_CHARS:
+        return False
+    stop = max(-1, dot - 65)
+    while k > stop and t[k] in _LABEL_CHARS:
+        k -= 1
+    if dot - k - 1 > 63:
+        return False
+    if k < 0 or t[k] in "-.":
+        return True
+    return not (_is_word(t[k]) or t[k] == "@")
+
+
+def find_link(text: str) -> bool:
+    """
+    Same answer as bool(URL_RE.search(text)) in linear time: a fixed-width
+    prefilter for prefixes and @username, then a bounded check around each
+    ".ab" candidate for bare domains.
+    """
+    if not text:
+        return False
+    if _LINK_PREFILTER_RE.search(text):
+        return True
+    for m in _DOMAIN_DOT_RE.finditer(text):
+        if _bare_domain_at(text, m.start()):
+            return True
+    return False
+
 def has_link(text: str) -> bool:
-    return bool(URL_RE.search(text or ""))
+    return find_link(text or "")
+
+
+# для find_links: префиксы фиксированной ширины (как ветки URL_RE, в том же порядке)
+# и начала голых доменов; длина совпадения дальше — \S* / \w* от старта
+_LINK_PREFIX_RE = re.compile(
+    r"(?i)https?://\S|www\.\S|t\.me/\S|telegram\.me/\S|telegra\.ph/\S|@\w{4}"
+)
+_BARE_START_RE = re.compile(r"(?i)(?<![\w@])[a-z0-9]")
+_NONSPACE_RUN_RE = re.compile(r"\S*")
+_WORD_RUN_RE = re.compile(r"\w*")
+_LABEL_RUN_CHARS = _LABEL_CHARS | {"-"}
+
+
+def _tld_end(text: str, t: str, q: int) -> int:
+    # TLD [a-z]{2,24} с позиции q + необязательный /путь + (?![\w-]): конец совпадения или -1
+    n = len(t)
+    j = q
+    lim = min(n, q + 25)
+    while j < lim and "a" <= t[j] <= "z":
+        j += 1
+    if not 2 <= j - q <= 24:
+        return -1
+    if j < n and text[j] == "/":
+        return _NONSPACE_RUN_RE.match(text, j).end()
+    if j < n and (text[j] == "-" or _is_word(text[j])):
+        return -1
+    return j
+
+
+def _bare_domain_from(text: str, t: str, i: int) -> Tuple[int, int]:
+    """
+    URL_RE bare-domain branch anchored at i: (end, -1) on a match, else
+    (-1, resume) — no bare domain starts in [i, resume), resume > i. Labels
+    are forced (a label runs up to the next "."), so the greedy regex
+    backtracking comes down to trying the TLD after each label's dot, last
+    one first.
+    """
+    n = len(t)
+    dots: List[int] = []
+    p = i
+    while p < n and t[p] in _LABEL_CHARS:
+        # метка — весь прогон [a-z0-9-] до следующей точки
+        e = p
+        while e < n and t[e] in _LABEL_RUN_CHARS:
+            e += 1
+        if e >= n or t[e] != "." or t[e - 1] == "-":
+            p = e           # любой старт внутри прогона упрётся в то же
+            break
+        if e - p > 63:
+            p = e - 63      # внутри прогона годятся только старты с меткой <= 63
+            break
+        p = e + 1
+        dots.append(p)
+    for q in reversed(dots):
+        end = _tld_end(text, t, q)
+        if end >= 0:
+            return end, -1
+    # старты внутри цепочки видят тот же или меньший набор TLD-кандидатов
+    return -1, p
+
+
+def link_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) of every URL_RE.finditer match, in linear time: prefix
+    branches via a fixed-width regex, bare domains via _bare_domain_from.
+    Same leftmost-first order as URL_RE (a prefix branch wins a tie).
+    """
+    spans: List[Tuple[int, int]] = []
+    if not text:
+        return spans
+    t = _fold_case(text)
+    n = len(text)
+    pos = 0
+    pm, limit = None, -1    # ближайший префикс >= pos (кэш, чтобы не пересканировать)
+    cand = -1               # ближайший кандидат в голый домен >= pos
+    while pos < n:
+        if limit < pos:
+            pm = _LINK_PREFIX_RE.search(text, pos)
+            limit = pm.start() if pm else n
+
+        bare = None
+        if cand < pos:
+            m = _BARE_START_RE.search(text, pos)
+            cand = m.start() if m else n
+        while cand < limit:
+            end, resume = _bare_domain_from(text, t, cand)
+            if end >= 0:
+                bare = (cand, end)
+                break
+            m = _BARE_START_RE.search(text, resume)
+            cand = m.start() if m else n
+
+        if bare is not None:
+            spans.append(bare)
+        elif pm is not None:
+            s = pm.start()
+            run = _WORD_RUN_RE if text[s] == "@" else _NONSPACE_RUN_RE
+            spans.append((s, run.match(text, s + 1).end()))
+        else:
+            break
+        pos = spans[-1][1]
+    return spans
+
+
+def find_links(text: str) -> List[str]:
+    """
+    Link strings for per-link rules: the URL_RE.finditer matches, found by
+    the linear link_spans.
+    """
+    return [text[a:b] for a, b in link_spans(text or "")]
+
+
+# сущности, которые Telegram сам размечает как ссылку (text_link — скрытая, regex её не видит)
+LINK_ENTITY_TYPES = frozenset({"url", "text_link", "mention", "text_mention"})
+# вырезаются из текста для regex, но ссылкой не считаются ("/start@bot" — не @username)
+_SKIP_ENTITY_TYPES = frozenset({"bot_command"})
+_COVER_ENTITY_TYPES = LINK_ENTITY_TYPES | _SKIP_ENTITY_TYPES
+
+
+def _message_entities(message: Message) -> list:
+    return list(message.entities or message.caption_entities or [])
+
+
+def extract_links(message: Message) -> Tuple[List[str], str]:
+    """
+    Entity-first link extraction. Returns (links from url/text_link/mention/
+    text_mention entities, text not covered by them or by bot commands).
+    Only the second part still needs the regex fallback. Entity offsets are
+    UTF-16 code units.
+    """
+    text = message.text or message.caption or ""
+    ents = sorted(
+        (e for e in _message_entities(message) if e.type in _COVER_ENTITY_TYPES),
+        key=lambda e: e.offset,
+    )
+    if not ents:
+        return [], text
+
+    raw = text.encode("utf-16-le")
+    links: List[str] = []
+    rest: List[str] = []
+    pos = 0
+    for e in ents:
+        a, b = e.offset * 2, (e.offset + e.length) * 2
+        if e.type in _SKIP_ENTITY_TYPES:
+            pass
+        elif e.type == "text_link":
+            links.append(e.url or "")
+        elif e.type == "text_mention":
+            links.append(f"tg://user?id={e.user.id}" if e.user else "")
+        else:
+            links.append(raw[a:b].decode("utf-16-le", "ignore"))
+        if a > pos:
+            rest.append(raw[pos:a].decode("utf-16-le", "ignore"))
+        rest.append(" ")
+        pos = max(pos, b)
+    rest.append(raw[pos:].decode("utf-16-le", "ignore"))
+    return links, "".join(rest)
+
+
+def message_links(message: Message) -> List[str]:
+    """
+    All links of a message: entities first, find_links only over the uncovered text.
+    """
+    links, rest = extract_links(message)
+    return links + find_links(rest)
+
+
+def message_has_link(message: Message, text: Optional[str] = None) -> bool:
+    """
+    Link entity present -> True without touching the text; otherwise regex
+    over `text` (defaults to text/caption; _process passes the command tail).
+    """
+    for e in _message_entities(message):
+        if e.type in LINK_ENTITY_TYPES:
+            return True
+    if text is None:
+        text = message.text or message.caption or ""
+    return has_link(text)
+
 
 def has_arabic(text: str) -> bool:
     return bool(ARABIC_RE.search(text or ""))
 
 
-ADS_STRONG = {"reklama", "реклама", "obuna", "подпиш", "подписывай", "канал", "kanal", "daromad", "даромад", "pul", "деньги", "доход", "работа", "admin", "админ", }
-ADS_WEAK = {"ish", "tg", "telegram"}
-
 def looks_like_ads(text: str) -> bool:
+    # один normalize; has_link по нормализованному тексту, как раньше
     norm = normalize_text(text)
-    if any(k in norm for k in ADS_STRONG):
-        return True
-    # слабые только если есть реальная ссылка
-    if has_link(norm) and any(k in norm for k in ADS_WEAK):
-        return True
-    return False
+    return DEFAULT_ADS.is_ads(norm, has_link(norm))
 
 async def mute_user_seconds(bot, chat_id: int, user_id: int, seconds: int) -> bool:
     if seconds <= 0:
@@ -0,0 +1,49 @@
+# app/utils/outbound.py
+from __future__ import annotations
+
+import asyncio
+from time import monotonic
+
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError
+
+
+class Outbound:
+    """
+    Rate-limited path for bulk Bot API calls (token bucket):
+      - at most `rate` calls per second, bursts up to `burst`
+      - TelegramRetryAfter -> sleep and retry, network errors -> short backoff
+    """
+
+    def __init__(self, rate: float = 20.0, burst: int | None = None, retries: int = 3):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, int(rate)))
+        self.retries = retries
+        self._tokens = self.burst
+        self._ts = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+                self._ts = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        await fn(*args, **kwargs) through the limiter. Other errors propagate.
+        """
+        for attempt in range(self.retries):
+            await self.acquire()
+            try:
+                return await fn(*args, **kwargs)
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except TelegramNetworkError:
+                await asyncio.sleep(1 + attempt)
+        await self.acquire()
+        return await fn(*args, **kwargs)
@@ -0,0 +1,179 @@
+# app/utils/profiler.py
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Сэмплирующий профайлер для owner-команды: отдельный поток раз в `interval`
+# снимает стек потока цикла событий (sys._current_frames) и копит collapsed
+# stacks ("a;b;c N") — формат flamegraph.pl / speedscope. Ничего не
+# инструментирует, цена — один обход стека на сэмпл.
+
+_MAX_DEPTH = 64
+_IDLE = "<idle>"
+
+# кадр ожидания селектора = цикл свободен
+_IDLE_FUNCS = frozenset({"select", "poll", "epoll", "kqueue", "control"})
+
+
+@dataclass
+class Profile:
+    seconds: float
+    samples: int
+    stacks: Counter = field(default_factory=Counter)   # "f1;f2;f3" -> сэмплы
+
+    @property
+    def busy(self) -> int:
+        return self.samples - self.stacks.get(_IDLE, 0)
+
+
+_labels: Dict[Any, str] = {}
+
+
+def _label(code) -> str:
+    s = _labels.get(code)
+    if s is None:
+        path = code.co_filename.replace("\\", "/")
+        for marker in ("/site-packages/", "/lib/python3"):
+            i = path.rfind(marker)
+            if i >= 0:
+                path = path[i + len(marker):]
+                if marker == "/lib/python3":
+                    path = path.split("/", 1)[-1]
+                break
+        else:
+            i = path.rfind("/app/")
+            if i >= 0:
+                path = path[i + 1:]
+        s = _labels[code] = f"{path}:{code.co_name}"
+    return s
+
+
+def _collapse(frame) -> str:
+    if frame.f_code.co_name in _IDLE_FUNCS and "selectors" in frame.f_code.co_filename:
+        return _IDLE
+    parts: List[str] = []
+    while frame is not None and len(parts) < _MAX_DEPTH:
+        parts.append(_label(frame.f_code))
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+class SamplingProfiler:
+    """
+    One run at a time: start() in the loop thread, stop() -> Profile.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._target = 0
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._t0 = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("profiler already running")
+        self._target = threading.get_ident()
+        self._stacks = Counter()
+        self._samples = 0
+        self._stop.clear()
+        self._t0 = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return Profile(time.monotonic() - self._t0, self._samples, self._stacks)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            self._stacks[_collapse(frame)] += 1
+            self._samples += 1
+            del frame
+
+
+def collapsed(p: Profile) -> str:
+    """
+    flamegraph.pl / speedscope input: "frame;frame;frame count" per line.
+    """
+    return "".join(f"{stack} {n}\n" for stack, n in p.stacks.most_common())
+
+
+def _tree(p: Profile) -> Dict[str, Any]:
+    root: Dict[str, Any] = {"n": 0, "kids": {}}
+    for stack, n in p.stacks.items():
+        if stack == _IDLE:
+            continue
+        root["n"] += n
+        node = root
+        for part in stack.split(";"):
+            node = node["kids"].setdefault(part, {"n": 0, "kids": {}})
+            node["n"] += n
+    return root
+
+
+def text_summary(p: Profile, top: int = 12, min_pct: float = 3.0, max_lines: int = 40) -> str:
+    """
+    Top self-time frames + an indented flame tree (busy samples only).
+    Chains without branching are folded into one line.
+    """
+    busy = p.busy
+    lines = [f"{p.seconds:.1f} s, {p.samples} samples, loop busy {100 * busy / max(1, p.samples):.0f}%"]
+    if not busy:
+        return "\n".join(lines)
+
+    self_time: Counter = Counter()
+    for stack, n in p.stacks.items():
+        if stack != _IDLE:
+            self_time[stack.rsplit(";", 1)[-1]] += n
+    lines.append("")
+    lines.append("self:")
+    for name, n in self_time.most_common(top):
+        lines.append(f"{100 * n / busy:5.1f}% {name}")
+
+    lines.append("")
+    lines.append("tree:")
+    node = _tree(p)
+    # общий для всех стеков префикс (asyncio run loop и т.п.) не показываем
+    while len(node["kids"]) == 1:
+        node = next(iter(node["kids"].values()))
+
+    out: List[Tuple[int, float, str]] = []
+
+    def walk(n: Dict[str, Any], depth: int) -> None:
+        for name, kid in sorted(n["kids"].items(), key=lambda kv: -kv[1]["n"]):
+            pct = 100 * kid["n"] / busy
+            if pct < min_pct or len(out) >= max_lines:
+                continue
+            # цепочку без ветвлений (middleware aiogram и т.п.) в одну строку: первый … последний
+            first, skipped = name, 0
+            while len(kid["kids"]) == 1:
+                (nxt, only), = kid["kids"].items()
+                if only["n"] != kid["n"]:
+                    break
+                name, kid, skipped = nxt, only, skipped + 1
+            out.append((depth, pct, f"{first} … {name} (+{skipped})" if skipped else name))
+            walk(kid, depth + 1)
+
+    walk(node, 0)
+    for depth, pct, name in out:
+        lines.append(f"{'  ' * depth}{pct:5.1f}% {name}")
+    return "\n".join(lines)
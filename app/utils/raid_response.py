@@ -0,0 +1,214 @@
+# app/utils/raid_response.py
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from ..db import DB
+from .antiraid import AntiRaid
+from .moderation import MUTE_PERMS, UNMUTE_PERMS
+from .outbound import Outbound
+
+RAID_ACTIONS = ("off", "mute", "ban")
+
+_ACTION_LABEL = {
+    "ban": "ban",
+    "mute": "mute",
+    "unban": "bandan chiqarish",
+    "unmute": "mutedan chiqarish",
+}
+
+_UNDO_ACTION = {"ban": "unban", "mute": "unmute"}
+
+
+@dataclass
+class _Job:
+    queue: List[Tuple[int, str]] = field(default_factory=list)   # (user_id, action)
+    seen: Set[Tuple[int, str]] = field(default_factory=set)
+    # action -> [bajarildi, xato, jami]; tartib — status xabaridagi tartib
+    counts: Dict[str, List[int]] = field(default_factory=dict)
+    raid_id: int = 0                                      # RaidBatch.raid_id (0 = hali batch yo'q)
+    batch_ids: Dict[str, int] = field(default_factory=dict)  # "ban"/"mute" -> RaidBatch.id
+    status_msg_id: int | None = None
+    task: asyncio.Task | None = None
+
+
+class RaidResponder:
+    """
+    Bulk raid response per chat:
+      - start(): ban/mute joiners of the detection window, then add() joiners of the lock window
+      - one job per chat while the chat is locked (antiraid.is_locked): one worker,
+        one status message and one raid_id for every batch of that raid; each
+        queued user carries its own action
+      - calls go through Outbound (rate-limited) in batches, progress is edited into one message
+      - undo(): reverses every batch of the last raid stored in raid_batches
+    """
+
+    def __init__(self, bot: Bot, db: DB, outbound: Outbound, antiraid: AntiRaid, batch_size: int = 25):
+        self.bot = bot
+        self.db = db
+        self.outbound = outbound
+        self.antiraid = antiraid
+        self.batch_size = batch_size
+        self._jobs: Dict[int, _Job] = {}
+
+    def is_running(self, chat_id: int) -> bool:
+        job = self._jobs.get(chat_id)
+        return bool(job and job.task and not job.task.done())
+
+    async def start(self, chat_id: int, action: str, user_ids: List[int]) -> None:
+        """
+        Raid detected (chat just locked): a new raid, unless the chat's worker is
+        still busy — then its queue and batches become part of this raid.
+        """
+        if action not in ("ban", "mute"):
+            return
+        if not self.is_running(chat_id):
+            self._jobs[chat_id] = _Job()
+        self.add(chat_id, action, user_ids)
+
+    def add(self, chat_id: int, action: str, user_ids: List[int]) -> None:
+        """
+        Joiners during lock window: extend the chat's job. The job lives as long
+        as the lock (or its worker), so late joiners after the queue drained get
+        the same batch and status message. Registered before any await, so
+        concurrent calls share it.
+        """
+        if action not in ("ban", "mute"):
+            return
+        self._enqueue(chat_id, self._job(chat_id), action, user_ids)
+
+    def _job(self, chat_id: int) -> _Job:
+        job = self._jobs.get(chat_id)
+        if job is None or not (self.is_running(chat_id) or self.antiraid.is_locked(chat_id)):
+            job = _Job()
+            self._jobs[chat_id] = job
+        return job
+
+    async def undo(self, chat_id: int) -> int:
+        """
+        Reverse every not-undone batch of the last raid. Returns number of users queued (0 = nothing to undo).
+        """
+        running = self._jobs.get(chat_id)
+        if running and running.task and not running.task.done():
+            running.task.cancel()
+            # дождёмся, пока воркер сохранит уже обработанных в batch
+            try:
+                await running.task
+            except asyncio.CancelledError:
+                pass
+
+        batches = await self.db.get_last_raid_batches(chat_id)
+        if not batches:
+            return 0
+        # новый job: дальнейшие joiners этого замка пойдут уже в новый raid_id
+        for batch in batches:
+            await self.db.mark_raid_batch_undone(batch.id)
+        job = _Job()
+        self._jobs[chat_id] = job
+        for batch in batches:
+            ids = json.loads(batch.user_ids_json or "[]")
+            self._enqueue(chat_id, job, _UNDO_ACTION.get(batch.action, "unmute"), ids)
+        return len(job.queue)
+
+    def _enqueue(self, chat_id: int, job: _Job, action: str, user_ids: List[int]) -> None:
+        c = job.counts.setdefault(action, [0, 0, 0])
+        for uid in user_ids:
+            key = (uid, action)
+            if key not in job.seen:
+                job.seen.add(key)
+                job.queue.append(key)
+                c[2] += 1
+        if job.queue and (job.task is None or job.task.done()):
+            job.task = asyncio.create_task(self._worker(chat_id, job))
+
+    async def _apply(self, chat_id: int, action: str, user_id: int) -> None:
+        if action == "ban":
+            await self.outbound.call(self.bot.ban_chat_member, chat_id, user_id, revoke_messages=True)
+        elif action == "mute":
+            await self.outbound.call(
+                self.bot.restrict_chat_member, chat_id=chat_id, user_id=user_id, permissions=MUTE_PERMS
+            )
+        elif action == "unban":
+            await self.outbound.call(self.bot.unban_chat_member, chat_id, user_id, only_if_banned=True)
+        elif action == "unmute":
+            await self.outbound.call(
+                self.bot.restrict_chat_member, chat_id=chat_id, user_id=user_id, permissions=UNMUTE_PERMS
+            )
+
+    async def _report(self, chat_id: int, job: _Job, final: bool = False) -> None:
+        head = "✅ Anti-raid" if final else "🧹 Anti-raid"
+        parts = []
+        for action, (done, failed, total) in job.counts.items():
+            if not total:
+                continue
+            part = f"{_ACTION_LABEL.get(action, action)} — {done + failed}/{total}"
+            if failed:
+                part += f" (xatolik: {failed})"
+            parts.append(part)
+        text = f"{head}: " + "; ".join(parts)
+        try:
+            if job.status_msg_id is None:
+                msg = await self.outbound.call(self.bot.send_message, chat_id, text)
+                job.status_msg_id = msg.message_id
+            else:
+                await self.outbound.call(self.bot.edit_message_text, text, chat_id=chat_id, message_id=job.status_msg_id)
+        except Exception:
+            pass
+
+    async def _batch_id(self, chat_id: int, job: _Job, action: str) -> int | None:
+        if action not in ("ban", "mute"):
+            return None
+        if action not in job.batch_ids:
+            try:
+                bid = await self.db.create_raid_batch(chat_id, action, raid_id=job.raid_id)
+            except Exception as e:
+                # без batch /raidqaytar этих не откатит, но ban/mute важнее
+                print(f"[raid_response] batch create failed chat={chat_id}: {type(e).__name__}: {e}")
+                return None
+            job.batch_ids[action] = bid
+            if not job.raid_id:
+                job.raid_id = bid
+        return job.batch_ids[action]
+
+    async def _worker(self, chat_id: int, job: _Job) -> None:
+        try:
+            # batch-и заранее: при отмене в середине chunk-а сохранять будет куда
+            for action in dict.fromkeys(a for _, a in job.queue):
+                await self._batch_id(chat_id, job, action)
+            await self._report(chat_id, job)
+            while job.queue:
+                chunk = job.queue[:self.batch_size]
+                del job.queue[:self.batch_size]
+                ok_ids: Dict[str, List[int]] = {}
+                try:
+                    for uid, action in chunk:
+                        c = job.counts[action]
+                        try:
+                            await self._apply(chat_id, action, uid)
+                            ok_ids.setdefault(action, []).append(uid)
+                            c[0] += 1
+                        except (TelegramBadRequest, TelegramForbiddenError) as e:
+                            c[1] += 1
+                            print(f"[raid_response] {action} failed chat={chat_id} user={uid}: {e}")
+                        except Exception as e:
+                            c[1] += 1
+                            print(f"[raid_response] {action} failed chat={chat_id} user={uid}: {type(e).__name__}: {e}")
+                finally:
+                    # сохраняем даже при отмене, чтобы /raidqaytar знал, кого откатывать
+                    for action, ids in ok_ids.items():
+                        bid = await self._batch_id(chat_id, job, action)
+                        if bid is None:
+                            continue
+                        try:
+                            await self.db.append_raid_batch(bid, ids)
+                        except Exception as e:
+                            print(f"[raid_response] batch save failed chat={chat_id}: {type(e).__name__}: {e}")
+                await self._report(chat_id, job, final=not job.queue)
+        except asyncio.CancelledError:
+            return
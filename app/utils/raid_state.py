@@ -0,0 +1,181 @@
+# app/utils/raid_state.py
+from __future__ import annotations
+
+import asyncio
+import json
+from time import time
+from typing import Callable, Dict, Optional, Set
+
+from aiogram import Bot
+from aiogram.types import ChatPermissions
+
+from ..db import DB
+from .antiraid import AntiRaid
+
+ALLOW_ALL = ChatPermissions(
+    can_send_messages=True,
+    can_send_media_messages=True,
+    can_send_polls=True,
+    can_send_other_messages=True,
+    can_add_web_page_previews=True,
+    can_invite_users=True,
+)
+
+DENY_ALL = ChatPermissions(
+    can_send_messages=True,
+    can_send_media_messages=True,
+    can_send_polls=False,
+    can_send_other_messages=False,
+    can_add_web_page_previews=False,
+    can_invite_users=False,
+)
+
+
+class RaidKeeper:
+    """
+    Persistence and reopen timers for AntiRaid:
+      - restore_from_db(): one query on startup, re-arms reopen timers (overdue -> now)
+      - lock(): closes chat, remembers previous permissions, saves snapshot right away
+      - start(): periodic flush of changed join counters to raid_snapshots
+    """
+
+    def __init__(self, bot: Bot, db: DB, antiraid: AntiRaid, flush_sec: int = 30):
+        self.bot = bot
+        self.db = db
+        self.antiraid = antiraid
+        self.flush_sec = flush_sec
+        self._reopen_tasks: Dict[int, asyncio.Task] = {}
+        # чаты, которые сейчас закрываются (между первым await и set_locked)
+        self._locking: Set[int] = set()
+        self._flush_task: asyncio.Task | None = None
+
+    async def restore_from_db(self, owns: Optional[Callable[[int], bool]] = None) -> None:
+        rows = await self.db.list_raid_snapshots()
+        now = time()
+        for row in rows:
+            if owns is not None and not owns(row.chat_id):
+                continue
+            try:
+                buckets = json.loads(row.buckets_json or "[]")
+            except ValueError:
+                buckets = []
+            self.antiraid.restore(
+                row.chat_id,
+                buckets=buckets,
+                bucket_width=row.bucket_width,
+                head=row.head,
+                locked_until=row.locked_until,
+                prev_perms=row.prev_perms_json,
+            )
+            if row.locked_until:
+                # просроченные reopen выполняем сразу
+                self._schedule_reopen(row.chat_id, max(0.0, row.locked_until - now))
+
+    def start(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self) -> None:
+        snaps = {}
+        for chat_id in self.antiraid.drain_dirty():
+            snap = self.antiraid.snapshot(chat_id)
+            if snap is not None:
+                snaps[chat_id] = snap
+        if not snaps:
+            return
+        try:
+            await self.db.save_raid_snapshots(snaps)
+        except Exception as e:
+            print(f"[antiraid] snapshot flush failed chats={len(snaps)}: {type(e).__name__}: {e}")
+
+    async def _flush_loop(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.flush_sec)
+                await self.flush()
+        except asyncio.CancelledError:
+            return
+
+    async def lock(self, chat_id: int, close_sec: int) -> bool:
+        """
+        Closes the chat with DENY_ALL. Returns False if the chat is already
+        locked / being locked by a concurrent trigger, or bot can't change permissions.
+        """
+        # проверка и отметка до первого await: параллельные триггеры одного рейда
+        # иначе перечитали бы уже закрытые права и записали их как "прошлые"
+        if chat_id in self._locking or self.antiraid.is_locked(chat_id):
+            return False
+        self._locking.add(chat_id)
+        try:
+            prev = ""
+            try:
+                chat = await self.bot.get_chat(chat_id)
+                perms = getattr(chat, "permissions", None)
+                # если чат уже закрыт нами (например, после сбоя) — не запоминаем DENY_ALL как "прошлое"
+                if perms is not None and perms != DENY_ALL:
+                    prev = perms.model_dump_json(exclude_none=True)
+            except Exception:
+                pass
+
+            try:
+                await self.bot.set_chat_permissions(chat_id, DENY_ALL)
+            except Exception as e:
+                print(f"[antiraid] set_chat_permissions failed chat={chat_id}: {type(e).__name__}: {e}")
+                return False
+
+            self.antiraid.set_locked(chat_id, close_sec, prev_perms=prev)
+        finally:
+            self._locking.discard(chat_id)
+        await self.flush()
+        self._schedule_reopen(chat_id, close_sec)
+        return True
+
+    def _schedule_reopen(self, chat_id: int, delay: float) -> None:
+        old = self._reopen_tasks.pop(chat_id, None)
+        if old and not old.done():
+            old.cancel()
+        self._reopen_tasks[chat_id] = asyncio.create_task(self._reopen_later(chat_id, delay))
+
+    async def _reopen_later(self, chat_id: int, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        self._reopen_tasks.pop(chat_id, None)
+        if not await self._restore_perms(chat_id):
+            return
+        try:
+            await self.bot.send_message(chat_id, "✅ Anti-raid: chat qayta ochildi.")
+        except Exception:
+            print(f"[antiraid open] notify failed chat={chat_id}")
+
+    async def _restore_perms(self, chat_id: int) -> bool:
+        raw = self.antiraid.prev_perms(chat_id)
+        perms = ALLOW_ALL
+        if raw:
+            try:
+                perms = ChatPermissions.model_validate_json(raw)
+            except ValueError:
+                perms = ALLOW_ALL
+        try:
+            await self.bot.set_chat_permissions(chat_id, perms)
+        except Exception as e:
+            print(f"[antiraid] reopen failed chat={chat_id}: {type(e).__name__}: {e}")
+            return False
+        self.antiraid.set_unlocked(chat_id)
+        await self.flush()
+        return True
+
+    async def disable(self, chat_id: int) -> None:
+        """
+        Anti-raid OFF: cancel timer, open chat (best-effort), forget state.
+        """
+        task = self._reopen_tasks.pop(chat_id, None)
+        if task and not task.done():
+            task.cancel()
+        await self._restore_perms(chat_id)
+        self.antiraid.clear(chat_id)
+        try:
+            await self.db.delete_raid_snapshot(chat_id)
+        except Exception:
+            pass
@@ -0,0 +1,136 @@
+# app/utils/scripts.py
+from __future__ import annotations
+import bisect
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# ПОРЯДОК НЕ МЕНЯТЬ: индекс = бит в ChatSettings.blocked_scripts (новые — только в конец)
+_SCRIPT_RANGES: Tuple[Tuple[str, Tuple[Tuple[int, int], ...]], ...] = (
+    ("latin", ((0x41, 0x5A), (0x61, 0x7A), (0xC0, 0xD6), (0xD8, 0xF6), (0xF8, 0x24F), (0x1E00, 0x1EFF))),
+    ("cyrillic", ((0x400, 0x52F), (0x1C80, 0x1C8F), (0x2DE0, 0x2DFF), (0xA640, 0xA69F))),
+    ("arabic", ((0x600, 0x6FF), (0x750, 0x77F), (0x8A0, 0x8FF), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF))),
+    ("cjk", ((0x2E80, 0x2FDF), (0x3040, 0x30FF), (0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF),
+             (0x20000, 0x2FA1F))),
+    ("hangul", ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF))),
+    ("devanagari", ((0x900, 0x97F), (0xA8E0, 0xA8FF))),
+    ("bengali", ((0x980, 0x9FF),)),
+    ("tamil", ((0xB80, 0xBFF),)),
+    ("thai", ((0xE00, 0xE7F),)),
+    ("greek", ((0x370, 0x3FF), (0x1F00, 0x1FFF))),
+    ("armenian", ((0x530, 0x58F),)),
+    ("georgian", ((0x10A0, 0x10FF), (0x2D00, 0x2D2F))),
+    ("hebrew", ((0x590, 0x5FF), (0xFB1D, 0xFB4F))),
+    ("ethiopic", ((0x1200, 0x139F),)),
+)
+
+SCRIPTS: Tuple[str, ...] = tuple(name for name, _ in _SCRIPT_RANGES)
+SCRIPT_BITS: Dict[str, int] = {name: 1 << i for i, name in enumerate(SCRIPTS)}
+
+# названия для пользователей (и как принимаем в /skript)
+SCRIPT_LABELS: Dict[str, str] = {
+    "latin": "lotin", "cyrillic": "kirill", "arabic": "arab", "cjk": "xitoy", "hangul": "koreys",
+    "devanagari": "hind", "bengali": "bengal", "tamil": "tamil", "thai": "tay", "greek": "yunon",
+    "armenian": "arman", "georgian": "gruzin", "hebrew": "ivrit", "ethiopic": "efiop",
+}
+_ALIASES: Dict[str, str] = {**{v: k for k, v in SCRIPT_LABELS.items()}, **{k: k for k in SCRIPTS}}
+
+# отсортированные (start, end, index) для bisect
+_RANGES: List[Tuple[int, int, int]] = sorted(
+    (a, b, i) for i, (_, rs) in enumerate(_SCRIPT_RANGES) for a, b in rs
+)
+_STARTS = [r[0] for r in _RANGES]
+
+
+class _ScriptTable(dict):
+    """
+    str.translate table codepoint -> script index char (chr(0x30 + i)), None
+    for everything else (digits, spaces, emoji...). Filled lazily: each
+    codepoint is resolved with bisect once, then it is a plain dict hit.
+    Only the BMP is memoized, so the table stays under 64k entries.
+    """
+    def __missing__(self, cp: int) -> Optional[str]:
+        i = bisect.bisect_right(_STARTS, cp) - 1
+        v = chr(0x30 + _RANGES[i][2]) if i >= 0 and cp <= _RANGES[i][1] else None
+        if cp < 0x10000:
+            self[cp] = v
+        return v
+
+
+_TABLE = _ScriptTable()
+
+
+class ScriptProfile(NamedTuple):
+    mask: int                 # биты присутствующих письменностей
+    counts: Dict[str, int]    # письменность -> число букв
+    total: int                # букв известных письменностей
+
+    def share(self, mask: int) -> float:
+        if not self.total:
+            return 0.0
+        return sum(n for name, n in self.counts.items() if SCRIPT_BITS[name] & mask) / self.total
+
+
+def profile(text: str) -> ScriptProfile:
+    """
+    One pass over the text: which scripts are present and how many letters each.
+    """
+    counts: Dict[str, int] = {}
+    mask = 0
+    total = 0
+    for ch, n in Counter((text or "").translate(_TABLE)).items():
+        name = SCRIPTS[ord(ch) - 0x30]
+        counts[name] = n
+        mask |= SCRIPT_BITS[name]
+        total += n
+    return ScriptProfile(mask, counts, total)
+
+
+@lru_cache(maxsize=256)
+def _mask_re(mask: int) -> "re.Pattern[str]":
+    # один класс символов на все запрещённые письменности: цена не зависит от их числа
+    parts = [
+        f"{re.escape(chr(a))}-{re.escape(chr(b))}"
+        for a, b, i in _RANGES if (1 << i) & mask
+    ]
+    return re.compile("[" + "".join(parts) + "]")
+
+
+def blocked_scripts_hit(text: str, mask: int, min_pct: int = 0) -> int:
+    """
+    Bits of blocked scripts found in text, or 0. With min_pct == 0 the first
+    blocked letter decides (its script bit is returned); with min_pct > 0 the
+    blocked letters must make up at least min_pct % of all letters.
+    """
+    if not mask or not text:
+        return 0
+    m = _mask_re(mask).search(text)
+    if m is None:
+        return 0
+    if min_pct <= 0:
+        # хватает одной буквы — письменность первой найденной, без полного прохода
+        return SCRIPT_BITS[SCRIPTS[ord(_TABLE[ord(m.group())]) - 0x30]]
+    p = profile(text)
+    if p.share(mask) * 100 < min_pct:
+        return 0
+    return p.mask & mask
+
+
+def parse_scripts(words: Iterable[str]) -> Tuple[int, List[str]]:
+    """
+    ["arab", "cjk", "xyz"] -> (mask, ["xyz"]) — unknown names returned separately.
+    """
+    mask = 0
+    unknown: List[str] = []
+    for w in words:
+        name = _ALIASES.get(w.strip().lower())
+        if name is None:
+            unknown.append(w)
+        else:
+            mask |= SCRIPT_BITS[name]
+    return mask, unknown
+
+
+def script_labels(mask: int) -> str:
+    return ", ".join(SCRIPT_LABELS[name] for name in SCRIPTS if SCRIPT_BITS[name] & mask)
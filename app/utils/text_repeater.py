@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import asyncio
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
@@ -28,14 +28,17 @@ class TextRepeater:
         self.db = db
         self._tasks: Dict[int, _TaskInfo] = {}
 
-    async def restore_from_db(self) -> None:
+    async def restore_from_db(self, owns: Optional[Callable[[int], bool]] = None) -> None:
         """
         On startup: schedule tasks for chats where repeat is enabled.
+        owns: shard filter (sharded mode), None = all chats.
         """
         # we don't have a dedicated query method, so:
         # take active chats and check settings
         chat_ids = await self.db.list_active_chats(limit=5000)
         for chat_id in chat_ids:
+            if owns is not None and not owns(chat_id):
+                continue
             s = await self.db.get_or_create_settings(chat_id)
             if getattr(s, "force_text_repeat_sec", 0) and (s.force_text or "").strip():
                 self.start(chat_id)
@@ -0,0 +1,116 @@
+# app/utils/textfold.py
+from __future__ import annotations
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+# Один str.translate после lower(): похожие буквы -> латиница, невидимые/форматирующие
+# символы -> удалить; затем leet-цифры -> буквы, но только в словах, где есть и буквы.
+# Применять одинаково к тексту и к спискам слов (badwords, ads), тогда
+# "сука" == "cукa" == "cyk4", а "17 yosh" остаётся "17 yosh".
+
+# кириллица/греческий, которые в нижнем регистре выглядят как латиница
+_CONFUSABLES = {
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ї": "i", "ј": "j", "ѕ": "s", "һ": "h",
+    "ӏ": "l", "ԁ": "d", "ԛ": "q", "ԝ": "w", "ү": "y",
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x", "ω": "w",
+    "ı": "i", "ɡ": "g", "ɑ": "a", "ℓ": "l",
+}
+
+# leet: только цифры ("@" и "$" не трогаем — это @username и валюта); числа
+# целиком (возраст, цена, дата) не трогаем: "17" -> "it" ловился бы как мат
+_LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b"}
+_LEET_TABLE = str.maketrans(_LEET)
+# серии цифр: их в тексте мало, а [0-9] сканируется в разы быстрее \w/\b по
+# всему тексту; соседние буквы проверяем уже в Python
+_DIGIT_RUN_RE = re.compile(r"[0-9]+")
+
+# апострофы узбекской латиницы (o‘ g‘) к одному виду
+_APOSTROPHES = {"‘": "'", "’": "'", "ʻ": "'", "ʼ": "'", "`": "'", "´": "'"}
+
+# zero-width, bidi-управляющие, soft hyphen, variation selectors
+_INVISIBLE = (
+    [0x00AD, 0x034F, 0x061C, 0x115F, 0x1160, 0x17B4, 0x17B5, 0x180E, 0x3164, 0xFEFF, 0xFFA0]
+    + list(range(0x200B, 0x2010))
+    + list(range(0x202A, 0x202F))
+    + list(range(0x2060, 0x2070))
+    + list(range(0xFE00, 0xFE10))
+)
+
+# стилизованные буквы (𝐬𝐮𝐤𝐚, ｓｕｋａ, ⓢⓤⓚⓐ, 🅢🅤🅚🅐) -> через NFKC к обычным
+_STYLED_RANGES = ((0xFF01, 0xFF5E), (0x2460, 0x24FF), (0x1D400, 0x1D7FF), (0x1F130, 0x1F189))
+
+# тождественные записи для частых блоков: символ без записи в таблице — это
+# KeyError внутри translate на каждый символ (в ~3 раза медленнее на не-ASCII)
+_PASSTHROUGH_RANGES = ((0x0000, 0x024F), (0x0370, 0x052F), (0x0600, 0x06FF), (0x2010, 0x206F),
+                       (0x2600, 0x27BF), (0x1F300, 0x1FAFF))
+
+
+def _build_table() -> Dict[int, Optional[str]]:
+    table: Dict[int, Optional[str]] = {}
+    for a, b in _PASSTHROUGH_RANGES:
+        for cp in range(a, b + 1):
+            table[cp] = chr(cp)
+    for a, b in _STYLED_RANGES:
+        for cp in range(a, b + 1):
+            s = unicodedata.normalize("NFKC", chr(cp)).lower()
+            if len(s) == 1 and s != chr(cp):
+                table[cp] = s
+    # комбинируемые диакритики (zalgo, "и" + U+0306 вместо "й")
+    for cp in range(0x0300, 0x0370):
+        table[cp] = None
+    # ...значит и готовые буквы с ними сводим к базовой, иначе "й" != "и" + U+0306:
+    # й -> и, ў -> у, é -> e (без NFC на каждое сообщение)
+    for cp in [*table, *range(0x1E00, 0x2000)]:
+        d = unicodedata.normalize("NFD", chr(cp))
+        if len(d) > 1 and all(0x0300 <= ord(c) < 0x0370 for c in d[1:]):
+            table[cp] = d[0]
+    for cp in _INVISIBLE:
+        table[cp] = None
+    for src, dst in {**_CONFUSABLES, **_APOSTROPHES}.items():
+        table[ord(src)] = dst
+    # второй проход по результату ничего не меняет (fold идемпотентен)
+    for cp, v in list(table.items()):
+        if v is not None and ord(v) in table:
+            table[cp] = table[ord(v)]
+    return table
+
+
+FOLD_TABLE: Dict[int, Optional[str]] = _build_table()
+
+
+def _word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _fold_leet(t: str) -> str:
+    parts: List[str] = []
+    last, n = 0, len(t)
+    for m in _DIGIT_RUN_RE.finditer(t):
+        s, e = m.span()
+        if s < last:
+            continue  # уже внутри обработанного слова
+        if not ((s and t[s - 1].isalpha()) or (e < n and t[e].isalpha())):
+            continue  # число целиком: 17, 07.05, 50
+        while s > last and _word_char(t[s - 1]):
+            s -= 1
+        while e < n and _word_char(t[e]):
+            e += 1
+        parts.append(t[last:s])
+        parts.append(t[s:e].translate(_LEET_TABLE))
+        last = e
+    if not parts:
+        return t
+    parts.append(t[last:])
+    return "".join(parts)
+
+
+def fold_text(text: str) -> str:
+    """
+    lower() + FOLD_TABLE in one C-level translate pass, then leet digits in
+    words that also have letters ("cyk4" -> "cyka"); numbers stay numbers.
+    """
+    t = (text or "").lower().translate(FOLD_TABLE)
+    return _fold_leet(t)
@@ -0,0 +1,238 @@
+# app/utils/update_pool.py
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+# (handler, update, data, enqueued_at)
+_Item = Tuple[Callable[[Any, Dict[str, Any]], Awaitable[Any]], Update, Dict[str, Any], float]
+
+# порядок = приоритет
+LANES = ("member", "moderation", "commands")
+
+SERVICE_TYPES = frozenset({
+    "new_chat_members",
+    "left_chat_member",
+    "new_chat_title",
+    "new_chat_photo",
+    "delete_chat_photo",
+    "group_chat_created",
+    "supergroup_chat_created",
+    "message_auto_delete_timer_changed",
+    "pinned_message",
+    "migrate_to_chat_id",
+    "migrate_from_chat_id",
+})
+
+_WAIT_SAMPLES = 1024
+
+
+def update_chat_id(data: Dict[str, Any]) -> int:
+    chat = data.get("event_chat")
+    if chat is not None:
+        return chat.id
+    user = data.get("event_from_user")
+    return user.id if user is not None else 0
+
+
+def classify_update(update: Update, data: Dict[str, Any]) -> str:
+    """
+    member:     chat_member / join requests / service messages (anti-raid feed)
+    moderation: every group message and channel post, "/..." included —
+                guard_all must see them and admin commands must not be shed
+    commands:   callbacks and private chat flows (the only lane that sheds)
+    """
+    if update.chat_member is not None or update.my_chat_member is not None or update.chat_join_request is not None:
+        return "member"
+    if update.callback_query is not None:
+        return "commands"
+    message = update.message or update.edited_message or update.channel_post or update.edited_channel_post
+    if message is None:
+        return "commands"
+    if message.content_type in SERVICE_TYPES:
+        return "member"
+    if message.chat.type == "private":
+        return "commands"
+    return "moderation"
+
+
+@dataclass
+class LaneStats:
+    processed: int = 0
+    failed: int = 0
+    shed: int = 0
+    deferred: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=_WAIT_SAMPLES))
+
+    def wait_max(self) -> float:
+        # по тем же последним _WAIT_SAMPLES, что и перцентили (не за всё время)
+        return max(self.waits, default=0.0)
+
+    def wait_percentile(self, q: float) -> float:
+        if not self.waits:
+            return 0.0
+        data = sorted(self.waits)
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+
+class _Lane:
+    """
+    Fixed shards (chat_id % workers), one sequential worker each -> per-chat order inside a lane.
+    """
+
+    def __init__(self, name: str, workers: int, max_in_flight: int, shed_depth: int = 0):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.shed_depth = int(shed_depth)  # 0 = не сбрасываем, только backpressure
+        self.queues: List["asyncio.Queue[_Item]"] = [asyncio.Queue() for _ in range(self.workers)]
+        # сверх max_in_flight: ждут места в порядке прихода (ingress при этом не стоит)
+        self.deferred: Deque[Tuple["asyncio.Queue[_Item]", _Item]] = deque()
+        self.tasks: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.stats = LaneStats()
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+
+class UpdatePool(BaseMiddleware):
+    """
+    Outer update middleware with priority lanes (see classify_update):
+      - each lane has its own workers (= concurrency limit) and its own max_in_flight,
+        so a flood of ordinary messages can't delay chat_member / join handling
+      - per-chat order is kept inside a lane
+      - lane full -> the update waits in that lane's deferred list and ingress goes
+        on, so a busy moderation lane does not hold back a chat_member update
+        behind it; ingress (polling with handle_as_tasks=False) stops only when
+        all lanes together defer max_backlog updates
+      - the commands lane drops its oldest updates past shed_depth instead
+      - queue wait time is sampled per lane (stats(), over the last samples)
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        max_in_flight: int = 1000,
+        shed_depth: int = 200,
+        member_workers: int = 2,
+        command_workers: int = 2,
+        max_backlog: int = 10_000,
+    ):
+        self.max_in_flight = max_in_flight
+        self.shed_depth = shed_depth
+        self.max_backlog = max(1, int(max_backlog))
+        self._deferred = 0
+        self._room: asyncio.Event | None = None
+        self._config = {
+            "member": (member_workers, max_in_flight, 0),
+            "moderation": (workers, max_in_flight, 0),
+            "commands": (command_workers, max_in_flight, shed_depth),
+        }
+        self._lanes: Dict[str, _Lane] = {}
+
+    def start(self) -> None:
+        if self._lanes:
+            return
+        self._room = asyncio.Event()
+        self._room.set()
+        for name in LANES:
+            workers, max_in_flight, shed_depth = self._config[name]
+            lane = _Lane(name, workers, max_in_flight, shed_depth)
+            lane.tasks = [asyncio.create_task(self._worker(lane, q)) for q in lane.queues]
+            self._lanes[name] = lane
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        if not self._lanes:
+            return await handler(event, data)
+
+        lane = self._lanes[classify_update(event, data)]
+        queue = lane.queues[update_chat_id(data) % lane.workers]
+
+        if lane.shed_depth and queue.qsize() >= lane.shed_depth:
+            # низкий приоритет: выкидываем самый старый, новый важнее
+            queue.get_nowait()
+            lane.stats.shed += 1
+            self._release(lane)
+
+        item = (handler, event, data, monotonic())
+        if lane.deferred or lane.in_flight >= lane.max_in_flight:
+            # не ждём здесь: остальные lane'ы должны получать апдейты дальше
+            lane.deferred.append((queue, item))
+            lane.stats.deferred += 1
+            self._deferred += 1
+        else:
+            lane.in_flight += 1
+            queue.put_nowait(item)
+
+        # общий предел: дальше polling ждёт, пока отложенные не разойдутся
+        while self._deferred >= self.max_backlog and self._room is not None:
+            self._room.clear()
+            await self._room.wait()
+        return None
+
+    def _release(self, lane: _Lane) -> None:
+        lane.in_flight -= 1
+        # освободившееся место — первому отложенному (порядок чата сохраняется)
+        while lane.deferred and lane.in_flight < lane.max_in_flight:
+            queue, item = lane.deferred.popleft()
+            self._deferred -= 1
+            lane.in_flight += 1
+            queue.put_nowait(item)
+        if self._room is not None and self._deferred < self.max_backlog:
+            self._room.set()
+
+    async def _worker(self, lane: _Lane, queue: "asyncio.Queue[_Item]") -> None:
+        st = lane.stats
+        try:
+            while True:
+                handler, event, data, enqueued = await queue.get()
+                st.waits.append(monotonic() - enqueued)
+                try:
+                    await handler(event, data)
+                    st.processed += 1
+                except Exception as e:
+                    st.failed += 1
+                    print(f"[update_pool] lane={lane.name} update={event.update_id} failed: {type(e).__name__}: {e}")
+                finally:
+                    self._release(lane)
+        except asyncio.CancelledError:
+            return
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for name, lane in self._lanes.items():
+            st = lane.stats
+            out[name] = {
+                "workers": lane.workers,
+                "in_flight": lane.in_flight,
+                "depth": lane.depth(),
+                "deferred": len(lane.deferred),
+                "processed": st.processed,
+                "failed": st.failed,
+                "shed": st.shed,
+                "wait_p50": st.wait_percentile(0.50),
+                "wait_p99": st.wait_percentile(0.99),
+                "wait_max": st.wait_max(),
+            }
+        return out
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Give workers `timeout` seconds to drain, then cancel them.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while any(lane.in_flight or lane.deferred for lane in self._lanes.values()) and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        for lane in self._lanes.values():
+            for task in lane.tasks:
+                if not task.done():
+                    task.cancel()
+        self._lanes = {}
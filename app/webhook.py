@@ -0,0 +1,49 @@
+# app/webhook.py
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from .config import Config
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret: str = "") -> web.Application:
+    """
+    aiohttp app: POST `path` -> 200 right away, update is handled in a background task.
+    Wrong X-Telegram-Bot-Api-Secret-Token -> 401.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret or None,
+        handle_in_background=True,
+    ).register(app, path=path)
+    # dp.startup / dp.shutdown (flush, pool.close ...) как при polling
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, cfg: Config, allowed_updates: List[str]) -> None:
+    app = build_webhook_app(dp, bot, cfg.webhook_path, cfg.webhook_secret)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, cfg.webhook_host, cfg.webhook_port)
+    await site.start()
+
+    url = cfg.webhook_url.rstrip("/") + cfg.webhook_path
+    await bot.set_webhook(
+        url,
+        secret_token=cfg.webhook_secret or None,
+        allowed_updates=allowed_updates,
+    )
+    print(f"[webhook] listening on {cfg.webhook_host}:{cfg.webhook_port}{cfg.webhook_path} -> {url}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,170 @@
+# bench/ads.py
+"""
+Ads classifier: precision/recall on a small labelled corpus and speed on the
+bench corpus, AdsClassifier (app/utils/ads_filter.py) vs the previous
+substring check (kept here as legacy_looks_like_ads).
+
+    python -m bench.ads [--threshold 1.0] [--show-errors]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from typing import Callable, List, Tuple
+
+from app.utils.ads_filter import AdsClassifier
+from app.utils.moderation import has_link, normalize_text
+from bench import corpus
+
+_LEGACY_STRONG = {"reklama", "реклама", "obuna", "подпиш", "подписывай", "канал", "kanal", "daromad", "даромад", "pul",
+                  "деньги", "доход", "работа", "admin", "админ"}
+_LEGACY_WEAK = {"ish", "tg", "telegram"}
+
+
+def _legacy_normalize(text: str) -> str:
+    # normalize_text до FOLD_TABLE
+    t = (text or "").strip().lower()
+    t = re.sub(r"\s+", " ", t)
+    return re.sub(r"(.)\1{3,}", r"\1\1", t)
+
+
+def legacy_looks_like_ads(text: str) -> bool:
+    norm = _legacy_normalize(text)
+    if any(k in norm for k in _LEGACY_STRONG):
+        return True
+    if has_link(norm) and any(k in norm for k in _LEGACY_WEAK):
+        return True
+    return False
+
+
+# (текст, это реклама?)
+LABELLED: List[Tuple[str, bool]] = [
+    # реклама
+    ("Kanalimizga obuna bo‘ling, har kuni yangiliklar!", True),
+    ("REKLAMA uchun adminga yozing @reklama_uz", True),
+    ("Reklamangizni biz bilan joylang, arzon narxlar", True),
+    ("Kunlik daromad 500 000 so‘m, uydan turib!", True),
+    ("Pul ishlashni xohlaysizmi? Batafsil t.me/pul_kanal", True),
+    ("Pulni ko‘paytirish sirlari — bepul kurs", True),
+    ("Ish bor! Oylik yuqori, murojaat: t.me/ish_bor", True),
+    ("Telegram kanalimiz: t.me/news_uz", True),
+    ("Подпишись на наш канал, там всё самое интересное", True),
+    ("Подписывайтесь и получайте бонусы", True),
+    ("Реклама в наших группах, пишите админу", True),
+    ("Рекламу можно заказать у админа", True),
+    ("Заработок в интернете без вложений от 100$ в день", True),
+    ("Работа для студентов, доход каждый день", True),
+    ("Лёгкие деньги! Пиши в лс", True),
+    ("Даромад 1000$ ойига, каналга ёзилинг", True),
+    ("Admin bilan bog‘laning: @admin_uz", True),
+    ("Obunachilar soni 10k! Reklama narxi arzon", True),
+    ("Работаем без выходных, заработать может каждый sayt.uz", True),
+    ("Yangi ish o‘rinlari sayt.uz da", True),
+    ("tg kanal: t.me/kino_uz", True),
+    ("Kanalga qo‘shiling: kino.uz", True),
+    # обход фильтра: латиница в кириллице, leet-цифры, zero-width
+    ("Pеклама недорого, пишите в лс", True),
+    ("0buna bo‘ling, bonus bor", True),
+    ("REK\u200bLAMA joylash arzon", True),
+    # обычные сообщения
+    ("Badminton bo‘yicha musobaqa ertaga soat 10 da", False),
+    ("Bu juda popular qo‘shiq ekan", False),
+    ("Kishi o‘z ishini yaxshi bilishi kerak", False),
+    ("Bilish kerak bo‘lgan narsalar ko‘p", False),
+    ("Разработать новый проект к пятнице", False),
+    ("Мы будем дорабатывать проект", False),
+    ("Он обработал все заявки вовремя", False),
+    ("Телеканал показал старый фильм", False),
+    ("Администрация школы объявила собрание", False),
+    ("Вчера смотрели фильм, очень понравился", False),
+    ("Assalomu alaykum, qalaysizlar?", False),
+    ("Ertaga dars bo‘ladimi?", False),
+    ("Uy vazifasini kim qildi?", False),
+    ("Spulni qayerdan olsa bo‘ladi?", False),
+    ("Napoleon haqida kitob o‘qidim", False),
+    ("Rasmni yubordim, ko‘rdingizmi?", False),
+    ("Дождь весь день, никуда не пошли", False),
+    ("Сколько стоит проезд в метро?", False),
+    ("Спасибо всем за поздравления!", False),
+    ("Подскажите, где найти расписание?", False),
+    ("Tushlik qilib oldingizmi?", False),
+    ("Men bugun uyda ishlayman", False),
+    ("Ishonch eng muhim narsa", False),
+    ("Bilasizmi, bu ish oson emas", False),
+    ("Kishilar ko‘p edi, tiqilinch", False),
+    ("Отличная работа, ребята!", False),
+    ("Звонил в администрацию, не берут трубку", False),
+    ("Alhamdulillah hammasi yaxshi", False),
+]
+
+
+def _metrics(fn: Callable[[str], bool]) -> Tuple[int, int, int, int, List[str]]:
+    tp = fp = fn_ = tn = 0
+    errors: List[str] = []
+    for text, label in LABELLED:
+        got = fn(text)
+        if got and label:
+            tp += 1
+        elif got and not label:
+            fp += 1
+            errors.append(f"FP {text}")
+        elif label:
+            fn_ += 1
+            errors.append(f"FN {text}")
+        else:
+            tn += 1
+    return tp, fp, fn_, tn, errors
+
+
+def _speed(fn: Callable[[str], object], texts: List[str], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for t in texts:
+            fn(t)
+        best = min(best, (time.perf_counter_ns() - t0) / len(texts))
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--threshold", type=float, default=1.0)
+    p.add_argument("--show-errors", action="store_true")
+    args = p.parse_args()
+
+    clf = AdsClassifier()
+
+    def new(text: str) -> bool:
+        norm = normalize_text(text)
+        return clf.is_ads(norm, has_link(norm), args.threshold)
+
+    print(f"labelled corpus: {len(LABELLED)} messages, {sum(1 for _, y in LABELLED if y)} ads")
+    for name, fn in (("legacy substring", legacy_looks_like_ads), (f"AdsClassifier t={args.threshold:g}", new)):
+        tp, fp, fn_, tn, errors = _metrics(fn)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn_) if tp + fn_ else 0.0
+        print(f"  {name:24s} precision {precision:.2f} recall {recall:.2f}  (tp {tp} fp {fp} fn {fn_} tn {tn})")
+        if args.show_errors:
+            for e in errors:
+                print("     ", e)
+
+    # скорость: в guard текст уже нормализован, поэтому меряем и "голый" скоринг
+    texts = corpus.build(200)
+    print(f"{'ns/call':34s}" + "".join(f"{c:>13s}" for c in corpus.CATEGORIES))
+    norms = {c: [normalize_text(t) for t in items] for c, items in texts.items()}
+    links = {c: [has_link(n) for n in items] for c, items in norms.items()}
+    rows = {
+        "legacy_looks_like_ads(text)": {c: _speed(legacy_looks_like_ads, items) for c, items in texts.items()},
+        "normalize + is_ads(text)": {c: _speed(new, items) for c, items in texts.items()},
+        "is_ads(norm, link) only": {
+            c: _speed(lambda pair: clf.is_ads(pair[0], pair[1]), list(zip(norms[c], links[c])))
+            for c in texts
+        },
+    }
+    for name, row in rows.items():
+        print(f"{name:34s}" + "".join(f"{row[c]:13.0f}" for c in corpus.CATEGORIES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench/antiraid.py
+"""
+Anti-raid counter benchmark: simulates a 10k-join raid spread over the
+detection window and compares the old per-join deque with the bucketed ring.
+
+    python -m bench.antiraid [--joins 10000] [--window-hours 1] [--chats 50]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from collections import deque
+
+from app.utils import antiraid as antiraid_mod
+from app.utils.antiraid import AntiRaid
+
+
+class LegacyAntiRaid:
+    """Old implementation: one deque entry per joined member."""
+
+    def __init__(self):
+        self._chats: dict[int, deque] = {}
+
+    def hit(self, chat_id: int, join_count: int, window_sec: int, limit: int, now: float) -> bool:
+        joins = self._chats.setdefault(chat_id, deque())
+        for _ in range(max(1, join_count)):
+            joins.append(now)
+        cutoff = now - float(window_sec)
+        while joins and joins[0] < cutoff:
+            joins.popleft()
+        return len(joins) >= limit
+
+
+def _run_legacy(joins: int, chats: int, window_sec: int, batch: int) -> tuple[float, int]:
+    ar = LegacyAntiRaid()
+    step = window_sec / max(1, joins // batch)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    now = 0.0
+    for i in range(0, joins, batch):
+        now += step
+        for chat_id in range(chats):
+            ar.hit(chat_id, batch, window_sec, limit=10 ** 9, now=now)
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt, peak
+
+
+def _run_bucketed(joins: int, chats: int, window_sec: int, batch: int) -> tuple[float, int]:
+    # подменяем часы, чтобы прогнать всё окно за доли секунды
+    clock = [0.0]
+    real_time = antiraid_mod.time
+    antiraid_mod.time = lambda: clock[0]
+    try:
+        ar = AntiRaid()
+        step = window_sec / max(1, joins // batch)
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for i in range(0, joins, batch):
+            clock[0] += step
+            for chat_id in range(chats):
+                ar.hit(chat_id, batch, window_sec, limit=10 ** 9)
+        dt = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        antiraid_mod.time = real_time
+    return dt, peak
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--joins", type=int, default=10_000, help="joins per chat during the raid")
+    p.add_argument("--window-hours", type=int, default=1)
+    p.add_argument("--chats", type=int, default=50)
+    p.add_argument("--batch", type=int, default=1, help="members per join event")
+    args = p.parse_args()
+
+    window_sec = args.window_hours * 3600
+    calls = (args.joins // args.batch) * args.chats
+    print(f"raid: {args.joins} joins x {args.chats} chats, window {args.window_hours}h, batch {args.batch}")
+    for name, fn in (("legacy deque", _run_legacy), ("bucketed ring", _run_bucketed)):
+        dt, peak = fn(args.joins, args.chats, window_sec, args.batch)
+        print(f"  {name:14s} {dt * 1e9 / calls:9.0f} ns/hit   peak mem {peak / 1024:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench/badwords.py
+"""
+Bad-word matching: memory per chat with shared global dictionaries
+(ChatBadWords) vs every chat compiling its own copy of the same words,
+and match speed for exact / fuzzy modes. First checks that folding keeps
+numbers as numbers (leet only inside words with letters); exit 1 otherwise.
+
+    python -m bench.badwords [--dict-size 3000] [--chats 10,100,1000] [--distance 1]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import string
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+from app.utils.badwords import BadWordMatcher, ChatBadWords, normalize_for_badwords
+from app.utils.moderation import normalize_text
+from bench import corpus
+
+OWN_WORDS = 20
+
+# (слова, текст, что должно найтись): возраст/цены/даты — не мат, leet в словах — мат
+FOLD_CASES: List[Tuple[List[str], str, Optional[str]]] = [
+    (["it"], "Menga 17 yosh", None),
+    (["ot", "os"], "07.05 da keling", None),
+    (["so"], "50 ming", None),
+    (["it"], "narxi 1 700 000 so‘m, tel 90 171 17 17", None),
+    (["сука"], "cyk4", "cyka"),
+    (["hello"], "h3ll0 dunyo", "hello"),
+    (["it"], "sen 1t", "it"),
+]
+
+
+def check_fold_cases() -> List[str]:
+    bad = []
+    for words, text, want in FOLD_CASES:
+        got = BadWordMatcher(words).find(normalize_for_badwords(normalize_text(text), fold=False))
+        if got != want:
+            bad.append(f"{text!r} with {words}: got {got!r}, want {want!r}")
+    print(f"fold cases: {len(FOLD_CASES)}, {len(bad)} wrong")
+    return bad
+
+
+def _words(n: int, rnd: random.Random) -> List[str]:
+    return ["".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 9))) for _ in range(n)]
+
+
+def _measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    keep = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return size
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--dict-size", type=int, default=3000)
+    p.add_argument("--chats", default="10,100,1000")
+    p.add_argument("--distance", type=int, default=1)
+    args = p.parse_args()
+
+    bad = check_fold_cases()
+    for line in bad:
+        print("  WRONG", line)
+    if bad:
+        sys.exit(1)
+
+    rnd = random.Random(7)
+    global_words = _words(args.dict_size, rnd)
+    own = {c: _words(OWN_WORDS, rnd) for c in range(max(int(x) for x in args.chats.split(",")))}
+
+    print(f"global dictionary {args.dict_size} words, {OWN_WORDS} own words per chat, distance {args.distance}")
+    print(f"{'chats':>6s} {'shared MB':>10s} {'per-chat copy MB':>17s}")
+    for n in (int(x) for x in args.chats.split(",")):
+        def shared():
+            g = BadWordMatcher(global_words, args.distance)
+            return [ChatBadWords(BadWordMatcher(own[c], args.distance), (g,), (), ("g",)) for c in range(n)]
+
+        # копии на 1000 чатов — это гигабайты; считаем по 10 и экстраполируем
+        k = min(n, 10)
+        copy_mb = _measure(lambda: [BadWordMatcher(global_words + own[c], args.distance) for c in range(k)]) * n / k / 1e6
+        print(f"{n:6d} {_measure(shared) / 1e6:10.1f} {copy_mb:17.1f}{'' if k == n else ' (extrapolated)'}")
+
+    g = BadWordMatcher(global_words, args.distance)
+    chat = ChatBadWords(BadWordMatcher(own[0], args.distance), (g,), (), ("g",))
+    texts = [normalize_for_badwords(normalize_text(t), fold=False) for items in corpus.build(100).values() for t in items]
+    for name, cold in (("cold token cache", True), ("warm token cache", False)):
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter_ns()
+            for t in texts:
+                if cold:
+                    g.clear_cache()
+                    chat.own.clear_cache()
+                chat.find(t)
+            best = min(best, (time.perf_counter_ns() - t0) / len(texts))
+        print(f"find(), {name}: {best / 1000:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# bench/budgets.py
+"""
+Per-update budgets: SQL statements (reads / writes) and Bot API calls made
+while ONE synthetic update goes through guard_all / guard_join /
+guard_chat_member, against bench.fake_api and a throwaway sqlite DB.
+
+Each scenario warms up first (same chat, same user, same kind of update),
+so the numbers are the steady state: per-chat caches filled, 30s/5min
+touch throttles already passed. Then one update is fed with
+app.utils.metrics.count_update() around it and compared with the budget.
+
+    python -m bench.budgets [--verbose]     # exit 1 if any scenario is over budget
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from bench.fake_api import BOT_ID, FakeBotAPI
+
+TOKEN = f"{BOT_ID}:BUDGETS"
+OWNER = "budgetowner"
+ADMIN_ID = 42
+USER_ID = 10_001
+
+
+@dataclass
+class Scenario:
+    name: str
+    settings: Dict[str, Any]
+    warmup: List[Dict[str, Any]]
+    update: Dict[str, Any]
+    reads: int
+    writes: int
+    api: int
+    # методы, которые обязаны быть вызваны (иначе сценарий прошёл не тот путь)
+    expect: Tuple[str, ...] = ()
+    chat_id: int = field(default=0)
+
+
+_mid = 0
+
+
+def _msg(chat_id: int, user_id: int, **extra: Any) -> Dict[str, Any]:
+    global _mid
+    _mid += 1
+    msg = {
+        "message_id": _mid,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "supergroup", "title": f"group {chat_id}"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}", "username": f"user{user_id}"},
+    }
+    msg.update(extra)
+    return {"message": msg}
+
+
+def _member(chat_id: int, actor: int, user_id: int, old: str = "left", new: str = "member") -> Dict[str, Any]:
+    user = {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"}
+    return {"chat_member": {
+        "chat": {"id": chat_id, "type": "supergroup", "title": f"group {chat_id}"},
+        "from": {"id": actor, "is_bot": False, "first_name": f"u{actor}"},
+        "date": int(time.time()),
+        "old_chat_member": {"status": old, "user": user},
+        "new_chat_member": {"status": new, "user": user},
+    }}
+
+
+def _join(chat_id: int, user_id: int) -> Dict[str, Any]:
+    return _msg(chat_id, user_id, new_chat_members=[{"id": user_id, "is_bot": False, "first_name": f"u{user_id}"}])
+
+
+def scenarios() -> List[Scenario]:
+    from app.utils.scripts import SCRIPT_BITS
+
+    out: List[Scenario] = []
+
+    def add(name: str, settings: Dict[str, Any], make, reads: int, writes: int, api: int,
+            expect: Tuple[str, ...] = ()) -> None:
+        chat_id = -1002_000_000_000 - len(out)
+        warmup, update = make(chat_id)
+        out.append(Scenario(name, settings, warmup, update, reads, writes, api, expect, chat_id))
+
+    filters = {"block_links": True, "block_ads": True}
+    everything = {**filters, "antisame_enabled": True, "antiflood_enabled": True, "block_swear": True,
+                  "blocked_scripts": SCRIPT_BITS["arabic"], "swear_fuzzy": 1}
+
+    add("clean text, links+ads on", filters,
+        lambda c: ([_msg(c, USER_ID, text="salom")], _msg(c, USER_ID, text="bugun uchrashamiz")),
+        reads=1, writes=0, api=0)
+    add("clean text, all filters on", everything,
+        lambda c: ([_msg(c, USER_ID, text="salom")], _msg(c, USER_ID, text="ertaga uchrashamiz")),
+        reads=2, writes=1, api=0)  # anti-same: прочитать и записать хеш
+    add("group admin text, links+ads on", filters,
+        lambda c: ([_msg(c, ADMIN_ID, text="salom")], _msg(c, ADMIN_ID, text="bugun uchrashamiz")),
+        reads=1, writes=0, api=0)
+    add("link deleted + warning", filters,
+        lambda c: ([_msg(c, USER_ID, text="salom")], _msg(c, USER_ID, text="kanal https://spam.example.com")),
+        # _handle_violation: настройки ещё раз + can_manage_chat (2 чтения + getChatMember) + страйк
+        reads=5, writes=1, api=3, expect=("deleteMessage", "sendMessage"))
+    add("join service message, raid off", {},
+        lambda c: ([_join(c, USER_ID)], _join(c, USER_ID + 1)),
+        reads=1, writes=0, api=0)
+    add("chat_member join, force add off", {},
+        lambda c: ([_member(c, USER_ID, USER_ID)], _member(c, USER_ID + 1, USER_ID + 1)),
+        reads=1, writes=0, api=0)
+    add("chat_member invite, force add on", {"force_add_enabled": True},
+        lambda c: ([_member(c, USER_ID, USER_ID + 1)], _member(c, USER_ID, USER_ID + 2)),
+        reads=1, writes=1, api=0)
+    return out
+
+
+async def _settle() -> None:
+    # фоновые задачи хендлеров (отложенное удаление и т.п.) сюда не относятся
+    me = asyncio.current_task()
+    rest = [t for t in asyncio.all_tasks() if t is not me]
+    for t in rest:
+        t.cancel()
+    await asyncio.gather(*rest, return_exceptions=True)
+
+
+async def run(verbose: bool) -> bool:
+    api = FakeBotAPI(admins={ADMIN_ID})
+    await api.start()
+    tmp = tempfile.mkdtemp(prefix="budgets-")
+    os.environ.update({
+        "BOT_TOKEN": TOKEN,
+        "OWNER_USERNAME": OWNER,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(tmp, 'bot.db')}",
+        "BOT_API_URL": api.url,
+        "UPDATE_WORKERS": "0",
+        "SHARDS": "1",
+    })
+
+    from aiogram.types import Update
+    from app.config import load_config
+    from app.db import DB
+    from app.main import build_dispatcher
+    from app.utils.http import build_bot
+    from app.utils.metrics import count_update, install_api_counter, install_db_counter
+
+    cfg = load_config()
+    db = DB(cfg.database_url)
+    await db.init_models()
+    plan = scenarios()
+    for sc in plan:
+        await db.touch_chat(sc.chat_id, f"group {sc.chat_id}")
+        await db.get_or_create_settings(sc.chat_id)
+        if sc.settings:
+            await db.update_settings(sc.chat_id, **sc.settings)
+
+    bot = build_bot(cfg)
+    dp = await build_dispatcher(cfg, db, bot, metrics_port=0)
+    install_db_counter(db.engine)
+    install_api_counter(bot)
+
+    update_id = 0
+
+    async def feed(raw: Dict[str, Any]):
+        nonlocal update_id
+        update_id += 1
+        upd = Update.model_validate({**raw, "update_id": update_id}, context={"bot": bot})
+        await dp.feed_update(bot, upd)
+
+    ok = True
+    print(f"{'scenario':36s} {'reads':>9s} {'writes':>9s} {'api':>9s}")
+    try:
+        for sc in plan:
+            for raw in sc.warmup:
+                await feed(raw)
+            with count_update() as c:
+                await feed(sc.update)
+            missing = [m for m in sc.expect if m not in c.api_methods]
+            over = c.db_reads > sc.reads or c.db_writes > sc.writes or c.api_calls > sc.api
+            status = "OVER BUDGET" if over else ("WRONG PATH" if missing else "ok")
+            ok = ok and status == "ok"
+            print(f"{sc.name:36s} {c.db_reads:4d}/{sc.reads:<4d} {c.db_writes:4d}/{sc.writes:<4d} "
+                  f"{c.api_calls:4d}/{sc.api:<4d} {status}"
+                  + (f" (missing {', '.join(missing)})" if missing else ""))
+            if verbose and c.api_methods:
+                print(f"{'':36s} api: {', '.join(c.api_methods)}")
+    finally:
+        await _settle()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        await db.engine.dispose()
+        await api.stop()
+    return ok
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--verbose", action="store_true", help="list Bot API methods per scenario")
+    args = p.parse_args()
+    ok = asyncio.run(run(args.verbose))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
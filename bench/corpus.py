@@ -0,0 +1,101 @@
+# bench/corpus.py
+"""
+Deterministic multilingual message corpus for moderation benchmarks:
+Uzbek (Latin and Cyrillic), Russian, Arabic, emoji-heavy, link-heavy and
+4096-character (Telegram max) messages.
+"""
+from __future__ import annotations
+
+import random
+from typing import Dict, List
+
+UZ_LATIN = (
+    "salom assalomu alaykum qalaysiz yaxshimisiz bugun ertaga kecha uchrashamiz "
+    "rahmat katta raxmat do‘stlar guruh yangilik o‘qish maktab universitet ish "
+    "narx qancha bor yo‘q kerak mumkin albatta hozir keyin telefon manzil bozor "
+    "g‘alaba o‘zbekiston toshkent samarqand buxoro farg‘ona ota ona aka uka"
+).split()
+
+UZ_CYRILLIC = (
+    "салом ассалому алайкум қалайсиз яхшимисиз бугун эртага кеча учрашамиз "
+    "раҳмат катта дўстлар гуруҳ янгилик ўқиш мактаб университет иш нарх қанча "
+    "бор йўқ керак мумкин албатта ҳозир кейин телефон манзил бозор ўзбекистон"
+).split()
+
+RUSSIAN = (
+    "привет здравствуйте как дела сегодня завтра вчера встретимся спасибо "
+    "друзья группа новости учеба школа университет работа цена сколько есть "
+    "нужно можно конечно сейчас потом телефон адрес рынок хорошо отлично"
+).split()
+
+ARABIC = (
+    "السلام عليكم كيف حالك اليوم غدا شكرا جزيلا أصدقاء مجموعة أخبار مدرسة "
+    "جامعة عمل سعر كم يوجد ممكن بالتأكيد الآن بعد هاتف عنوان سوق"
+).split()
+
+EMOJI = list("😀😂🤣😍🥰😎🤔👍👏🙏🔥💯🎉❤️✅⚡️🚀🌟😢😡🤝💪🎁📢📌")
+
+LINKS = [
+    "https://example.com/path?q=1",
+    "http://shop.uz/katalog",
+    "www.kurs-online.org",
+    "t.me/joinchat/AbCdEf123",
+    "telegram.me/somechannel",
+    "telegra.ph/Post-01-01",
+    "@reklama_kanal",
+    "sayt.uz",
+    "bit.ly/3xYz",
+    "my-site.co.uk/page",
+]
+
+ADS_WORDS = ["reklama", "реклама", "obuna", "подпишись", "kanal", "daromad", "pul", "доход", "работа", "admin"]
+
+CATEGORIES = ("uz_latin", "uz_cyrillic", "russian", "arabic", "emoji", "links", "long_4096")
+
+
+def _sentence(rnd: random.Random, words: List[str], n: int) -> str:
+    return " ".join(rnd.choice(words) for _ in range(n))
+
+
+def _message(rnd: random.Random, category: str) -> str:
+    if category == "uz_latin":
+        return _sentence(rnd, UZ_LATIN, rnd.randint(3, 30))
+    if category == "uz_cyrillic":
+        return _sentence(rnd, UZ_CYRILLIC, rnd.randint(3, 30))
+    if category == "russian":
+        return _sentence(rnd, RUSSIAN, rnd.randint(3, 30))
+    if category == "arabic":
+        return _sentence(rnd, ARABIC, rnd.randint(3, 20))
+    if category == "emoji":
+        parts = []
+        for _ in range(rnd.randint(3, 20)):
+            parts.append(rnd.choice(UZ_LATIN + RUSSIAN))
+            parts.append("".join(rnd.choice(EMOJI) for _ in range(rnd.randint(1, 6))))
+        return " ".join(parts)
+    if category == "links":
+        parts = []
+        for _ in range(rnd.randint(3, 15)):
+            r = rnd.random()
+            if r < 0.3:
+                parts.append(rnd.choice(LINKS))
+            elif r < 0.45:
+                parts.append(rnd.choice(ADS_WORDS))
+            else:
+                parts.append(rnd.choice(UZ_LATIN))
+        return " ".join(parts)
+    if category == "long_4096":
+        pools = [UZ_LATIN, UZ_CYRILLIC, RUSSIAN, ARABIC]
+        out: List[str] = []
+        size = 0
+        while size < 4096:
+            w = rnd.choice(rnd.choice(pools)) if rnd.random() < 0.9 else rnd.choice(EMOJI + LINKS)
+            out.append(w)
+            size += len(w) + 1
+        return " ".join(out)[:4096]
+    raise ValueError(category)
+
+
+def build(per_category: int = 200, seed: int = 42) -> Dict[str, List[str]]:
+    rnd = random.Random(seed)
+    return {c: [_message(rnd, c) for _ in range(per_category if c != "long_4096" else max(1, per_category // 10))]
+            for c in CATEGORIES}
@@ -0,0 +1,237 @@
+# bench/fake_api.py
+"""
+Local stand-in for the Telegram Bot API (enough of it for this bot):
+getMe, getUpdates (long polling), sendMessage/sendPhoto/sendDocument, editMessageText,
+deleteMessage(s), restrictChatMember, banChatMember, unbanChatMember,
+getChatMember, getChat, setChatPermissions, answerCallbackQuery,
+set/deleteWebhook. Unknown methods answer ok=true, result=true.
+
+Knobs: per-call latency, 429 injection rate. Every call is counted per method.
+
+    python -m bench.fake_api [--port 8081] [--latency-ms 5] [--rate-429 0.01]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Set
+
+from aiohttp import web
+
+BOT_ID = 123456
+BOT_USERNAME = "fake_guard_bot"
+
+# методы, которые не считаются "работой" бота
+SERVICE_METHODS = frozenset({"getMe", "getUpdates", "deleteWebhook", "setWebhook"})
+
+_ALL_PERMS = {
+    "can_send_messages": True,
+    "can_send_audios": True,
+    "can_send_documents": True,
+    "can_send_photos": True,
+    "can_send_videos": True,
+    "can_send_video_notes": True,
+    "can_send_voice_notes": True,
+    "can_send_polls": True,
+    "can_send_other_messages": True,
+    "can_add_web_page_previews": True,
+    "can_invite_users": True,
+}
+
+
+def _user(user_id: int, username: str = "") -> Dict[str, Any]:
+    u: Dict[str, Any] = {"id": user_id, "is_bot": user_id == BOT_ID, "first_name": f"u{user_id}"}
+    if username:
+        u["username"] = username
+    return u
+
+
+def _admin_member(user_id: int) -> Dict[str, Any]:
+    return {
+        "status": "administrator",
+        "user": _user(user_id, BOT_USERNAME if user_id == BOT_ID else ""),
+        "can_be_edited": False,
+        "is_anonymous": False,
+        "can_manage_chat": True,
+        "can_delete_messages": True,
+        "can_manage_video_chats": True,
+        "can_restrict_members": True,
+        "can_promote_members": False,
+        "can_change_info": True,
+        "can_invite_users": True,
+        "can_post_stories": False,
+        "can_edit_stories": False,
+        "can_delete_stories": False,
+    }
+
+
+class FakeBotAPI:
+    def __init__(self, latency_ms: float = 0.0, rate_429: float = 0.0, retry_after: int = 1,
+                 admins: Set[int] | None = None, seed: int = 1):
+        self.latency = latency_ms / 1000.0
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.admins: Set[int] = set(admins or ())
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self._rnd = random.Random(seed)
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._next_message_id = 1_000_000
+        self._new_updates = asyncio.Event()
+        self._perms: Dict[int, Dict[str, Any]] = {}
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    # ---------- updates ----------
+
+    def push(self, update: Dict[str, Any]) -> int:
+        """
+        Queue an update for getUpdates. Returns its update_id.
+        """
+        update = dict(update)
+        update["update_id"] = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    @property
+    def pending(self) -> int:
+        return len(self._updates)
+
+    async def _get_updates(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(p.get("offset") or 0)
+        limit = int(p.get("limit") or 100)
+        timeout = float(p.get("timeout") or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    # ---------- methods ----------
+
+    def _message(self, chat_id: int, text: str = "", **extra: Any) -> Dict[str, Any]:
+        self._next_message_id += 1
+        msg = {
+            "message_id": self._next_message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": _user(BOT_ID, BOT_USERNAME),
+        }
+        if text:
+            msg["text"] = text
+        msg.update(extra)
+        return msg
+
+    async def _call(self, method: str, p: Dict[str, Any]) -> Any:
+        if method == "getUpdates":
+            return await self._get_updates(p)
+        if method == "getMe":
+            return {**_user(BOT_ID, BOT_USERNAME), "can_join_groups": True,
+                    "can_read_all_group_messages": True, "supports_inline_queries": False}
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(int(p.get("chat_id") or 0), p.get("text", ""))
+        if method == "sendPhoto":
+            return self._message(int(p.get("chat_id") or 0), caption=p.get("caption", ""),
+                                 photo=[{"file_id": "p", "file_unique_id": "p", "width": 1, "height": 1}])
+        if method == "sendDocument":
+            return self._message(int(p.get("chat_id") or 0), caption=p.get("caption", ""),
+                                 document={"file_id": "d", "file_unique_id": "d"})
+        if method == "getChatMember":
+            user_id = int(p.get("user_id") or 0)
+            if user_id == BOT_ID or user_id in self.admins:
+                return _admin_member(user_id)
+            return {"status": "member", "user": _user(user_id)}
+        if method == "getChat":
+            chat_id = p.get("chat_id")
+            cid = int(chat_id) if str(chat_id).lstrip("-").isdigit() else -1
+            return {
+                "id": cid,
+                "type": "channel" if str(chat_id).startswith("@") else "supergroup",
+                "title": f"chat {chat_id}",
+                "accent_color_id": 0,
+                "max_reaction_count": 0,
+                "accepted_gift_types": {"unlimited_gifts": False, "limited_gifts": False,
+                                        "unique_gifts": False, "premium_subscription": False},
+                "permissions": self._perms.get(cid, _ALL_PERMS),
+            }
+        if method == "setChatPermissions":
+            raw = p.get("permissions") or "{}"
+            self._perms[int(p.get("chat_id") or 0)] = json.loads(raw) if isinstance(raw, str) else raw
+            return True
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        p: Dict[str, Any] = dict(await request.post())
+        if method not in SERVICE_METHODS:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.rate_429 and self._rnd.random() < self.rate_429:
+                self.throttled += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                })
+        return web.json_response({"ok": True, "result": await self._call(method, p)})
+
+    # ---------- lifecycle ----------
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def work_calls(self) -> int:
+        return sum(n for m, n in self.calls.items() if m not in SERVICE_METHODS)
+
+
+async def _serve(port: int, latency_ms: float, rate_429: float) -> None:
+    api = FakeBotAPI(latency_ms=latency_ms, rate_429=rate_429)
+    await api.start(port=port)
+    print(f"fake Bot API on {api.url}  (BOT_API_URL={api.url})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"calls: {dict(api.calls)} throttled={api.throttled}")
+    finally:
+        await api.stop()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=8081)
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--rate-429", type=float, default=0.0)
+    args = p.parse_args()
+    asyncio.run(_serve(args.port, args.latency_ms, args.rate_429))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench/http_session.py
+"""
+Bot API session throughput against a local stub server (no Telegram needed).
+Runs sendMessage through app.utils.http.build_session with several
+connector / codec settings and reports requests per second.
+
+    python -m bench.http_session [--requests 3000] [--concurrency 50] [--latency-ms 0]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import time
+
+from aiohttp import web
+from aiogram import Bot
+
+from app.config import Config
+from app.utils.http import build_session
+
+TOKEN = "123456:bench"
+
+
+async def _stub(latency_ms: int):
+    async def handle(request: web.Request) -> web.Response:
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        data = await request.post()
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", 1)), "type": "supergroup"},
+                "text": data.get("text", ""),
+            },
+        })
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+async def _measure(cfg: Config, requests: int, concurrency: int) -> float:
+    bot = Bot(TOKEN, session=build_session(cfg))
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with sem:
+            await bot.send_message(-100 - i % 50, f"bench {i}")
+
+    try:
+        await one(0)  # прогрев соединения
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return requests / (time.perf_counter() - t0)
+    finally:
+        await bot.session.close()
+
+
+def _configs(base: Config):
+    yield "default (limit 100, keep-alive 15s)", base
+    yield "limit 10", dataclasses.replace(base, http_limit=10)
+    yield "limit 0 (unbounded)", dataclasses.replace(base, http_limit=0)
+    yield "no keep-alive", dataclasses.replace(base, http_keepalive_sec=0)
+    yield "no dns cache", dataclasses.replace(base, http_dns_ttl_sec=0)
+    for codec in ("orjson", "ujson"):
+        try:
+            __import__(codec)
+        except ImportError:
+            print(f"  (skip {codec}: not installed)")
+            continue
+        yield f"json codec {codec}", dataclasses.replace(base, json_codec=codec)
+
+
+async def run(requests: int, concurrency: int, latency_ms: int) -> None:
+    runner, port = await _stub(latency_ms)
+    base = Config(
+        bot_token=TOKEN,
+        database_url="",
+        video_url="",
+        owner_username="bench",
+        bot_api_url=f"http://127.0.0.1:{port}",
+    )
+    print(f"sendMessage x{requests}, concurrency {concurrency}, stub latency {latency_ms} ms")
+    try:
+        for name, cfg in _configs(base):
+            rps = await _measure(cfg, requests, concurrency)
+            print(f"  {name:38s} {rps:8.0f} req/s")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=3000)
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--latency-ms", type=int, default=0)
+    args = p.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench/links.py
+"""
+Link detector: equivalence and worst-case timing.
+
+1. Regression: has_link (linear scanner) must agree with URL_RE.search, and
+   find_links with the URL_RE.finditer matches, on the bench corpus, on hand-picked edge cases and on random fuzz strings built
+   from the characters that matter to the pattern (dots, dashes, @, case-folding
+   oddities like ſ/K/İ/ı, non-ASCII letters, whitespace).
+2. Adversarial: long dot/dash label chains where URL_RE backtracks
+   quadratically; prints time per message for both and the growth factor when
+   the input grows (time ratio / size ratio between the last two sizes:
+   ≈1 means linear, ≈2 per doubling means quadratic).
+
+    python -m bench.links [--fuzz 200000] [--sizes 1024,2048,4096]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from app.utils.moderation import URL_RE, find_links, has_link
+from bench import corpus
+
+EDGE_CASES = [
+    "", "a.b", "a.bc", "a.bc-", "a.bc_", "a.bc/", "a.bc.", "-a.bc", "_a.bc", "@a.bc", "x@a.bc", "é.bc", "éa.bc",
+    "a-.bc", "-.bc", "a--b.bc", "a.b1", "a." + "b" * 24, "a." + "b" * 25, "b" * 63 + ".uz", "b" * 64 + ".uz",
+    "x-" + "b" * 63 + ".uz", "_" + "b" * 63 + ".uz", "@abc", "@abcd", "@abc d", "@_a_b", "@яяяя",
+    "http://", "http:// x", "https://x", "HTTPS://X", "httpſ://x", "WWW.", "www.x", "T.ME/x", "t.me/ ",
+    "telegra.ph/x", "telegram.me/x", "set.me/x", "SAYT.UZ", "sayt.UZ/", "ſayt.uz", "ıa.uz", "İa.uz",
+    "a.uK", "K.uz", "a.İz", "1.2.3.4", "ver 2.0.1", "...uz", "a..uz", "a.uz x", "a.uz ",
+    "tel: 90 123 45 67", "narx 1.500.000 so'm", "gap.uz-da", "gap.uz’da", "o'zbekiston.uz",
+]
+
+FUZZ_ALPHABET = "aaabbzZ09-._/@ :wwhtpsmeſKİıéя \n"
+
+
+def _fuzz(rnd: random.Random, n: int) -> str:
+    return "".join(rnd.choice(FUZZ_ALPHABET) for _ in range(n))
+
+
+def check_equivalence(fuzz: int, seed: int = 7) -> List[str]:
+    texts: List[str] = list(EDGE_CASES)
+    for items in corpus.build(200).values():
+        texts.extend(items)
+    texts.extend(corpus.LINKS)
+    rnd = random.Random(seed)
+    texts.extend(_fuzz(rnd, rnd.randint(1, 24)) for _ in range(fuzz))
+
+    mismatches = []
+    for t in texts:
+        want = bool(URL_RE.search(t))
+        if has_link(t) != want:
+            mismatches.append(f"{t!r}: URL_RE={want}")
+        spans = [m.group(0) for m in URL_RE.finditer(t)]
+        if find_links(t) != spans:
+            mismatches.append(f"{t!r}: finditer={spans} find_links={find_links(t)}")
+    print(f"equivalence: {len(texts)} texts ({fuzz} fuzz), {len(mismatches)} mismatches")
+    return mismatches
+
+
+ADVERSARIAL: Dict[str, Callable[[int], str]] = {
+    "a.a.a... + '_'": lambda n: "a." * (n // 2) + "_",
+    "a.a.a...a + '1'": lambda n: ("a." * (n // 2))[:-1] + "1",
+    "63-char labels + '9'": lambda n: ("b" * 62 + ".") * (n // 63) + "9",
+    "ab-ab-ab... + 'x_'": lambda n: "ab-" * (n // 3) + "x_",
+    "dots only": lambda n: "." * n,
+    "@abc @abc ...": lambda n: "@abc " * (n // 5),
+    "'http:// ' repeated": lambda n: "http:// " * (n // 8),
+    "url + a.a.a... + '_'": lambda n: "https://x.com " + "a." * (n // 2) + "_",
+    "@abcd@abcd...": lambda n: "@abcd" * (n // 5),
+}
+
+
+def _finditer(text: str) -> list:
+    return [m.group(0) for m in URL_RE.finditer(text)]
+
+
+def _time(fn: Callable[[str], object], text: str, budget: float = 0.2) -> float:
+    best = float("inf")
+    spent = 0.0
+    runs = 0
+    while runs < 3 or (spent < budget and runs < 50):
+        t0 = time.perf_counter()
+        fn(text)
+        dt = time.perf_counter() - t0
+        best = min(best, dt)
+        spent += dt
+        runs += 1
+    return best
+
+
+def run_adversarial(sizes: List[int]) -> None:
+    head = "".join(f"{n:>20d}" for n in sizes)
+    print(f"{'ms per message':28s}{head}   growth")
+    for name, make in ADVERSARIAL.items():
+        for label, fn in (("URL_RE", URL_RE.search), ("has_link", has_link),
+                          ("finditer", _finditer), ("find_links", find_links)):
+            times = [_time(fn, make(n)) for n in sizes]
+            growth = ""
+            if len(times) > 1 and times[-2] > 0:
+                growth = f"{times[-1] / times[-2] * sizes[-2] / sizes[-1]:.1f}"
+            cells = "".join(f"{t * 1000:20.3f}" for t in times)
+            print(f"{name[:18]:18s} {label:9s}{cells}   {growth}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--fuzz", type=int, default=200_000)
+    p.add_argument("--sizes", default="1024,2048,4096")
+    args = p.parse_args()
+
+    bad = check_equivalence(args.fuzz)
+    for line in bad[:20]:
+        print("  MISMATCH", line)
+    run_adversarial([int(x) for x in args.sizes.split(",")])
+    if bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+# bench/loadtest.py
+"""
+End-to-end load test: runs app.main against bench.fake_api (no Telegram)
+and replays synthetic group traffic through long polling.
+
+Scenarios:
+  spam       link / ads / repeated messages from many users (links+ads+antisame+antiflood on)
+  albums     media groups with a link in the caption (album delete path, 0.8s grouping sleep)
+  raid       a burst of joins (service messages + chat_member) past raid_limit, raid_action=ban
+  broadcast  owner /ad flow sending one message to every known group
+  clean      ordinary chatter (baseline)
+
+Reports updates/s, p50/p99 handler time (aiogram's per-update duration),
+p50/p99 end-to-end time (push -> handled) and Bot API calls per update.
+
+    python -m bench.loadtest [--scenario all] [--groups 20] [--users 200] [--messages 2000]
+                             [--latency-ms 5] [--rate-429 0] [--update-workers 0]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from bench.fake_api import BOT_ID, FakeBotAPI
+
+OWNER = "loadowner"
+OWNER_ID = 777
+TOKEN = f"{BOT_ID}:LOADTEST"
+
+# UpdatePool, созданные app.main (с пулом aiogram считает апдейт готовым уже при постановке в очередь)
+_POOLS: list = []
+
+
+class _Handled(logging.Handler):
+    """
+    Collects aiogram.event "Update id=%s is %s. Duration %d ms" records.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.done: Dict[int, tuple[float, float]] = {}  # update_id -> (finished_at, duration_ms)
+        self.changed = asyncio.Event()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not record.msg.startswith("Update id="):
+            return
+        update_id, _status, duration, *_ = record.args
+        self.done[int(update_id)] = (time.perf_counter(), float(duration))
+        self.changed.set()
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Traffic:
+    def __init__(self, groups: int, users: int, seed: int = 7):
+        self.groups = [-1001_000_000_000 - i for i in range(groups)]
+        self.users = list(range(10_000, 10_000 + users))
+        self.rnd = random.Random(seed)
+        self._mid = 0
+        self._album = 0
+
+    def _msg(self, chat_id: int, user_id: int, **extra: Any) -> Dict[str, Any]:
+        self._mid += 1
+        msg = {
+            "message_id": self._mid,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"group {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}", "username": f"user{user_id}"},
+        }
+        msg.update(extra)
+        return {"message": msg}
+
+    def clean(self, n: int):
+        words = ["salom", "qalesiz", "bugun", "ertaga", "uchrashamiz", "rahmat", "привет", "как дела", "😀"]
+        for _ in range(n):
+            text = " ".join(self.rnd.choice(words) for _ in range(self.rnd.randint(2, 12)))
+            yield self._msg(self.rnd.choice(self.groups), self.rnd.choice(self.users), text=text)
+
+    def spam(self, n: int):
+        bodies = [
+            "Arzon narxda kurs! https://spam.example.com/kurs",
+            "Kanalga obuna bo‘ling t.me/spamchannel",
+            "reklama: zakaz uchun lichkaga yozing @spamseller",
+            "SKIDKA 50% chegirma, sotiladi, admin bilan bog‘laning",
+        ]
+        spammers = self.users[: max(1, len(self.users) // 10)]
+        for _ in range(n):
+            yield self._msg(self.rnd.choice(self.groups), self.rnd.choice(spammers), text=self.rnd.choice(bodies))
+
+    def albums(self, n: int, size: int = 5):
+        for _ in range(max(1, n // size)):
+            self._album += 1
+            chat_id = self.rnd.choice(self.groups)
+            user_id = self.rnd.choice(self.users)
+            for i in range(size):
+                extra: Dict[str, Any] = {
+                    "media_group_id": str(9_000 + self._album),
+                    "photo": [{"file_id": f"ph{self._album}_{i}", "file_unique_id": f"u{self._album}_{i}",
+                               "width": 640, "height": 480}],
+                }
+                if i == 0:
+                    extra["caption"] = "Yangi kolleksiya https://shop.example.com"
+                yield self._msg(chat_id, user_id, **extra)
+
+    def raid(self, n: int):
+        chat_id = self.groups[0]
+        for i in range(n):
+            uid = 500_000 + i
+            member = {"id": uid, "is_bot": False, "first_name": f"bot{uid}"}
+            if i % 2:
+                yield self._msg(chat_id, uid, new_chat_members=[member])
+            else:
+                yield {"chat_member": {
+                    "chat": {"id": chat_id, "type": "supergroup", "title": "raided"},
+                    "from": member,
+                    "date": int(time.time()),
+                    "old_chat_member": {"status": "left", "user": member},
+                    "new_chat_member": {"status": "member", "user": member},
+                }}
+
+    def owner_private(self, **extra: Any) -> Dict[str, Any]:
+        self._mid += 1
+        msg = {
+            "message_id": self._mid,
+            "date": int(time.time()),
+            "chat": {"id": OWNER_ID, "type": "private", "first_name": OWNER},
+            "from": {"id": OWNER_ID, "is_bot": False, "first_name": OWNER, "username": OWNER},
+        }
+        msg.update(extra)
+        return {"message": msg}
+
+    def owner_callback(self, data: str) -> Dict[str, Any]:
+        return {"callback_query": {
+            "id": f"cb{self._mid}",
+            "from": {"id": OWNER_ID, "is_bot": False, "first_name": OWNER, "username": OWNER},
+            "chat_instance": "ci",
+            "data": data,
+            "message": self.owner_private(text="menu")["message"],
+        }}
+
+    def broadcast_steps(self) -> List[Dict[str, Any]]:
+        return [
+            self.owner_private(text="/ad"),
+            self.owner_callback("ad:menu:new"),
+            self.owner_private(text="Yangilik: bot yangilandi!"),
+            self.owner_private(text="/skip"),
+            self.owner_private(text="/done"),
+            self.owner_callback("ad:target:groups"),
+            self.owner_callback("ad:send"),
+        ]
+
+
+async def _wait(handled: _Handled, ids: List[int], timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    want = set(ids)
+    while not want.issubset(handled.done.keys()):
+        left = deadline - time.perf_counter()
+        if left <= 0:
+            return False
+        handled.changed.clear()
+        try:
+            await asyncio.wait_for(handled.changed.wait(), timeout=min(left, 1.0))
+        except asyncio.TimeoutError:
+            pass
+    return True
+
+
+async def _drain(timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if not any(lane["in_flight"] for pool in _POOLS for lane in pool.stats().values()):
+            return
+        await asyncio.sleep(0.02)
+
+
+def _track_pools() -> None:
+    from app.utils import update_pool as update_pool_mod
+    orig = update_pool_mod.UpdatePool.start
+
+    def start(self):
+        _POOLS.append(self)
+        orig(self)
+
+    update_pool_mod.UpdatePool.start = start
+
+
+async def _prepare_db(database_url: str, groups: List[int]) -> None:
+    from app.db import DB
+    db = DB(database_url)
+    await db.init_models()
+    for chat_id in groups:
+        await db.touch_chat(chat_id, f"group {chat_id}")
+        await db.get_or_create_settings(chat_id)
+        await db.update_settings(
+            chat_id,
+            block_links=True,
+            block_ads=True,
+            antisame_enabled=True,
+            antiflood_enabled=True,
+            raid_limit=50,
+            raid_action="ban",
+        )
+
+
+async def _run_scenario(name: str, api: FakeBotAPI, handled: _Handled, traffic: Traffic,
+                        messages: int, timeout: float) -> None:
+    calls_before = api.work_calls()
+    pushed: Dict[int, float] = {}
+    t0 = time.perf_counter()
+
+    if name == "broadcast":
+        # FSM-шаги строго по очереди
+        for upd in traffic.broadcast_steps():
+            uid = api.push(upd)
+            pushed[uid] = time.perf_counter()
+            await _wait(handled, [uid], timeout)
+    else:
+        gen = {"clean": traffic.clean, "spam": traffic.spam, "albums": traffic.albums, "raid": traffic.raid}[name]
+        for upd in gen(messages):
+            pushed[api.push(upd)] = time.perf_counter()
+
+    ok = await _wait(handled, list(pushed), timeout)
+    await _drain(timeout)
+    elapsed = time.perf_counter() - t0
+    ids = [u for u in pushed if u in handled.done]
+    durations = [handled.done[u][1] for u in ids]
+    e2e = [(handled.done[u][0] - pushed[u]) * 1000 for u in ids]
+    calls = api.work_calls() - calls_before
+
+    print(
+        f"{name:10s} {len(ids):6d}/{len(pushed):<6d} "
+        f"{len(ids) / elapsed:8.0f} upd/s  "
+        f"handler p50 {_pct(durations, .5):6.0f} p99 {_pct(durations, .99):6.0f} ms  "
+        f"e2e p50 {_pct(e2e, .5):6.0f} p99 {_pct(e2e, .99):6.0f} ms  "
+        f"api/upd {calls / max(1, len(ids)):5.2f}"
+        + ("" if ok else "  (TIMEOUT)")
+    )
+
+
+async def run(args) -> None:
+    scenarios = ["clean", "spam", "albums", "raid", "broadcast"] if args.scenario == "all" else [args.scenario]
+
+    api = FakeBotAPI(latency_ms=args.latency_ms, rate_429=args.rate_429)
+    await api.start()
+
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bot.db')}"
+    os.environ.update({
+        "BOT_TOKEN": TOKEN,
+        "OWNER_USERNAME": OWNER,
+        "DATABASE_URL": database_url,
+        "BOT_API_URL": api.url,
+        "UPDATE_WORKERS": str(args.update_workers),
+        "RUN_MODE": "polling",
+        "SHARDS": "1",
+    })
+
+    traffic = Traffic(args.groups, args.users)
+    await _prepare_db(database_url, traffic.groups)
+
+    handled = _Handled()
+    ev = logging.getLogger("aiogram.event")
+    ev.setLevel(logging.INFO)
+    ev.addHandler(handled)
+    ev.propagate = False
+
+    _track_pools()
+    from app.main import main as bot_main
+    bot_task = asyncio.create_task(bot_main())
+    # дождёмся первого getUpdates
+    while api.calls["getUpdates"] == 0 and not bot_task.done():
+        await asyncio.sleep(0.05)
+
+    print(f"fake api latency {args.latency_ms} ms, 429 rate {args.rate_429}, "
+          f"groups {args.groups}, users {args.users}, update workers {args.update_workers}")
+    if args.update_workers:
+        print("(update pool on: handler/e2e = time to enqueue; upd/s includes draining, see lane waits below)")
+    try:
+        for name in scenarios:
+            await _run_scenario(name, api, handled, traffic, args.messages, args.timeout)
+        for pool in _POOLS:
+            for lane, st in pool.stats().items():
+                print(f"  lane {lane:10s} processed {st['processed']:6d}  "
+                      f"queue wait p50 {st['wait_p50'] * 1000:6.0f} p99 {st['wait_p99'] * 1000:6.0f} "
+                      f"max {st['wait_max'] * 1000:6.0f} ms")
+    finally:
+        # polling живёт в своих задачах — гасим всё, кроме себя
+        me = asyncio.current_task()
+        rest = [t for t in asyncio.all_tasks() if t is not me]
+        for t in rest:
+            t.cancel()
+        await asyncio.gather(*rest, return_exceptions=True)
+        await api.stop()
+
+    top = ", ".join(f"{m}={n}" for m, n in api.calls.most_common(8))
+    print(f"api calls: {top}; throttled {api.throttled}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--scenario", default="all", choices=["all", "clean", "spam", "albums", "raid", "broadcast"])
+    p.add_argument("--groups", type=int, default=20)
+    p.add_argument("--users", type=int, default=200)
+    p.add_argument("--messages", type=int, default=2000, help="updates per scenario")
+    p.add_argument("--latency-ms", type=float, default=5.0)
+    p.add_argument("--rate-429", type=float, default=0.0)
+    p.add_argument("--update-workers", type=int, default=0)
+    p.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(p.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
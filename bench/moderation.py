@@ -0,0 +1,207 @@
+# bench/moderation.py
+"""
+Microbenchmarks for the per-message moderation primitives
+(app/utils/moderation.py and the swear block of app/handlers/guard.py)
+over the multilingual corpus in bench/corpus.py.
+
+Reports ns per call for every primitive x corpus category. Results are
+normalised by a pure-Python calibration loop (measured around every repeat),
+so baselines recorded on one machine stay comparable on another and speed
+drift on a shared VM does not read as a regression.
+
+    python -m bench.moderation                 # print table
+    python -m bench.moderation --save          # write bench/baselines/moderation.json
+    python -m bench.moderation --check [--tolerance 0.25] [--rounds 3]   # exit 1 on regression
+    python -m bench.moderation --only normalize --baseline bench/baselines/moderation_prefold.json
+
+moderation_prefold.json is the baseline from before text folding (user-043),
+kept as is to show what folding costs; it has no fold_text row.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+from app.utils.badwords import BadWordMatcher, normalize_for_badwords
+from app.utils.textfold import fold_text
+from app.utils.moderation import ARABIC_RE, URL_RE, has_link, looks_like_ads, normalize_text, text_hash
+from app.utils.scripts import SCRIPT_BITS, SCRIPTS, blocked_scripts_hit, profile
+from bench import corpus
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "moderation.json")
+
+BAD_WORDS = [f"yomon{i}" for i in range(190)] + ["сука", "блять", "jalab", "qotoq", "haromi", "axmoq",
+                                                 "дурак", "тупой", "ahmoq", "itvachcha"]
+
+
+_SWEAR = BadWordMatcher(BAD_WORDS)
+_SWEAR_FUZZY = BadWordMatcher(BAD_WORDS, distance=1)
+
+
+def swear_block(text: str, matcher: BadWordMatcher = _SWEAR) -> bool:
+    """
+    Same work as the swear block of guard._process for one message (без БД).
+    Token cache is dropped first: numbers are for words never seen before.
+    """
+    matcher.clear_cache()
+    return matcher.find(normalize_for_badwords(normalize_text(text), fold=False)) is not None
+
+
+_NON_LOCAL_SCRIPTS = sum(SCRIPT_BITS[n] for n in SCRIPTS if n not in ("latin", "cyrillic"))
+
+PRIMITIVES: Dict[str, Callable[[str], object]] = {
+    "URL_RE.search": URL_RE.search,
+    "has_link": has_link,
+    "ARABIC_RE.search": ARABIC_RE.search,
+    "fold_text": fold_text,
+    "normalize_text": normalize_text,
+    "looks_like_ads": looks_like_ads,
+    "text_hash": text_hash,
+    "normalize_for_badwords": normalize_for_badwords,
+    "scripts.profile": profile,
+    "script_hit(arabic)": lambda t: blocked_scripts_hit(t, SCRIPT_BITS["arabic"]),
+    "script_hit(all but lat/cyr)": lambda t: blocked_scripts_hit(t, _NON_LOCAL_SCRIPTS),
+    "swear_block(200 words)": swear_block,
+    "swear_block(200 words, d=1)": lambda t: swear_block(t, _SWEAR_FUZZY),
+}
+
+
+def _calibrate(rounds: int = 15, iters: int = 200_000) -> float:
+    """
+    ns per iteration of a fixed pure-Python loop (machine speed unit).
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter_ns()
+        acc = 0
+        for i in range(iters):
+            acc += i & 7
+        best = min(best, (time.perf_counter_ns() - t0) / iters)
+    return best
+
+
+def _cost(fn: Callable[[str], object], texts: List[str], min_time: float = 0.02, repeat: int = 7) -> float:
+    """
+    Time per call in calibration units. Every repeat is divided by a short
+    calibration taken right around it: on a shared VM the speed drifts by
+    tens of percent within seconds, and a single global calibration turns
+    that drift into false regressions.
+    """
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            for t in texts:
+                fn(t)
+        if time.perf_counter() - t0 >= min_time:
+            break
+        loops *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        before = _calibrate(1, 20_000)
+        t0 = time.perf_counter_ns()
+        for _ in range(loops):
+            for t in texts:
+                fn(t)
+        ns = (time.perf_counter_ns() - t0) / (loops * len(texts))
+        best = min(best, ns * 2 / (before + _calibrate(1, 20_000)))
+    return best
+
+
+def run(per_category: int, only: str = "") -> Dict[str, Dict[str, float]]:
+    """
+    primitive -> category -> cost in calibration units (x calibration ns = ns).
+    """
+    texts = corpus.build(per_category)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in PRIMITIVES.items():
+        if only and only not in name:
+            continue
+        results[name] = {cat: _cost(fn, items) for cat, items in texts.items()}
+    return results
+
+
+def _print(results: Dict[str, Dict[str, float]], base: Dict[str, Dict[str, float]] | None = None, scale: float = 1.0):
+    cats = list(corpus.CATEGORIES)
+    print(f"{'ns/call':24s}" + "".join(f"{c:>13s}" for c in cats))
+    for name, row in results.items():
+        line = f"{name:24s}"
+        for c in cats:
+            cell = f"{row.get(c, 0):.0f}"
+            if base and name in base and c in base[name]:
+                ratio = row[c] / (base[name][c] * scale)
+                cell += f" {ratio:4.2f}x"
+            line += f"{cell:>13s}"
+        print(line)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--per-category", type=int, default=200)
+    p.add_argument("--only", default="", help="substring of primitive name")
+    p.add_argument("--save", action="store_true", help="store results as the new baseline")
+    p.add_argument("--check", action="store_true", help="compare with baseline, exit 1 on regression")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    p.add_argument("--rounds", type=int, default=3, help="--save/--check: best of N full runs")
+    p.add_argument("--baseline", default=BASELINE, help="baseline file to compare with / save to")
+    args = p.parse_args()
+
+    calib = _calibrate()
+    results = run(args.per_category, args.only)
+    # --save/--check: лучший из N полных прогонов (а не N замеров подряд), чтобы
+    # короткий шумный отрезок на машине не попал ни в эталон, ни в сравнение
+    for _ in range((args.rounds if args.save or args.check else 1) - 1):
+        again = run(args.per_category, args.only)
+        results = {n: {c: min(v, again[n][c]) for c, v in row.items()} for n, row in results.items()}
+        calib = min(calib, _calibrate())
+    calib = min(calib, _calibrate())
+    results = {n: {c: v * calib for c, v in row.items()} for n, row in results.items()}
+
+    base = None
+    scale = 1.0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        base = stored.get("results")
+        # та же работа на более медленной машине -> пропорционально больше ns
+        scale = calib / float(stored.get("calibration_ns") or calib)
+
+    print(f"calibration {calib:.1f} ns/iter" + (f", baseline scaled x{scale:.2f}" if base else ""))
+    _print(results, base if (args.check or base) else None, scale)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        merged = dict(base or {})
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"calibration_ns": calib, "results": merged}, f, indent=1, sort_keys=True)
+        print(f"baseline saved: {args.baseline}")
+
+    if args.check:
+        if not base:
+            print("no baseline, run with --save first")
+            sys.exit(1)
+        texts = corpus.build(args.per_category)
+        bad = []
+        for name, row in results.items():
+            for cat, ns in row.items():
+                ref = base.get(name, {}).get(cat)
+                if not ref or ns <= ref * scale * (1 + args.tolerance):
+                    continue
+                # шумная машина: регрессией считаем только повторяемое замедление
+                ns = min([ns] + [_cost(PRIMITIVES[name], texts[cat]) * calib for _ in range(5)])
+                if ns > ref * scale * (1 + args.tolerance):
+                    bad.append(f"{name} [{cat}]: {ns:.0f} ns vs {ref * scale:.0f} ns")
+        if bad:
+            print("REGRESSION:\n  " + "\n  ".join(bad))
+            sys.exit(1)
+        print("OK: no primitive slower than baseline by more than "
+              f"{args.tolerance * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
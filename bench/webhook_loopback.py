@@ -0,0 +1,120 @@
+# bench/webhook_loopback.py
+"""
+Webhook loopback check: starts app.webhook on 127.0.0.1, posts synthetic
+updates the way Telegram does and verifies that
+  - a wrong / missing secret token gets 401
+  - every valid update gets 200 before its (slow) handler finishes
+  - every update reaches the dispatcher exactly once
+Exits non-zero on failure.
+
+    python -m bench.webhook_loopback [--updates 500] [--handler-ms 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+
+from aiohttp import ClientSession, web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from app.webhook import build_webhook_app
+
+SECRET = "loopback-secret"
+PATH = "/tg/webhook"
+
+
+def _update(i: int) -> dict:
+    return {
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": int(time.time()),
+            "chat": {"id": -1001 - (i % 10), "type": "supergroup", "title": "t"},
+            "from": {"id": 1000 + i, "is_bot": False, "first_name": "u"},
+            "text": f"salom {i}",
+        },
+    }
+
+
+async def run(updates: int, handler_ms: int) -> int:
+    dp = Dispatcher()
+    router = Router()
+    seen: list[int] = []
+    done = asyncio.Event()
+
+    @router.message()
+    async def on_message(message: Message):
+        await asyncio.sleep(handler_ms / 1000)
+        seen.append(message.message_id)
+        if len(seen) >= updates:
+            done.set()
+
+    dp.include_router(router)
+    bot = Bot("123456:loopback")
+    app = build_webhook_app(dp, bot, PATH, SECRET)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}{PATH}"
+
+    failed = 0
+    try:
+        async with ClientSession() as http:
+            for headers in ({}, {"X-Telegram-Bot-Api-Secret-Token": "wrong"}):
+                async with http.post(url, json=_update(0), headers=headers) as r:
+                    if r.status != 401:
+                        print(f"FAIL: secret {headers or 'missing'} -> {r.status}, want 401")
+                        failed += 1
+
+            lat: list[float] = []
+            t0 = time.perf_counter()
+            for i in range(1, updates + 1):
+                t = time.perf_counter()
+                async with http.post(url, json=_update(i), headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as r:
+                    await r.read()
+                    lat.append(time.perf_counter() - t)
+                    if r.status != 200:
+                        print(f"FAIL: update {i} -> {r.status}")
+                        failed += 1
+            posted = time.perf_counter() - t0
+
+            try:
+                await asyncio.wait_for(done.wait(), timeout=30)
+            except asyncio.TimeoutError:
+                pass
+            total = time.perf_counter() - t0
+    finally:
+        await runner.cleanup()
+
+    lat.sort()
+    p50 = lat[len(lat) // 2] * 1000
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000
+    print(f"posted {updates} updates in {posted:.2f}s ({updates / posted:.0f}/s), "
+          f"response p50 {p50:.2f} ms p99 {p99:.2f} ms, handler {handler_ms} ms")
+    print(f"handled {len(seen)}/{updates} in {total:.2f}s")
+
+    if p99 >= handler_ms:
+        print("FAIL: responses waited for handlers")
+        failed += 1
+    if sorted(seen) != list(range(1, updates + 1)):
+        print("FAIL: lost or duplicated updates")
+        failed += 1
+    print("OK" if not failed else f"{failed} check(s) failed")
+    return 1 if failed else 0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--updates", type=int, default=500)
+    p.add_argument("--handler-ms", type=int, default=50)
+    args = p.parse_args()
+    sys.exit(asyncio.run(run(args.updates, args.handler_ms)))
+
+
+if __name__ == "__main__":
+    main()